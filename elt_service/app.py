@@ -1,15 +1,38 @@
 import os
-import json
+import argparse
+import time
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from uuid import uuid4
 from pathlib import Path
 from dotenv import load_dotenv, find_dotenv
 import httpx
 from datetime import datetime, timezone
 
+import codec
+from http_cache import ETagCache
+from rate_limit import RateLimitScheduler
+from graphql_extract import GraphQLExtractor
+from incremental import load_watermark, save_watermark, repos_to_refetch
+from raw_store import RawWriter, RawReader, mark_complete
+from normalized_store import NormalizedWriter, NormalizedReader
+from batch_normalize import BatchNormalizer
+from dag import Stage, run_dag
+from streaming import StreamPipeline, TeeWriter, AsyncWriter
+from cdc import diff_runs, apply_delta, delta_dir
+from bulk_load import bulk_load
+from chunk_load import ChunkLoader
+from migrations import migrate, NATURAL_KEYS
+from snapshots import ensure_run, publish, copy_run
+from history import record_run
+from effective_access import materialize_run
+from webhook import catch_up, repos_changed_since
 from models import OrganizationModel, MemberModel, TeamModel, RepoModel, PermissionModel
-from models import SessionLocal, Base, engine
-from sqlalchemy.exc import IntegrityError
+from models import TeamMemberModel, TeamRepoModel
+from models import Organization, Member, Team, Repo, Permission, TeamMember, TeamRepo
+from db import SessionLocal, get_engine
+from sqlalchemy import tuple_
 
 # --- Logging setup ---
 logging.basicConfig(
@@ -21,271 +44,921 @@ logger = logging.getLogger(__name__)
 # Load environment variables from .env file
 load_dotenv(find_dotenv())
 
+# GH_PAT may hold several comma-separated tokens; requests are spread across all of them
 GH_PAT = os.getenv("GH_PAT")
+GH_TOKENS = [token.strip() for token in (GH_PAT or "").split(",") if token.strip()]
 GH_ORG = os.getenv("GH_ORG")
+# Overridable so extraction can run against a local fake GitHub (see fake_github.py)
+GH_API_URL = os.getenv("GH_API_URL", "https://api.github.com").rstrip("/")
+# "sync" walks GitHub one request at a time, "async" fans requests out concurrently,
+# "graphql" pulls repos with their collaborators in bulk GraphQL queries,
+# "incremental" refetches collaborators only for repos changed since the last watermark
+EXTRACT_MODE = os.getenv("EXTRACT_MODE", "sync")
+GH_CONCURRENCY = int(os.getenv("GH_CONCURRENCY", 20))
+# GitHub's maximum page size for list endpoints
+PER_PAGE = 100
+GH_CACHE_DIR = os.getenv("GH_CACHE_DIR", "data/cache/http")
+GH_CACHE_MAX_MB = int(os.getenv("GH_CACHE_MAX_MB", 512))
+# Per-token pacing; GitHub's secondary limits kick in well above these defaults
+GH_RATE_PER_TOKEN = float(os.getenv("GH_RATE_PER_TOKEN", 10))
+GH_BURST = int(os.getenv("GH_BURST", 20))
+GH_MAX_RETRIES = int(os.getenv("GH_MAX_RETRIES", 5))
+# Repositories per GraphQL page; clamped so a query stays within GitHub's node limit
+GH_GRAPHQL_PAGE_SIZE = int(os.getenv("GH_GRAPHQL_PAGE_SIZE", 50))
+GH_GRAPHQL_COLLABORATORS = int(os.getenv("GH_GRAPHQL_COLLABORATORS", 100))
+GRAPHQL_URL = f"{GH_API_URL}/graphql"
+WATERMARK_PATH = os.getenv("WATERMARK_PATH", "data/state/watermark.json")
+# Collaborators of unchanged repos are still refreshed once they are this old
+GH_INCREMENTAL_MAX_AGE_HOURS = float(os.getenv("GH_INCREMENTAL_MAX_AGE_HOURS", 24))
+# "json" keeps the original one-document-per-entity files; "ndjson" streams records to
+# disk as pages arrive so extraction memory stays flat; "cas" stores each record once
+# across runs in data/raw/objects/ (see raw_store.py)
+RAW_FORMAT = os.getenv("RAW_FORMAT", "json")
+# none, gzip or zstd (requires the zstandard package); ndjson and cas only
+RAW_COMPRESSION = os.getenv("RAW_COMPRESSION", "none")
+# "json" keeps the original normalized files; "parquet" writes typed, compressed columnar
+# files (requires pyarrow) that the loader reads back in batches of LOAD_BATCH_SIZE rows
+NORMALIZED_FORMAT = os.getenv("NORMALIZED_FORMAT", "json")
+LOAD_BATCH_SIZE = int(os.getenv("LOAD_BATCH_SIZE", 10000))
+# "merge" upserts record by record through the ORM; "copy" (PostgreSQL only) streams each
+# table into a staging table with COPY and upserts it in one statement (see bulk_load.py)
+LOAD_MODE = os.getenv("LOAD_MODE", "merge")
+# "table" loads each table in one transaction; "chunk" commits every LOAD_BATCH_SIZE rows,
+# loads the tables side by side and retries or quarantines failed chunks (see chunk_load.py)
+LOAD_COMMIT = os.getenv("LOAD_COMMIT", "table")
+# Stages of the run DAG (extract/normalize/load per entity) executed at the same time
+DAG_WORKERS = int(os.getenv("DAG_WORKERS", 8))
+# Streaming mode (app.py --stream): normalization threads and bounded queue depth in pages
+NORMALIZE_WORKERS = int(os.getenv("NORMALIZE_WORKERS", 2))
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", 64))
 
 headers = {
-    "Authorization": f"Bearer {GH_PAT}",
     "Accept": "application/vnd.github+json"
 }
 
+http_cache = ETagCache(GH_CACHE_DIR, GH_CACHE_MAX_MB * 1024 * 1024)
+scheduler = RateLimitScheduler(GH_TOKENS, rate_per_token=GH_RATE_PER_TOKEN, burst=GH_BURST)
+
+def auth_headers(token):
+    return {"Authorization": f"Bearer {token}"} if token else {}
+
+def send(request_url, extra_headers=None, method="GET", json_body=None, conditional=False):
+    """
+    Send a request on the next free token, backing off and retrying while rate limited.
+    With conditional, the cached validators of that token are sent along.
+    """
+    body = None
+    if json_body is not None:
+        body = codec.encode(json_body)
+        extra_headers = {**(extra_headers or {}), "Content-Type": "application/json"}
+    for _ in range(GH_MAX_RETRIES):
+        state, wait = scheduler.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        request_headers = {**headers, **auth_headers(state.token), **(extra_headers or {})}
+        if conditional:
+            request_headers.update(http_cache.validators(request_url, request_headers))
+        response = httpx.request(method, request_url, content=body, timeout=30.0, headers=request_headers)
+        if scheduler.update(state, response) is None:
+            break
+    return response
+
+def github_get(url, params=None):
+    """
+    Conditional GET against the GitHub API.
+    A 304 is served from the on-disk cache, a 200 refreshes it.
+    """
+    request_url = str(httpx.URL(url).copy_merge_params(params or {}))
+    response = send(request_url, conditional=True)
+    if response.status_code == 304:
+        cached = http_cache.replay(request_url, response)
+        if cached is not None:
+            return cached
+        response = send(request_url)
+    response.raise_for_status()
+    http_cache.store(request_url, response)
+    return response
+
+def github_graphql(query, variables):
+    """POST a GraphQL query through the scheduler and return the decoded response body."""
+    response = send(GRAPHQL_URL, method="POST", json_body={"query": query, "variables": variables})
+    response.raise_for_status()
+    return codec.decode(response.content)
+
+def iter_pages(url, what):
+    """
+    Yield each page of a GitHub list endpoint, following the Link: rel="next" header.
+    A failed page is logged and ends the iteration; pages already yielded are kept.
+    """
+    params = {"per_page": PER_PAGE}
+    while url:
+        try:
+            response = github_get(url, params)
+        except Exception as e:
+            logger.error(f"Failed to fetch {what}: {e}")
+            return
+        yield codec.decode(response.content)
+        # The next link already carries per_page and the page cursor
+        url = response.links.get("next", {}).get("url")
+        params = None
+
+def collect(pages):
+    """Flatten a page generator into a single list."""
+    return [item for page in pages for item in page]
+
 def list_repos():
-    url = f"https://api.github.com/orgs/{GH_ORG}/repos"
-    try:
-        response = httpx.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        logger.error(f"Failed to fetch repos: {e}")
-        return []
+    url = f"{GH_API_URL}/orgs/{GH_ORG}/repos"
+    yield from iter_pages(url, "repos")
 
 def list_teams():
-    url = f"https://api.github.com/orgs/{GH_ORG}/teams"
-    try:
-        response = httpx.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        logger.error(f"Failed to fetch teams: {e}")
-        return []
+    url = f"{GH_API_URL}/orgs/{GH_ORG}/teams"
+    yield from iter_pages(url, "teams")
 
 def list_members():
-    url = f"https://api.github.com/orgs/{GH_ORG}/members"
-    try:
-        response = httpx.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        logger.error(f"Failed to fetch members: {e}")
-        return []
+    url = f"{GH_API_URL}/orgs/{GH_ORG}/members"
+    yield from iter_pages(url, "members")
 
 def get_permissions(repo_name):
-    url = f"https://api.github.com/repos/{GH_ORG}/{repo_name}/collaborators"
-    try:
-        response = httpx.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        logger.error(f"Failed to fetch permissions for repo {repo_name}: {e}")
-        return []
+    url = f"{GH_API_URL}/repos/{GH_ORG}/{repo_name}/collaborators"
+    yield from iter_pages(url, f"permissions for repo {repo_name}")
+
+def list_team_members(team_slug):
+    url = f"{GH_API_URL}/orgs/{GH_ORG}/teams/{team_slug}/members"
+    yield from iter_pages(url, f"members for team {team_slug}")
+
+def list_team_repos(team_slug):
+    url = f"{GH_API_URL}/orgs/{GH_ORG}/teams/{team_slug}/repos"
+    yield from iter_pages(url, f"repos for team {team_slug}")
+
+def fetch_team_access(teams, workers=GH_CONCURRENCY):
+    """Fetch members and repo grants of every team on a bounded thread pool."""
+    slugs = [team["slug"] for team in teams if team.get("slug")]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        members = pool.map(lambda slug: collect(list_team_members(slug)), slugs)
+        repos = pool.map(lambda slug: collect(list_team_repos(slug)), slugs)
+        team_members = dict(zip(slugs, members))
+        team_repos = dict(zip(slugs, repos))
+    return team_members, team_repos
 
 def get_org_details():
-    url = f"https://api.github.com/orgs/{GH_ORG}"
+    url = f"{GH_API_URL}/orgs/{GH_ORG}"
     try:
-        response = httpx.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json()
+        response = github_get(url)
+        return codec.decode(response.content)
     except Exception as e:
         logger.error(f"Failed to fetch org details: {e}")
         return {}
 
-def ensure_tables_exist():
-    """Create all tables in the database if they do not exist."""
+def ensure_tables_exist(run_id=None):
+    """
+    Create the tables, or bring an existing schema up to date, through migrations.py.
+    With run_id, also create that run's partitions (see snapshots.py).
+    """
     try:
-        Base.metadata.create_all(bind=engine)
+        migrate()
+        if run_id:
+            ensure_run(run_id)
         logger.info("Ensured all tables exist in the database.")
     except Exception as e:
         logger.error(f"Error ensuring tables exist: {e}")
         raise
 
+def open_raw_writer(run_id):
+    return RawWriter(Path(f"data/raw/{run_id}"), RAW_FORMAT, RAW_COMPRESSION)
+
+def slim_repo(repo):
+    """The fields of a repo the watermark needs, kept once its page has been written out."""
+    return {"name": repo.get("name"), "updated_at": repo.get("updated_at"), "pushed_at": repo.get("pushed_at")}
+
+def write_team_access(writer, team_members, team_repos):
+    for team_slug, users in team_members.items():
+        writer.write_group("team_members", team_slug, users)
+    for team_slug, repos in team_repos.items():
+        writer.write_group("team_repos", team_slug, repos)
+
+def record_watermark(run_id, repos, members, teams, refetched, previous=None, now=None):
+    """Save the watermark the next incremental run compares against; now is when the refetched collaborators were read."""
+    try:
+        save_watermark(
+            WATERMARK_PATH, run_id, repos, members, teams, refetched, previous, now or datetime.now(timezone.utc)
+        )
+    except Exception as e:
+        logger.warning(f"Failed to save watermark: {e}")
+
 def extract_and_write_raw(run_id):
-    """Extract data from GitHub and write to data/raw/{run_id}/ as JSON."""
-    raw_dir = Path(f"data/raw/{run_id}")
-    raw_dir.mkdir(parents=True, exist_ok=True)
+    """Extract data from GitHub and write to data/raw/{run_id}/, one page at a time."""
+    writer = open_raw_writer(run_id)
 
     try:
-        repos = list_repos()
-        repo_names = [repo.get("name") for repo in repos if repo.get("name")]
-        teams = list_teams()
-        members = list_members()
-        permissions = {repo: get_permissions(repo) for repo in repo_names}
-        org_details = get_org_details()
-
-        with open(raw_dir / "repos.json", "w") as f:
-            json.dump(repos, f, indent=4)
-        with open(raw_dir / "teams.json", "w") as f:
-            json.dump(teams, f, indent=4)
-        with open(raw_dir / "members.json", "w") as f:
-            json.dump(members, f, indent=4)
-        with open(raw_dir / "permissions.json", "w") as f:
-            json.dump(permissions, f, indent=4)
-        with open(raw_dir / "org_details.json", "w") as f:
-            json.dump(org_details, f, indent=4)
-
-        logger.info(f"Extracted raw data to {raw_dir}")
+        repos = []
+        # Collaborators are fetched as each page of repos arrives
+        for page in list_repos():
+            writer.write("repos", page)
+            for repo in page:
+                if repo.get("name"):
+                    writer.write_group("permissions", repo["name"], collect(get_permissions(repo["name"])))
+            repos.extend(slim_repo(repo) for repo in page)
+        teams = collect(list_teams())
+        writer.write("teams", teams)
+        write_team_access(writer, *fetch_team_access(teams))
+        members = collect(list_members())
+        writer.write("members", members)
+        writer.write_one("org_details", get_org_details())
+
+        writer.close()
+        record_watermark(run_id, repos, members, teams, {repo["name"] for repo in repos})
+
+        logger.info(f"Extracted raw data to {writer.raw_dir}")
     except Exception as e:
+        writer.close(complete=False)
         logger.error(f"Error during extraction: {e}")
         raise
+    finally:
+        http_cache.save()
+        logger.info(f"HTTP cache: {http_cache.stats()}")
+        logger.info(f"GitHub tokens: {scheduler.stats()}")
 
-def normalize_raw_data(run_id):
-    """Normalize raw data using Pydantic models and write to data/normalized/{run_id}/ as JSON."""
-    raw_dir = Path(f"data/raw/{run_id}")
-    norm_dir = Path(f"data/normalized/{run_id}")
-    norm_dir.mkdir(parents=True, exist_ok=True)
-    now = datetime.now(timezone.utc)
+def extract_and_write_raw_graphql(run_id):
+    """GraphQL variant of extract_and_write_raw producing the same data/raw/{run_id}/ layout."""
+    writer = open_raw_writer(run_id)
 
     try:
-        # --- Organization ---
-        with open(raw_dir / "org_details.json") as f:
-            org = json.load(f)
-        org_obj = OrganizationModel(run_id=run_id, created_ts=now, updated_ts=now, **org)
-        with open(norm_dir / "organizations.json", "w") as f:
-            json.dump([org_obj.model_dump()], f, indent=4, default=str)
-
-        # --- Members ---
-        with open(raw_dir / "members.json") as f:
-            members = json.load(f)
-        member_objs = []
-        for m in members:
-            if "mfa_enabled" not in m:
-                m["mfa_enabled"] = None
-            try:
-                member_objs.append(MemberModel(run_id=run_id, created_ts=now, updated_ts=now, **m).model_dump())
-            except Exception as e:
-                logger.warning(f"Skipping member due to error: {e}")
-        with open(norm_dir / "members.json", "w") as f:
-            json.dump(member_objs, f, indent=4, default=str)
-
-        # --- Teams ---
-        with open(raw_dir / "teams.json") as f:
-            teams = json.load(f)
-        team_objs = []
-        for t in teams:
-            try:
-                team_objs.append(TeamModel(run_id=run_id, created_ts=now, updated_ts=now, **t).model_dump())
-            except Exception as e:
-                logger.warning(f"Skipping team due to error: {e}")
-        with open(norm_dir / "teams.json", "w") as f:
-            json.dump(team_objs, f, indent=4, default=str)
-
-        # --- Repos ---
-        with open(raw_dir / "repos.json") as f:
-            repos = json.load(f)
-        repo_objs = []
-        for r in repos:
-            owner = r.get("owner", {})
-            repo_flat = {
-                **r,
-                "owner_login": owner.get("login"),
-                "owner_id": owner.get("id"),
-                "owner_node_id": owner.get("node_id"),
-                "owner_avatar_url": owner.get("avatar_url"),
-                "owner_gravatar_id": owner.get("gravatar_id"),
-                "owner_url": owner.get("url"),
-                "owner_html_url": owner.get("html_url"),
-                "owner_followers_url": owner.get("followers_url"),
-                "owner_following_url": owner.get("following_url"),
-                "owner_gists_url": owner.get("gists_url"),
-                "owner_starred_url": owner.get("starred_url"),
-                "owner_subscriptions_url": owner.get("subscriptions_url"),
-                "owner_organizations_url": owner.get("organizations_url"),
-                "owner_repos_url": owner.get("repos_url"),
-                "owner_events_url": owner.get("events_url"),
-                "owner_received_events_url": owner.get("received_events_url"),
-                "owner_type": owner.get("type"),
-                "owner_user_view_type": owner.get("user_view_type"),
-                "owner_site_admin": owner.get("site_admin"),
-            }
+        extractor = GraphQLExtractor(
+            github_graphql, GH_ORG,
+            page_size=GH_GRAPHQL_PAGE_SIZE, collaborator_page_size=GH_GRAPHQL_COLLABORATORS,
+            api_url=GH_API_URL,
+        )
+        repos = []
+        for repo_page, perm_page in extractor.iter_repos():
+            writer.write("repos", repo_page)
+            for repo_name, perms in perm_page.items():
+                writer.write_group("permissions", repo_name, perms)
+            repos.extend(slim_repo(repo) for repo in repo_page)
+        teams = extractor.teams()
+        writer.write("teams", teams)
+        # Teams are few; their members and repo grants come from the REST worker pool
+        write_team_access(writer, *fetch_team_access(teams))
+        members = extractor.members()
+        writer.write("members", members)
+        writer.write_one("org_details", extractor.org_details())
+
+        writer.close()
+        record_watermark(run_id, repos, members, teams, {repo["name"] for repo in repos})
+
+        logger.info(
+            f"Extracted raw data to {writer.raw_dir} (graphql, {extractor.queries} queries, "
+            f"{extractor.cost} rate limit points)"
+        )
+    except Exception as e:
+        writer.close(complete=False)
+        logger.error(f"Error during GraphQL extraction: {e}")
+        raise
+    finally:
+        logger.info(f"GitHub tokens: {scheduler.stats()}")
+
+# --- Async extraction ---
+
+def build_async_client(concurrency=GH_CONCURRENCY):
+    """Shared AsyncClient with a connection pool sized to the concurrency cap."""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    return httpx.AsyncClient(headers=headers, limits=limits, timeout=httpx.Timeout(30.0))
+
+async def send_async(client, request_url, extra_headers=None, conditional=False):
+    """Async counterpart of send, sharing the same scheduler."""
+    for _ in range(GH_MAX_RETRIES):
+        state, wait = scheduler.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        request_headers = {**auth_headers(state.token), **(extra_headers or {})}
+        if conditional:
+            request_headers.update(http_cache.validators(request_url, request_headers))
+        response = await client.get(request_url, headers=request_headers)
+        if scheduler.update(state, response) is None:
+            break
+    return response
+
+async def github_get_async(client, url, params=None):
+    """Async counterpart of github_get, sharing the same on-disk cache."""
+    request_url = str(httpx.URL(url).copy_merge_params(params or {}))
+    response = await send_async(client, request_url, conditional=True)
+    if response.status_code == 304:
+        cached = http_cache.replay(request_url, response)
+        if cached is not None:
+            return cached
+        response = await send_async(client, request_url)
+    response.raise_for_status()
+    http_cache.store(request_url, response)
+    return response
+
+async def fetch_json_async(client, semaphore, url, what, default):
+    """GET url through the shared client, holding a semaphore slot for the duration."""
+    async with semaphore:
+        try:
+            response = await github_get_async(client, url)
+            return codec.decode(response.content)
+        except Exception as e:
+            logger.error(f"Failed to fetch {what}: {e}")
+            return default
+
+async def iter_pages_async(client, semaphore, url, what):
+    """Async counterpart of iter_pages; a semaphore slot is held per page request only."""
+    params = {"per_page": PER_PAGE}
+    while url:
+        async with semaphore:
             try:
-                repo_objs.append(RepoModel(run_id=run_id, created_ts=now, updated_ts=now, **repo_flat).model_dump())
+                response = await github_get_async(client, url, params)
             except Exception as e:
-                logger.warning(f"Skipping repo due to error: {e}")
-        with open(norm_dir / "repos.json", "w") as f:
-            json.dump(repo_objs, f, indent=4, default=str)
-
-        # --- Permissions ---
-        with open(raw_dir / "permissions.json") as f:
-            permissions = json.load(f)
-        perm_objs = []
-        for repo_name, perms in permissions.items():
-            for perm in perms:
-                perm_data = {"repo_name": repo_name, **perm}
-                try:
-                    perm_objs.append(PermissionModel(run_id=run_id, created_ts=now, updated_ts=now, **perm_data).model_dump())
-                except Exception as e:
-                    logger.warning(f"Skipping permission due to error: {e}")
-        with open(norm_dir / "permissions.json", "w") as f:
-            json.dump(perm_objs, f, indent=4, default=str)
-
-        logger.info(f"Normalized data written to {norm_dir}")
+                logger.error(f"Failed to fetch {what}: {e}")
+                return
+        yield codec.decode(response.content)
+        url = response.links.get("next", {}).get("url")
+        params = None
+
+async def collect_async(pages):
+    """Flatten an async page generator into a single list."""
+    items = []
+    async for page in pages:
+        items.extend(page)
+    return items
+
+def list_repos_async(client, semaphore):
+    url = f"{GH_API_URL}/orgs/{GH_ORG}/repos"
+    return iter_pages_async(client, semaphore, url, "repos")
+
+def list_teams_async(client, semaphore):
+    url = f"{GH_API_URL}/orgs/{GH_ORG}/teams"
+    return iter_pages_async(client, semaphore, url, "teams")
+
+def list_members_async(client, semaphore):
+    url = f"{GH_API_URL}/orgs/{GH_ORG}/members"
+    return iter_pages_async(client, semaphore, url, "members")
+
+def get_permissions_async(client, semaphore, repo_name):
+    url = f"{GH_API_URL}/repos/{GH_ORG}/{repo_name}/collaborators"
+    return iter_pages_async(client, semaphore, url, f"permissions for repo {repo_name}")
+
+def list_team_members_async(client, semaphore, team_slug):
+    url = f"{GH_API_URL}/orgs/{GH_ORG}/teams/{team_slug}/members"
+    return iter_pages_async(client, semaphore, url, f"members for team {team_slug}")
+
+def list_team_repos_async(client, semaphore, team_slug):
+    url = f"{GH_API_URL}/orgs/{GH_ORG}/teams/{team_slug}/repos"
+    return iter_pages_async(client, semaphore, url, f"repos for team {team_slug}")
+
+async def list_teams_with_access_async(client, semaphore):
+    """List teams, then fan out member and repo-grant fetches for each team."""
+    teams = await collect_async(list_teams_async(client, semaphore))
+    slugs = [team["slug"] for team in teams if team.get("slug")]
+    members, repos = await asyncio.gather(
+        asyncio.gather(*(collect_async(list_team_members_async(client, semaphore, slug)) for slug in slugs)),
+        asyncio.gather(*(collect_async(list_team_repos_async(client, semaphore, slug)) for slug in slugs)),
+    )
+    return teams, dict(zip(slugs, members)), dict(zip(slugs, repos))
+
+async def get_org_details_async(client, semaphore):
+    url = f"{GH_API_URL}/orgs/{GH_ORG}"
+    return await fetch_json_async(client, semaphore, url, "org details", {})
+
+async def write_permissions_async(writer, client, semaphore, repo_name):
+    """Fetch one repo's collaborators and write them out as soon as they are complete."""
+    perms = await collect_async(get_permissions_async(client, semaphore, repo_name))
+    await writer.write_group("permissions", repo_name, perms)
+
+async def write_org_async(writer, client, semaphore):
+    """Fetch and write teams with their access, members and org details."""
+    (teams, team_members, team_repos), members, org_details = await asyncio.gather(
+        list_teams_with_access_async(client, semaphore),
+        collect_async(list_members_async(client, semaphore)),
+        get_org_details_async(client, semaphore),
+    )
+    await writer.write("teams", teams)
+    await writer.run(write_team_access, writer.writer, team_members, team_repos)
+    await writer.write("members", members)
+    await writer.write_one("org_details", org_details)
+    return teams, members
+
+async def extract_all_async(raw_writer, concurrency=GH_CONCURRENCY):
+    """
+    Fetch the org listings in parallel and fan out collaborator requests for every repo
+    as soon as its page of the repo listing arrives. Everything is written through raw_writer
+    as it completes; returns the slim repo listing, teams and members for the watermark.
+    At most `concurrency` requests are in flight at any time.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    writer = AsyncWriter(raw_writer)
+    try:
+        async with build_async_client(concurrency) as client:
+            listings = asyncio.create_task(write_org_async(writer, client, semaphore))
+            repos = []
+            perm_tasks = []
+            async for page in list_repos_async(client, semaphore):
+                await writer.write("repos", page)
+                for repo in page:
+                    if repo.get("name"):
+                        perm_tasks.append(asyncio.create_task(
+                            write_permissions_async(writer, client, semaphore, repo["name"])
+                        ))
+                repos.extend(slim_repo(repo) for repo in page)
+            teams, members = await listings
+            await asyncio.gather(*perm_tasks)
+    finally:
+        writer.close()
+    return repos, teams, members
+
+def extract_and_write_raw_async(run_id, concurrency=GH_CONCURRENCY):
+    """Concurrent variant of extract_and_write_raw producing the same data/raw/{run_id}/ layout."""
+    writer = open_raw_writer(run_id)
+
+    try:
+        repos, teams, members = asyncio.run(extract_all_async(writer, concurrency))
+
+        writer.close()
+        record_watermark(run_id, repos, members, teams, {repo["name"] for repo in repos})
+
+        logger.info(f"Extracted raw data to {writer.raw_dir} (async, concurrency={concurrency})")
     except Exception as e:
-        logger.error(f"Error during normalization: {e}")
+        writer.close(complete=False)
+        logger.error(f"Error during async extraction: {e}")
         raise
+    finally:
+        http_cache.save()
+        logger.info(f"HTTP cache: {http_cache.stats()}")
+        logger.info(f"GitHub tokens: {scheduler.stats()}")
+
+async def write_repo_pages_async(writer, pages):
+    """Write each page of the repo listing as it arrives, keeping only the watermark fields."""
+    repos = []
+    async for page in pages:
+        await writer.write("repos", page)
+        repos.extend(slim_repo(repo) for repo in page)
+    return repos
+
+def delivery_changes(watermark):
+    """
+    Repos the webhook delivery log shows changed since the watermark's oldest collaborator
+    fetch (webhook.repos_changed_since), or {} when there is no watermark or no log.
+    """
+    marks = (watermark or {}).get("repos") or {}
+    if not marks:
+        return {}
+    since = min(datetime.fromisoformat(mark["fetched_at"]) for mark in marks.values())
+    try:
+        return repos_changed_since(since)
+    except Exception as e:
+        logger.warning(
+            f"Webhook delivery log unavailable ({e}); collaborator changes to unchanged repos are "
+            f"picked up after GH_INCREMENTAL_MAX_AGE_HOURS={GH_INCREMENTAL_MAX_AGE_HOURS}"
+        )
+        return {}
 
-def load_normalized_to_db(run_id):
+async def extract_incremental_async(raw_writer, watermark, prior, concurrency=GH_CONCURRENCY, changed=None):
     """
-    Load normalized data from data/normalized/{run_id}/ into the database tables.
-    
-    The load_normalized_to_db function uses session.merge(obj) for each record.
-    In SQLAlchemy, session.merge() performs an upsert: it inserts the record if it does not exist,
-    or updates the existing record if it matches the primary key.
-    Therefore, load_normalized_to_db performs an upsert (insert or update) for each record.
+    Fetch the org listings and team access, then collaborators only for repos that changed
+    since the watermark, by their listing or by webhook deliveries (changed); the rest are
+    streamed forward from the prior run's raw data.
+    Returns the slim repo listing, teams, members and the set of refetched repo names.
     """
+    semaphore = asyncio.Semaphore(concurrency)
+    writer = AsyncWriter(raw_writer)
+    try:
+        async with build_async_client(concurrency) as client:
+            repos, (teams, members) = await asyncio.gather(
+                write_repo_pages_async(writer, list_repos_async(client, semaphore)),
+                write_org_async(writer, client, semaphore),
+            )
+            names = {repo["name"] for repo in repos if repo.get("name")}
+            refetch = repos_to_refetch(
+                watermark, repos, members, teams, GH_INCREMENTAL_MAX_AGE_HOURS, datetime.now(timezone.utc), changed
+            )
+            carried = set()
+            if prior is not None:
+                for repo_name, perms in prior.groups("permissions"):
+                    if repo_name in names and repo_name not in refetch:
+                        await writer.write_group("permissions", repo_name, perms)
+                        carried.add(repo_name)
+            # Anything the prior run has no collaborators for cannot be carried forward
+            refetch = names - carried
+            await asyncio.gather(
+                *(write_permissions_async(writer, client, semaphore, name) for name in sorted(refetch))
+            )
+    finally:
+        writer.close()
+    return repos, teams, members, refetch
 
+def extract_and_write_raw_incremental(run_id, concurrency=GH_CONCURRENCY):
+    """
+    Incremental variant of extract_and_write_raw.
+    Still writes a complete snapshot to data/raw/{run_id}/: collaborators of unchanged
+    repos are carried forward from the watermark run's raw data.
+    """
+    writer = open_raw_writer(run_id)
+
+    try:
+        watermark = load_watermark(WATERMARK_PATH)
+        prior = None
+        if watermark:
+            prior = RawReader(Path(f"data/raw/{watermark['run_id']}"))
+            if not prior.exists("permissions"):
+                logger.warning(f"Raw data for watermark run {watermark['run_id']} is missing; running a full extraction")
+                watermark = prior = None
+
+        changed = delivery_changes(watermark)
+        # Deliveries from here on are after the fetch, so the next run sees them
+        started = datetime.now(timezone.utc)
+        repos, teams, members, refetch = asyncio.run(
+            extract_incremental_async(writer, watermark, prior, concurrency, changed)
+        )
+
+        writer.close()
+        record_watermark(run_id, repos, members, teams, refetch, watermark, started)
+
+        logger.info(
+            f"Extracted raw data to {writer.raw_dir} (incremental, refetched {len(refetch)} of "
+            f"{len(repos)} repos' collaborators)"
+        )
+    except Exception as e:
+        writer.close(complete=False)
+        logger.error(f"Error during incremental extraction: {e}")
+        raise
+    finally:
+        http_cache.save()
+        logger.info(f"HTTP cache: {http_cache.stats()}")
+        logger.info(f"GitHub tokens: {scheduler.stats()}")
+
+# Normalized tables and the raw entity each is built from
+NORMALIZED_TABLES = {
+    "organizations": "org_details",
+    "members": "members",
+    "teams": "teams",
+    "repos": "repos",
+    "permissions": "permissions",
+    "team_members": "team_members",
+    "team_repos": "team_repos",
+}
+# Absent in runs extracted before team access was collected
+OPTIONAL_TABLES = {"team_members", "team_repos"}
+TABLE_MODELS = {
+    "organizations": OrganizationModel,
+    "members": MemberModel,
+    "teams": TeamModel,
+    "repos": RepoModel,
+    "permissions": PermissionModel,
+    "team_members": TeamMemberModel,
+    "team_repos": TeamRepoModel,
+}
+# Field filled from the group key of keyed raw entities
+GROUP_KEY_FIELDS = {"permissions": "repo_name", "team_members": "team_slug", "team_repos": "team_slug"}
+
+def normalize_table(run_id, table, now=None):
+    """Normalize one table of data/raw/{run_id}/ into data/normalized/{run_id}/ as JSON or Parquet."""
+    raw = RawReader(Path(f"data/raw/{run_id}"))
+    if table in OPTIONAL_TABLES and not raw.exists(NORMALIZED_TABLES[table]):
+        return
     norm_dir = Path(f"data/normalized/{run_id}")
+    norm = NormalizedWriter(norm_dir, NORMALIZED_FORMAT)
+    now = now or datetime.now(timezone.utc)
+    # Invalid records go to norm_dir/{table}.quarantine.ndjson instead of the tables
+    batch = BatchNormalizer(run_id, now, norm_dir)
+
+    try:
+        if table == "organizations":
+            org = raw.one("org_details")
+            org_obj = OrganizationModel(run_id=run_id, created_ts=now, updated_ts=now, **org)
+            norm.write("organizations", OrganizationModel, [org_obj.model_dump()])
+
+        elif table == "members":
+            norm.write("members", MemberModel, batch.normalize("members", MemberModel, raw.records("members")))
+
+        elif table == "teams":
+            norm.write("teams", TeamModel, batch.normalize("teams", TeamModel, raw.records("teams")))
+
+        elif table == "repos":
+            # owner is flattened into owner_* columns, see batch_normalize.FLATTENED
+            norm.write("repos", RepoModel, batch.normalize("repos", RepoModel, raw.records("repos")))
+
+        elif table == "permissions":
+            perm_objs = batch.normalize_groups("permissions", PermissionModel, raw.groups("permissions"), "repo_name")
+            norm.write("permissions", PermissionModel, perm_objs)
+
+        elif table == "team_members":
+            team_member_objs = batch.normalize_groups("team_members", TeamMemberModel, raw.groups("team_members"), "team_slug")
+            norm.write("team_members", TeamMemberModel, team_member_objs)
+
+        elif table == "team_repos":
+            team_repos = (
+                (team_slug, [{"repo_name": r.get("name"), **r} for r in repos])
+                for team_slug, repos in raw.groups("team_repos")
+            )
+            team_repo_objs = batch.normalize_groups("team_repos", TeamRepoModel, team_repos, "team_slug")
+            norm.write("team_repos", TeamRepoModel, team_repo_objs)
+    finally:
+        batch.close()
+
+TABLE_CLASSES = {
+    "organizations": Organization,
+    "members": Member,
+    "teams": Team,
+    "repos": Repo,
+    "permissions": Permission,
+    "team_members": TeamMember,
+    "team_repos": TeamRepo,
+}
+
+def attach_ids(session, table, records):
+    """
+    Records of a table with surrogate ids, one per natural key, each carrying the id of
+    the row already stored under its key so that session.merge updates that row.
+    Pending rows must be flushed first to be found.
+    """
+    key = NATURAL_KEYS.get(table)
+    if not key:
+        return records
+    cls = TABLE_CLASSES[table]
+    columns = [getattr(cls, name) for name in key]
+    # A repeated key, e.g. a collaborator listed on two pages, keeps its last record
+    by_key = {tuple(record.get(name) for name in key): record for record in records}
+    keys = list(by_key)
+    # Filtering on run_id as well confines the lookup to the run's partitions
+    run_ids = {record["run_id"] for record in by_key.values()}
+    for start in range(0, len(keys), 1000):
+        query = session.query(cls.id, *columns).filter(cls.run_id.in_(run_ids))
+        for row in query.filter(tuple_(*columns).in_(keys[start:start + 1000])):
+            by_key[tuple(row[1:])]["id"] = row[0]
+    return list(by_key.values())
+
+def merge_table(session, run_id, table):
+    """session.merge every normalized record of one table, reading it in batches."""
+    norm = NormalizedReader(Path(f"data/normalized/{run_id}"))
+    if table in OPTIONAL_TABLES and not norm.exists(table):
+        return
+    for batch in norm.batches(table, LOAD_BATCH_SIZE):
+        for record in attach_ids(session, table, batch):
+            session.merge(TABLE_CLASSES[table](**record))
+        session.flush()
+
+def load_columns(table):
+    """Columns of a table that its normalized records carry."""
+    fields = TABLE_MODELS[table].model_fields
+    return [column.name for column in TABLE_CLASSES[table].__table__.columns if column.name in fields]
+
+def copy_table(run_id, table):
+    """Bulk upsert one normalized table with COPY + INSERT ... ON CONFLICT in its own transaction."""
+    norm = NormalizedReader(Path(f"data/normalized/{run_id}"))
+    if table in OPTIONAL_TABLES and not norm.exists(table):
+        return
+    columns = load_columns(table)
+    if norm.format(table) == "parquet":
+        batches = norm.arrow_batches(table, LOAD_BATCH_SIZE, columns)
+    else:
+        batches = norm.batches(table, LOAD_BATCH_SIZE)
+    bulk_load(get_engine(), table, batches, columns)
+
+def load_rows(table, rows):
+    """Upsert already normalized rows of one table in a single transaction."""
+    if LOAD_MODE == "copy":
+        bulk_load(get_engine(), table, [rows], load_columns(table))
+        return
     session = SessionLocal()
     try:
-        # --- Organization (single record) ---
-        with open(norm_dir / "organizations.json") as f:
-            orgs = json.load(f)
-        for org in orgs:
-            from models import Organization
-            obj = Organization(**org)
-            session.merge(obj)
-
-        # --- Members ---
-        with open(norm_dir / "members.json") as f:
-            members = json.load(f)
-        for m in members:
-            from models import Member
-            obj = Member(**m)
-            session.merge(obj)
-
-        # --- Teams ---
-        with open(norm_dir / "teams.json") as f:
-            teams = json.load(f)
-        for t in teams:
-            from models import Team
-            obj = Team(**t)
-            session.merge(obj)
-
-        # --- Repos ---
-        with open(norm_dir / "repos.json") as f:
-            repos = json.load(f)
-        for r in repos:
-            from models import Repo
-            obj = Repo(**r)
-            session.merge(obj)
-
-        # --- Permissions ---
-        with open(norm_dir / "permissions.json") as f:
-            perms = json.load(f)
-        for p in perms:
-            from models import Permission
-            obj = Permission(**p)
-            session.merge(obj)
+        for record in attach_ids(session, table, rows):
+            session.merge(TABLE_CLASSES[table](**record))
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
 
+def chunk_table(run_id, table):
+    """Upsert one normalized table a chunk per transaction (see chunk_load.py); returns its load stats."""
+    norm_dir = Path(f"data/normalized/{run_id}")
+    norm = NormalizedReader(norm_dir)
+    if table in OPTIONAL_TABLES and not norm.exists(table):
+        return None
+    return ChunkLoader(load_rows, table, norm_dir).load(norm.batches(table, LOAD_BATCH_SIZE))
+
+def load_table(run_id, table):
+    """
+    Upsert one normalized table in its own transaction, or with LOAD_COMMIT=chunk a chunk per
+    transaction, raising on failure, including quarantined chunk rows.
+    """
+    if LOAD_COMMIT == "chunk":
+        chunk_table(run_id, table)
+        return
+    if LOAD_MODE == "copy":
+        copy_table(run_id, table)
+        return
+    session = SessionLocal()
+    try:
+        merge_table(session, run_id, table)
         session.commit()
-        logger.info("Loaded normalized data into the database.")
-    except IntegrityError as e:
+    except Exception:
         session.rollback()
-        logger.error(f"Database integrity error: {e}")
-    except Exception as e:
+        raise
+    finally:
+        session.close()
+
+def load_delta_to_db(base_run_id, run_id):
+    """
+    Load a run as base_run_id's rows plus what changed between the two (see cdc.py), in one
+    transaction, for a database that already holds base_run_id's data. The base rows are
+    copied inside the database, so only the delta is sent. Raises on failure.
+    """
+    session = SessionLocal()
+    try:
+        copy_run(session.connection(), base_run_id, run_id)
+        applied = apply_delta(session, delta_dir(base_run_id, run_id), TABLE_CLASSES, run_id)
+        session.commit()
+        logger.info(f"Applied delta {base_run_id} -> {run_id}: {applied}")
+    except Exception:
         session.rollback()
-        logger.error(f"Database error: {e}")
+        raise
     finally:
         session.close()
-        
+
+# --- Stage DAG ---
+
+def extract_stage(run_id, extract):
+    """Run extract(writer) as one DAG stage; finish_extract flags the run's raw data complete."""
+    writer = open_raw_writer(run_id)
+    try:
+        extract(writer)
+    finally:
+        writer.close(complete=False)
+
+def extract_org_raw(writer):
+    writer.write_one("org_details", get_org_details())
+
+def extract_members_raw(writer):
+    for page in list_members():
+        writer.write("members", page)
+
+def extract_teams_raw(writer):
+    teams = collect(list_teams())
+    writer.write("teams", teams)
+    write_team_access(writer, *fetch_team_access(teams))
+
+def extract_repos_raw(writer):
+    for page in list_repos():
+        writer.write("repos", page)
+
+def extract_permissions_raw(run_id, writer, workers=GH_CONCURRENCY):
+    """Fetch collaborators of every repo in the run's raw repo listing on a bounded thread pool."""
+    raw = RawReader(Path(f"data/raw/{run_id}"))
+    names = [repo["name"] for repo in raw.records("repos") if repo.get("name")]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(lambda name: collect(get_permissions(name)), name): name for name in names}
+        for future in as_completed(futures):
+            writer.write_group("permissions", futures[future], future.result())
+
+def finish_extract(run_id):
+    """Once every entity is extracted, flag the raw run complete and record the watermark."""
+    raw_dir = Path(f"data/raw/{run_id}")
+    raw = RawReader(raw_dir)
+    repos = [slim_repo(repo) for repo in raw.records("repos")]
+    members = list(raw.records("members"))
+    teams = list(raw.records("teams"))
+    mark_complete(raw_dir)
+    record_watermark(run_id, repos, members, teams, {repo["name"] for repo in repos})
+    http_cache.save()
+    logger.info(f"HTTP cache: {http_cache.stats()}")
+    logger.info(f"GitHub tokens: {scheduler.stats()}")
+
+def build_stages(run_id, mode=EXTRACT_MODE, delta_from=None):
+    """
+    Stages of one ELT run. In sync mode every entity is extracted by its own stage, so the
+    org, members, teams, repos and permissions pipelines extract, normalize and load side by
+    side. The other modes extract everything in one stage ahead of the per-table stages.
+    With delta_from, the per-table loads are replaced by a diff against that run and a
+    load of the delta alone. Once every load has finished, the run's effective access is
+    materialized, the run is published, and its access changes are recorded in the history
+    tables.
+    """
+    extractors = {
+        "async": extract_and_write_raw_async,
+        "graphql": extract_and_write_raw_graphql,
+        "incremental": extract_and_write_raw_incremental,
+    }
+    # Registers the run, and with it the time webhook deliveries are replayed from at
+    # publish, before anything is read from GitHub
+    stages = [Stage("create_tables", lambda: ensure_tables_exist(run_id))]
+    if mode in extractors:
+        extracted_by = dict.fromkeys(NORMALIZED_TABLES, "extract")
+        stages.append(Stage("extract", lambda: extractors[mode](run_id), deps=["create_tables"]))
+    else:
+        extracted_by = {
+            "organizations": "extract:org",
+            "members": "extract:members",
+            "teams": "extract:teams",
+            "team_members": "extract:teams",
+            "team_repos": "extract:teams",
+            "repos": "extract:repos",
+            "permissions": "extract:permissions",
+        }
+        stages += [
+            Stage("extract:org", lambda: extract_stage(run_id, extract_org_raw), deps=["create_tables"]),
+            Stage("extract:members", lambda: extract_stage(run_id, extract_members_raw), deps=["create_tables"]),
+            Stage("extract:teams", lambda: extract_stage(run_id, extract_teams_raw), deps=["create_tables"]),
+            Stage("extract:repos", lambda: extract_stage(run_id, extract_repos_raw), deps=["create_tables"]),
+            Stage(
+                "extract:permissions",
+                lambda: extract_stage(run_id, lambda writer: extract_permissions_raw(run_id, writer)),
+                deps=["create_tables", "extract:repos"],
+            ),
+            Stage("extract", lambda: finish_extract(run_id), deps=sorted(set(extracted_by.values()))),
+        ]
+    for table in NORMALIZED_TABLES:
+        stages.append(Stage(f"normalize:{table}", lambda table=table: normalize_table(run_id, table), deps=[extracted_by[table]]))
+        if not delta_from:
+            stages.append(Stage(f"load:{table}", lambda table=table: load_table(run_id, table), deps=[f"normalize:{table}", "create_tables"]))
+    if delta_from:
+        stages.append(Stage("diff", lambda: diff_runs(delta_from, run_id), deps=[f"normalize:{table}" for table in NORMALIZED_TABLES]))
+        stages.append(Stage("load:delta", lambda: load_delta_to_db(delta_from, run_id), deps=["diff", "create_tables"]))
+    loads = [stage.name for stage in stages if stage.name.startswith("load:")]
+    stages.append(Stage("effective_access", lambda: materialize_run(run_id), deps=loads))
+    stages.append(Stage("publish", lambda: publish(run_id, catch_up=catch_up), deps=["effective_access"]))
+    # After the publish, so the run's history includes the webhook deliveries replayed onto it
+    stages.append(Stage("history", lambda: record_run(run_id), deps=["publish"]))
+    return stages
+
+# --- Streaming pipeline ---
+
+def normalize_page(batch, entity, records, key=None):
+    """Normalize one page, or for keyed raw entities one group, of raw records. Returns (table, rows)."""
+    table = next(t for t, raw_entity in NORMALIZED_TABLES.items() if raw_entity == entity)
+    model = TABLE_MODELS[table]
+    if key is None:
+        return table, batch.normalize(table, model, records)
+    if table == "team_repos":
+        records = [{"repo_name": r.get("name"), **r} for r in records]
+    return table, batch.normalize_groups(table, model, [(key, records)], GROUP_KEY_FIELDS[table])
+
+def run_streaming(run_id, concurrency=GH_CONCURRENCY):
+    """
+    Extract with the async extractor while normalizing and loading every page as it arrives.
+    Raw and normalized files are still written to data/raw/{run_id}/ and data/normalized/{run_id}/.
+    """
+    raw_writer = open_raw_writer(run_id)
+    norm_dir = Path(f"data/normalized/{run_id}")
+    norm = NormalizedWriter(norm_dir, NORMALIZED_FORMAT)
+    batch = BatchNormalizer(run_id, datetime.now(timezone.utc), norm_dir)
+    listings = {}
+
+    def produce(sink):
+        repos, teams, members = asyncio.run(extract_all_async(TeeWriter(raw_writer, sink), concurrency))
+        listings.update(repos=repos, teams=teams, members=members)
+
+    def normalize(entity, records, key=None):
+        table, rows = normalize_page(batch, entity, records, key)
+        norm.append(table, TABLE_MODELS[table], rows)
+        return table, rows
+
+    ensure_tables_exist(run_id)
+    pipeline = StreamPipeline(
+        produce, normalize, load_rows,
+        workers=NORMALIZE_WORKERS, queue_size=STREAM_QUEUE_SIZE, batch_size=LOAD_BATCH_SIZE,
+    )
+    try:
+        counts = pipeline.run()
+        raw_writer.close()
+        materialize_run(run_id)
+        publish(run_id, catch_up=catch_up)
+        record_run(run_id)
+        repos = listings["repos"]
+        record_watermark(run_id, repos, listings["members"], listings["teams"], {repo["name"] for repo in repos})
+        logger.info(f"Streamed run {run_id}: {counts['pages']} pages, {counts['rows']} rows in {counts['batches']} batches")
+    except Exception as e:
+        raw_writer.close(complete=False)
+        logger.error(f"Error during streaming run: {e}")
+        raise
+    finally:
+        norm.close()
+        batch.close()
+        http_cache.save()
+        logger.info(f"HTTP cache: {http_cache.stats()}")
+        logger.info(f"GitHub tokens: {scheduler.stats()}")
+
 if __name__ == "__main__":
-    run_id = str(uuid4())
+    parser = argparse.ArgumentParser(description="Extract GitHub org data, normalize it and load it into the database")
+    parser.add_argument("--resume", metavar="RUN_ID", help="continue a failed run, skipping the stages it already finished")
+    parser.add_argument("--delta-from", metavar="BASE_RUN_ID",
+                        help="load only the changes since BASE_RUN_ID, whose data the database already holds")
+    parser.add_argument("--stream", action="store_true",
+                        help="extract, normalize and load concurrently through bounded queues (not resumable)")
+    args = parser.parse_args()
+    if args.stream and (args.resume or args.delta_from):
+        parser.error("--stream cannot be combined with --resume or --delta-from")
+    run_id = args.resume or str(uuid4())
     try:
-        extract_and_write_raw(run_id)
-        normalize_raw_data(run_id)
-        ensure_tables_exist()
-        load_normalized_to_db(run_id)
+        if args.stream:
+            run_streaming(run_id)
+        else:
+            run_dag(build_stages(run_id, delta_from=args.delta_from), Path(f"data/state/runs/{run_id}"), workers=DAG_WORKERS)
         logger.info("ELT process completed successfully.")
     except Exception as e:
         logger.error(f"ELT process failed: {e}")
+        if not args.stream:
+            logger.error(f"Resume with: python app.py --resume {run_id}")
 
 
 # --- Notes ---
@@ -0,0 +1,159 @@
+"""
+Batch normalization of raw GitHub records into the Pydantic models in models.py.
+
+Each entity is validated as one list through a cached TypeAdapter over a TypedDict with
+the model's fields. The per-record work happens inside pydantic-core instead of a Python
+loop, and records come out as plain dicts, equal to model_dump(), without building a
+model instance per record. Nested objects the schema stores flattened (a repo's `owner`
+as owner_login, owner_id, ...) are declared in FLATTENED and expanded from the model's
+own field names. Nested objects the schema stores by id (a team's `parent`) are declared
+in REFERENCES and replaced by their id, as the webhook receiver does.
+
+Records that fail validation are written to {entity}.quarantine.ndjson in the normalized
+run directory with their validation errors, and the rest of the batch is kept.
+"""
+import logging
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+from pydantic import TypeAdapter, ValidationError
+from typing_extensions import TypedDict
+
+import codec
+
+from models import RepoModel, TeamModel
+
+logger = logging.getLogger(__name__)
+
+# Nested raw objects flattened into prefixed model fields: {model: [nested keys]}
+FLATTENED = {
+    RepoModel: ["owner"],
+}
+# Nested raw objects stored as their id: {model: [nested keys]}
+REFERENCES = {
+    TeamModel: ["parent"],
+}
+
+
+@lru_cache(maxsize=None)
+def list_adapter(model):
+    """Validator for a list of records shaped like model, producing dicts in field order."""
+    record_type = TypedDict(f"{model.__name__}Record", {name: info.annotation for name, info in model.model_fields.items()})
+    return TypeAdapter(list[record_type])
+
+
+@lru_cache(maxsize=None)
+def static_defaults(model):
+    """Plain defaults of optional fields, e.g. MemberModel.mfa_enabled = None."""
+    return {
+        name: info.default for name, info in model.model_fields.items()
+        if not info.is_required() and info.default_factory is None
+    }
+
+
+@lru_cache(maxsize=None)
+def flattened_fields(model, key):
+    """(model field, nested field) pairs for a nested key, e.g. ("owner_login", "login")."""
+    prefix = f"{key}_"
+    return tuple((name, name[len(prefix):]) for name in model.model_fields if name.startswith(prefix))
+
+
+def flatten(model, records):
+    """
+    Expand, in place, the nested objects declared for model in FLATTENED into its prefixed
+    fields, and replace those declared in REFERENCES by their id.
+    """
+    for key in FLATTENED.get(model, []):
+        fields = flattened_fields(model, key)
+        for record in records:
+            nested = record.get(key) or {}
+            for name, nested_name in fields:
+                record[name] = nested.get(nested_name)
+    for key in REFERENCES.get(model, []):
+        for record in records:
+            nested = record.get(key)
+            if isinstance(nested, dict):
+                record[key] = nested.get("id")
+    return records
+
+
+class BatchNormalizer:
+    def __init__(self, run_id, now, norm_dir, chunk_size=10_000):
+        self.run_id = run_id
+        self.now = now
+        # A rejected record only forces its own chunk to be validated again
+        self.chunk_size = chunk_size
+        self.norm_dir = Path(norm_dir)
+        self.quarantined = {}
+        self._quarantine_files = {}
+        self._seen = set()
+        # The streaming pipeline shares one normalizer between worker threads
+        self._lock = threading.Lock()
+
+    def quarantine_path(self, entity):
+        return self.norm_dir / f"{entity}.quarantine.ndjson"
+
+    def _meta(self, model, fields):
+        return {**static_defaults(model), "run_id": self.run_id, "created_ts": self.now, "updated_ts": self.now, **fields}
+
+    def normalize(self, entity, model, records, **fields):
+        """
+        Validate raw records against model and return them as model_dump()-style dicts.
+        run_id, created_ts, updated_ts and any extra fields are added to every record.
+        """
+        meta = self._meta(model, fields)
+        return self._validate(entity, model, [{**meta, **record} for record in records])
+
+    def normalize_groups(self, entity, model, groups, key_field, **fields):
+        """normalize for keyed raw entities such as permissions; each group key is stored in key_field."""
+        meta = self._meta(model, fields)
+        return self._validate(
+            entity, model, [{**meta, key_field: key, **record} for key, items in groups for record in items]
+        )
+
+    def _validate(self, entity, model, records):
+        with self._lock:
+            if entity not in self._seen:
+                # Left over from an earlier normalization of the same run
+                self.quarantine_path(entity).unlink(missing_ok=True)
+                self._seen.add(entity)
+        flatten(model, records)
+        adapter = list_adapter(model)
+        normalized = []
+        for start in range(0, len(records), self.chunk_size):
+            chunk = records[start:start + self.chunk_size]
+            try:
+                normalized.extend(adapter.validate_python(chunk))
+            except ValidationError as e:
+                rejected = {}
+                for error in e.errors(include_url=False):
+                    rejected.setdefault(error["loc"][0], []).append(error)
+                self.quarantine(entity, [(chunk[index], errors) for index, errors in rejected.items()])
+                normalized.extend(adapter.validate_python(
+                    [record for index, record in enumerate(chunk) if index not in rejected]
+                ))
+        return normalized
+
+    def quarantine(self, entity, rejected):
+        with self._lock:
+            self._write_quarantine(entity, rejected)
+        logger.warning(f"Quarantined {len(rejected)} {entity} records to {self.quarantine_path(entity)}")
+
+    def _write_quarantine(self, entity, rejected):
+        if entity not in self._quarantine_files:
+            self._quarantine_files[entity] = open(self.quarantine_path(entity), "w")
+        for record, errors in rejected:
+            line = {
+                "entity": entity,
+                "errors": [{"loc": list(err["loc"][1:]), "msg": err["msg"], "type": err["type"]} for err in errors],
+                "record": record,
+            }
+            self._quarantine_files[entity].write(codec.dumps(line))
+            self._quarantine_files[entity].write("\n")
+        self.quarantined[entity] = self.quarantined.get(entity, 0) + len(rejected)
+
+    def close(self):
+        for handle in self._quarantine_files.values():
+            handle.close()
+        self._quarantine_files.clear()
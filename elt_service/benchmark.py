@@ -0,0 +1,139 @@
+"""
+Extraction benchmark against the local fake GitHub (fake_github.py).
+
+Starts a fake org in-process, then runs each requested extraction mode in a fresh
+child process (so peak RSS is the extractor's own) inside one working directory.
+Modes run in order and share the HTTP cache and watermark, so repeating a mode
+shows its warm-cache cost.
+
+    python benchmark.py --repos 10000 --members 5000 --collaborators 50 \\
+        --latency-ms 50 --modes sync,async,async,incremental,graphql
+
+Reports requests served, 304s, wall time, peak RSS and raw bytes written per mode.
+"""
+import os
+import sys
+import json
+import shutil
+import logging
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+
+from fake_github import FakeOrg, FakeGitHub, make_server, build_parser
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+SERVICE_DIR = Path(__file__).resolve().parent
+
+# Runs in the child: one extraction, then report wall time and peak RSS on stdout
+CHILD_SCRIPT = """
+import sys, json, time, resource
+import app
+mode, run_id = sys.argv[1], sys.argv[2]
+extract = {
+    "sync": app.extract_and_write_raw,
+    "async": app.extract_and_write_raw_async,
+    "graphql": app.extract_and_write_raw_graphql,
+    "incremental": app.extract_and_write_raw_incremental,
+}[mode]
+start = time.perf_counter()
+extract(run_id)
+wall = time.perf_counter() - start
+print(json.dumps({"wall_s": wall, "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+"""
+
+
+def dir_size(path):
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+
+
+def run_mode(mode, index, fake, base_url, workdir, args):
+    run_id = f"bench-{index}-{mode}"
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(SERVICE_DIR),
+        "GH_API_URL": base_url,
+        "GH_ORG": fake.org.login,
+        "GH_PAT": ",".join(f"bench-token-{i}" for i in range(args.tokens)),
+        "GH_CONCURRENCY": str(args.concurrency),
+        "GH_RATE_PER_TOKEN": str(args.rate_per_token),
+        "GH_CACHE_DIR": str(workdir / "data" / "cache" / "http"),
+        "WATERMARK_PATH": str(workdir / "data" / "state" / "watermark.json"),
+    }
+    fake.reset()
+    with open(workdir / f"{run_id}.log", "w") as log:
+        result = subprocess.run(
+            [sys.executable, "-c", CHILD_SCRIPT, mode, run_id],
+            cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=log, text=True,
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"{mode} extraction failed; see {workdir / f'{run_id}.log'}")
+    measured = json.loads(result.stdout.strip().splitlines()[-1])
+    served = fake.stats()
+    return {
+        "mode": mode,
+        "requests": served["requests"],
+        "not_modified": served["not_modified"],
+        "rate_limited": served["rate_limited"],
+        "wall_s": round(measured["wall_s"], 2),
+        "peak_rss_mb": round(measured["peak_rss_kb"] / 1024, 1),
+        "raw_mb": round(dir_size(workdir / "data" / "raw" / run_id) / 1024 / 1024, 2),
+    }
+
+
+def print_table(results):
+    columns = ["mode", "requests", "not_modified", "rate_limited", "wall_s", "peak_rss_mb", "raw_mb"]
+    widths = {c: max(len(c), *(len(str(r[c])) for r in results)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for r in results:
+        print("  ".join(str(r[c]).ljust(widths[c]) for c in columns))
+
+
+if __name__ == "__main__":
+    parser = build_parser()
+    parser.description = "Benchmark extraction modes against a fake GitHub org"
+    parser.set_defaults(port=0, quota=1_000_000)
+    parser.add_argument("--modes", default="sync,async,async,incremental,graphql",
+                        help="comma-separated extraction modes, run in order")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--tokens", type=int, default=1)
+    parser.add_argument("--rate-per-token", type=float, default=1_000_000,
+                        help="scheduler pacing; the default effectively disables it")
+    parser.add_argument("--workdir", help="keep outputs here instead of a temporary directory")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    org = FakeOrg(args.org, args.repos, args.members, args.collaborators,
+                  args.teams, args.team_members, args.team_repos)
+    fake = FakeGitHub(org, latency=args.latency_ms / 1000, quota=args.quota, quota_window=args.quota_window)
+    server = make_server(fake, args.host, args.port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://{args.host}:{server.server_port}"
+    org.api_url = base_url
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="elt-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    logger.info(
+        f"Benchmarking against {base_url}: {org.repos} repos, {org.members} members, "
+        f"{org.collaborators} collaborators/repo, {args.latency_ms}ms latency (workdir {workdir})"
+    )
+    results = []
+    try:
+        for index, mode in enumerate(args.modes.split(",")):
+            results.append(run_mode(mode.strip(), index, fake, base_url, workdir, args))
+            logger.info(f"Finished {mode}: {results[-1]}")
+    finally:
+        server.shutdown()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=4))
+    else:
+        print_table(results)
@@ -0,0 +1,97 @@
+"""
+JSON codec benchmark: encode/decode throughput of each installed codec backend on the
+record shapes the pipeline writes, against the json.dumps(indent=4, default=str) calls
+the lakes used before codec.py.
+
+Shapes, built with fake_github.FakeOrg:
+- raw repos: GitHub repo listings, nested owner object included
+- raw permissions: one {"key": repo, "items": [collaborators]} line per repo
+- normalized permissions: PermissionModel records with created_ts/updated_ts datetimes
+
+    python benchmark_codec.py --records 20000 --rounds 5
+"""
+import json
+import time
+import logging
+import argparse
+import tempfile
+from datetime import datetime, timezone
+
+import codec
+from fake_github import FakeOrg
+from models import PermissionModel
+from batch_normalize import BatchNormalizer
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def legacy_encode(obj, pretty, sort_keys):
+    """What raw_store/normalized_store wrote before codec.py."""
+    if pretty:
+        return json.dumps(obj, indent=4, default=str, sort_keys=sort_keys).encode()
+    return json.dumps(obj, default=str, sort_keys=sort_keys).encode()
+
+
+def installed_backends():
+    backends = {"legacy json": (legacy_encode, json.loads)}
+    for name, (module, _, _) in codec.BACKENDS.items():
+        if module is not None:
+            _, encode_fn, decode_fn = codec.select_backend(name)
+            backends[name] = (encode_fn, decode_fn)
+    return backends
+
+
+def best_of(rounds, fn):
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench(shape, documents, backends, rounds, pretty=False):
+    """documents: list of objects encoded one by one, like lines of an ndjson file."""
+    count = len(documents)
+    for name, (encode_fn, decode_fn) in backends.items():
+        encode_s, encoded = best_of(rounds, lambda: [encode_fn(doc, pretty, False) for doc in documents])
+        decode_s, _ = best_of(rounds, lambda: [decode_fn(data) for data in encoded])
+        size = sum(len(data) for data in encoded)
+        print(
+            f"{shape:<24} {name:<12} encode {count / encode_s:>12,.0f}/s  "
+            f"decode {count / decode_s:>12,.0f}/s  {size / 1e6:8.2f} MB"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the JSON codec backends")
+    parser.add_argument("--records", type=int, default=20_000)
+    parser.add_argument("--rounds", type=int, default=5, help="best of this many rounds is reported")
+    args = parser.parse_args()
+
+    collaborators = 50
+    org = FakeOrg(repos=max(1, args.records // collaborators), members=5000, collaborators=collaborators)
+    repos = [org.repo(i) for i in range(args.records)]
+    groups = [
+        {"key": f"repo-{repo}", "items": [org.collaborator(repo, i) for i in range(collaborators)]}
+        for repo in range(org.repos)
+    ]
+    with tempfile.TemporaryDirectory() as norm_dir:
+        normalizer = BatchNormalizer("benchmark", datetime.now(timezone.utc), norm_dir)
+        permissions = normalizer.normalize_groups(
+            "permissions", PermissionModel, ((group["key"], group["items"]) for group in groups), "repo_name"
+        )
+        normalizer.close()
+
+    backends = installed_backends()
+    logger.info(f"Backends: {', '.join(backends)}; codec.py uses {codec.BACKEND}")
+    bench("raw repos", repos, backends, args.rounds)
+    bench("raw permissions", groups, backends, args.rounds)
+    bench("normalized permissions", permissions, backends, args.rounds)
+    # Whole-table documents, as the json formats write them
+    bench("normalized table pretty", [permissions], backends, args.rounds, pretty=True)
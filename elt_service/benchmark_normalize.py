@@ -0,0 +1,101 @@
+"""
+Normalization benchmark: per-record Pydantic models versus BatchNormalizer.
+
+Builds synthetic permissions and repos with fake_github.FakeOrg, then times the
+original one-model-per-record loop against batch validation of the same input.
+
+    python benchmark_normalize.py --permissions 100000 --repos 10000 --invalid 100
+
+Only validation and dumping are timed; reading raw files and writing output are not.
+"""
+import time
+import logging
+import argparse
+import tempfile
+from datetime import datetime, timezone
+
+from fake_github import FakeOrg
+from models import PermissionModel, RepoModel
+from batch_normalize import BatchNormalizer
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+OWNER_FIELDS = [
+    "login", "id", "node_id", "avatar_url", "gravatar_id", "url", "html_url", "followers_url",
+    "following_url", "gists_url", "starred_url", "subscriptions_url", "organizations_url",
+    "repos_url", "events_url", "received_events_url", "type", "user_view_type", "site_admin",
+]
+
+
+def per_record_permissions(run_id, now, permissions):
+    """The per-record normalization loop used before BatchNormalizer."""
+    perm_objs = []
+    for repo_name, perms in permissions.items():
+        for perm in perms:
+            perm_data = {"repo_name": repo_name, **perm}
+            try:
+                perm_objs.append(PermissionModel(run_id=run_id, created_ts=now, updated_ts=now, **perm_data).model_dump())
+            except Exception:
+                pass
+    return perm_objs
+
+
+def per_record_repos(run_id, now, repos):
+    repo_objs = []
+    for r in repos:
+        owner = r.get("owner", {})
+        repo_flat = {**r, **{f"owner_{field}": owner.get(field) for field in OWNER_FIELDS}}
+        try:
+            repo_objs.append(RepoModel(run_id=run_id, created_ts=now, updated_ts=now, **repo_flat).model_dump())
+        except Exception:
+            pass
+    return repo_objs
+
+
+def batch_permissions(normalizer, permissions):
+    return normalizer.normalize_groups("permissions", PermissionModel, permissions.items(), "repo_name")
+
+
+def batch_repos(normalizer, repos):
+    return normalizer.normalize("repos", RepoModel, repos)
+
+
+def timed(label, count, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {count:>9} records  {elapsed:8.2f}s  {count / elapsed:>12,.0f} records/s  ({len(result)} kept)")
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-record versus batch normalization")
+    parser.add_argument("--permissions", type=int, default=100_000)
+    parser.add_argument("--repos", type=int, default=10_000)
+    parser.add_argument("--invalid", type=int, default=0, help="permissions with a bad login, to exercise quarantine")
+    args = parser.parse_args()
+
+    collaborators = 50
+    org = FakeOrg(repos=max(1, args.permissions // collaborators), members=5000, collaborators=collaborators)
+    permissions = {
+        f"repo-{repo}": [org.collaborator(repo, i) for i in range(collaborators)]
+        for repo in range(org.repos)
+    }
+    for perm in [perm for perms in permissions.values() for perm in perms][:args.invalid]:
+        perm["login"] = {"not": "a string"}
+    repos = [org.repo(i) for i in range(args.repos)]
+    total = sum(len(perms) for perms in permissions.values())
+
+    run_id = "benchmark"
+    now = datetime.now(timezone.utc)
+    with tempfile.TemporaryDirectory() as norm_dir:
+        normalizer = BatchNormalizer(run_id, now, norm_dir)
+        timed("per-record permissions", total, lambda: per_record_permissions(run_id, now, permissions))
+        timed("batch permissions", total, lambda: batch_permissions(normalizer, permissions))
+        timed("per-record repos", len(repos), lambda: per_record_repos(run_id, now, repos))
+        timed("batch repos", len(repos), lambda: batch_repos(normalizer, repos))
+        normalizer.close()
@@ -0,0 +1,74 @@
+"""
+Startup benchmark: cold import time of the service entry points, each imported by a
+fresh interpreter under `python -X importtime`, as the one-shot ELT container does on
+every schedule tick.
+
+For each module it prints the median wall time of the interpreter and the median
+cumulative import time of the module. It also prints the top-level packages that take
+the most import time, and whether the database driver was loaded. The engine is built
+on first use (db.py), so importing a module should not load psycopg.
+
+    python benchmark_startup.py --modules models,app --rounds 15
+"""
+import sys
+import time
+import logging
+import argparse
+import statistics
+import subprocess
+from collections import defaultdict
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+DRIVERS = ("psycopg", "psycopg2")
+
+
+def import_once(module):
+    """(wall seconds, cumulative import us of module, self us per top-level package, driver loaded)"""
+    code = f"import sys, {module}; print(any(name in sys.modules for name in {DRIVERS!r}))"
+    start = time.perf_counter()
+    done = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+    cumulative = 0
+    packages = defaultdict(int)
+    for line in done.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        packages[name.strip().split(".")[0]] += int(self_us)
+        if name.strip() == module:
+            cumulative = int(cumulative_us)
+    return wall, cumulative, packages, done.stdout.strip() == "True"
+
+
+def bench(module, rounds, top):
+    results = [import_once(module) for _ in range(rounds)]
+    wall = statistics.median(result[0] for result in results)
+    cumulative = statistics.median(result[1] for result in results)
+    packages = defaultdict(list)
+    for _, _, by_package, _ in results:
+        for name, self_us in by_package.items():
+            packages[name].append(self_us)
+    slowest = sorted(((statistics.median(times), name) for name, times in packages.items()), reverse=True)[:top]
+    print(
+        f"{module:<12} wall {wall * 1000:7.0f} ms  import {cumulative / 1000:7.0f} ms  "
+        f"driver loaded: {'yes' if results[0][3] else 'no'}"
+    )
+    for self_us, name in slowest:
+        print(f"    {name:<24} {self_us / 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark cold import time of the service modules")
+    parser.add_argument("--modules", default="models,app", help="comma-separated modules to import")
+    parser.add_argument("--rounds", type=int, default=15, help="median of this many interpreters is reported")
+    parser.add_argument("--top", type=int, default=8, help="slowest top-level packages listed per module")
+    args = parser.parse_args()
+
+    logger.info(f"Python {sys.version.split()[0]}, {args.rounds} rounds")
+    for module in args.modules.split(","):
+        bench(module, args.rounds, args.top)
@@ -0,0 +1,147 @@
+"""
+Bulk loader for PostgreSQL: COPY into a staging table, then one INSERT ... ON CONFLICT.
+
+For each table, in one transaction:
+
+1. Create the temp table stage_{table} with the loaded columns of {table}, without
+   constraints. Temp tables are not WAL-logged and are dropped on commit.
+2. COPY the normalized records into it, one COPY per batch, so a table is never held
+   in memory whole. Batches of records are sent in PostgreSQL's text format. Arrow
+   record batches read straight from Parquet are written out as CSV by pyarrow, so
+   their rows never become Python objects.
+3. INSERT INTO {table} SELECT ... FROM the staging table ON CONFLICT (key) DO UPDATE.
+   The key is CONFLICT_KEYS[table]. The last staged row wins for a key staged twice,
+   as it would with session.merge. created_ts of rows that already exist is kept.
+
+Tables keyed by GitHub's id conflict on the primary key, (id, run_id). Permissions and
+team access have surrogate ids, so they conflict on their natural key per run, the
+unique index created by migrations.py.
+"""
+import io
+import time
+import logging
+from datetime import date, datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = pa_csv = None
+
+import codec
+from migrations import NATURAL_KEYS
+
+logger = logging.getLogger(__name__)
+
+# Upsert key per table: GitHub's id per run where the records carry one, else the natural key
+CONFLICT_KEYS = {
+    "organizations": ("id", "run_id"),
+    "members": ("id", "run_id"),
+    "teams": ("id", "run_id"),
+    "repos": ("id", "run_id"),
+    **NATURAL_KEYS,
+}
+# Kept from the existing row on update
+PRESERVED_COLUMNS = {"id", "created_ts"}
+
+
+def escape(text):
+    """Backslash-escape the characters COPY text format treats specially."""
+    return text.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def copy_value(value):
+    """One field in COPY text format."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, str):
+        return escape(value)
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return escape(codec.dumps(value))
+    return str(value)
+
+
+def copy_text(records, columns):
+    buffer = io.StringIO()
+    for record in records:
+        buffer.write("\t".join(copy_value(record.get(column)) for column in columns))
+        buffer.write("\n")
+    buffer.seek(0)
+    return buffer
+
+
+def arrow_csv(batch, columns):
+    """An Arrow record batch as CSV; nulls stay unquoted and empty strings quoted, as COPY expects."""
+    buffer = io.BytesIO()
+    table = pa.Table.from_batches([batch]).select(columns)
+    pa_csv.write_csv(table, buffer, pa_csv.WriteOptions(include_header=False, quoting_style="all_valid"))
+    buffer.seek(0)
+    return buffer
+
+
+def copy_from(cursor, sql, buffer):
+    """COPY ... FROM STDIN on a psycopg2 or psycopg 3 cursor."""
+    if hasattr(cursor, "copy_expert"):
+        cursor.copy_expert(sql, buffer)
+    else:
+        with cursor.copy(sql) as copy:
+            copy.write(buffer.getvalue())
+
+
+def quote(name):
+    return f'"{name}"'
+
+
+def upsert_sql(table, stage, columns, key):
+    column_list = ", ".join(map(quote, columns))
+    updates = ", ".join(
+        f"{quote(column)} = EXCLUDED.{quote(column)}"
+        for column in columns if column not in key and column not in PRESERVED_COLUMNS
+    )
+    key_list = ", ".join(map(quote, key))
+    # DISTINCT ON keeps one row per key, the last one copied (highest ctid)
+    return (
+        f"INSERT INTO {table} ({column_list}) "
+        f"SELECT DISTINCT ON ({key_list}) {column_list} FROM {stage} ORDER BY {key_list}, ctid DESC "
+        f"ON CONFLICT ({key_list}) DO UPDATE SET {updates}"
+    )
+
+
+def bulk_load(engine, table, batches, columns):
+    """
+    COPY + upsert every batch of one table in a single transaction. A batch is a list of
+    records or an Arrow record batch. columns: the table's columns present in the batches.
+    Returns the number of rows staged.
+    """
+    if engine.dialect.name != "postgresql":
+        raise RuntimeError(f"LOAD_MODE=copy requires PostgreSQL, not {engine.dialect.name}")
+    key = CONFLICT_KEYS[table]
+    stage = f"stage_{table}"
+    start = time.perf_counter()
+    rows = 0
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        column_list = ", ".join(map(quote, columns))
+        cursor.execute(f"CREATE TEMP TABLE {stage} ON COMMIT DROP AS SELECT {column_list} FROM {table} WITH NO DATA")
+        copy = f"COPY {stage} ({column_list}) FROM STDIN"
+        for batch in batches:
+            if pa is not None and isinstance(batch, pa.RecordBatch):
+                copy_from(cursor, f"{copy} WITH (FORMAT csv)", arrow_csv(batch, columns))
+            elif batch:
+                copy_from(cursor, copy, copy_text(batch, columns))
+            rows += len(batch)
+        cursor.execute(upsert_sql(table, stage, columns, key))
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+    seconds = time.perf_counter() - start
+    logger.info(f"Bulk loaded {rows} {table} rows in {seconds:.2f}s ({rows / max(seconds, 1e-9):,.0f} rows/s)")
+    return rows
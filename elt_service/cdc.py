@@ -0,0 +1,175 @@
+"""
+Change data capture between two runs of normalized data.
+
+diff_runs(base_run_id, run_id) indexes every normalized table of both runs by its key
+(TABLE_KEYS) with a SHA-256 of the record's content, run metadata excluded. Records that
+carry a GitHub id are keyed on it, so a renamed repo, team or member is one modified
+record; the access tables are keyed on their natural key. It writes data/diff/{base_run_id}__{run_id}/:
+
+- {table}.ndjson: one change per line,
+  {"op": "added" | "removed" | "modified", "key": {...}, "changed": [...], "before": {...}, "record": {...}}
+  "changed"/"before" (modified only) name the fields that differ and their old values;
+  "record" is the new record, or the old one for "removed".
+- summary.json: added/removed/modified/unchanged counts per table.
+
+apply_delta() replays a delta directory against a copy of base_run_id's rows made under
+run_id (snapshots.copy_run), so run_id's rows are complete without reloading unchanged ones.
+
+    python cdc.py BASE_RUN_ID RUN_ID
+"""
+import hashlib
+import logging
+import argparse
+from pathlib import Path
+from datetime import datetime, timezone
+
+from sqlalchemy import DateTime
+
+import codec
+from normalized_store import NormalizedReader
+
+logger = logging.getLogger(__name__)
+
+# Key of each normalized table: GitHub's id where the records carry one, else the natural key
+TABLE_KEYS = {
+    "organizations": ("id",),
+    "members": ("id",),
+    "teams": ("id",),
+    "repos": ("id",),
+    "permissions": ("repo_name", "login"),
+    "team_members": ("team_slug", "login"),
+    "team_repos": ("team_slug", "repo_name"),
+}
+# Set per run, so never a change by themselves
+META_FIELDS = {"run_id", "created_ts", "updated_ts"}
+
+OPS = ("added", "removed", "modified")
+# Order apply_delta replays a table's changes in, so a removed key is gone before it is reused
+APPLY_ORDER = ("removed", "modified", "added")
+
+
+def delta_dir(base_run_id, run_id):
+    return Path(f"data/diff/{base_run_id}__{run_id}")
+
+
+def content_hash(record):
+    content = {field: value for field, value in record.items() if field not in META_FIELDS}
+    return hashlib.sha256(codec.encode(content, sort_keys=True)).hexdigest()
+
+
+def index_table(reader, table):
+    """{key tuple: (content hash, record)} over one normalized table."""
+    fields = TABLE_KEYS[table]
+    index = {}
+    for batch in reader.batches(table):
+        for record in batch:
+            index[tuple(record.get(field) for field in fields)] = (content_hash(record), record)
+    return index
+
+
+def diff_table(base, new, table, out):
+    """Write the changes of one table to out; returns counts per op."""
+    fields = TABLE_KEYS[table]
+    counts = dict.fromkeys(OPS + ("unchanged",), 0)
+
+    def emit(op, key, record, **extra):
+        out.write(codec.dumps({"op": op, "key": dict(zip(fields, key)), **extra, "record": record}))
+        out.write("\n")
+        counts[op] += 1
+
+    for key, (digest, record) in new.items():
+        previous = base.get(key)
+        if previous is None:
+            emit("added", key, record)
+        elif previous[0] != digest:
+            old = previous[1]
+            changed = sorted(
+                field for field in record.keys() | old.keys()
+                if field not in META_FIELDS and record.get(field) != old.get(field)
+            )
+            emit("modified", key, record, changed=changed, before={field: old.get(field) for field in changed})
+        else:
+            counts["unchanged"] += 1
+    for key, (_, record) in base.items():
+        if key not in new:
+            emit("removed", key, record)
+    return counts
+
+
+def diff_runs(base_run_id, run_id):
+    """Diff the normalized data of two runs into data/diff/{base_run_id}__{run_id}/. Returns the summary."""
+    base_reader = NormalizedReader(Path(f"data/normalized/{base_run_id}"))
+    new_reader = NormalizedReader(Path(f"data/normalized/{run_id}"))
+    out_dir = delta_dir(base_run_id, run_id)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    summary = {
+        "base_run_id": base_run_id,
+        "run_id": run_id,
+        "created_ts": datetime.now(timezone.utc).isoformat(),
+        "tables": {},
+    }
+    for table in TABLE_KEYS:
+        if not (base_reader.exists(table) and new_reader.exists(table)):
+            logger.info(f"Skipping diff of {table}: missing from one of the runs")
+            continue
+        with open(out_dir / f"{table}.ndjson", "w") as out:
+            summary["tables"][table] = diff_table(
+                index_table(base_reader, table), index_table(new_reader, table), table, out
+            )
+        logger.info(f"Diff {table}: {summary['tables'][table]}")
+    with open(out_dir / "summary.json", "wb") as f:
+        codec.dump(summary, f, pretty=True)
+    return summary
+
+
+def iter_changes(out_dir, table):
+    path = Path(out_dir) / f"{table}.ndjson"
+    if not path.exists():
+        return
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield codec.decode(line)
+
+
+def row_values(cls, record):
+    """A delta record as column values; datetimes come back from the ndjson as text."""
+    columns = [column.name for column in cls.__table__.columns if isinstance(column.type, DateTime)]
+    return codec.parse_datetimes([dict(record)], columns)[0]
+
+
+def apply_delta(session, out_dir, table_classes, run_id):
+    """
+    Apply a delta directory to run_id's rows, a copy of the base run's, through session;
+    the caller commits. Removed records are deleted by key first, then modified ones are
+    updated in place (keeping created_ts and the row id), then added ones are merged.
+    Each table is flushed before the next, so no pending merge meets a later bulk statement.
+    """
+    applied = {}
+    for table, cls in table_classes.items():
+        counts = dict.fromkeys(OPS, 0)
+        for op in APPLY_ORDER:
+            for change in iter_changes(out_dir, table):
+                if change["op"] != op:
+                    continue
+                match = session.query(cls).filter_by(run_id=run_id, **change["key"])
+                if op == "added":
+                    session.merge(cls(**row_values(cls, change["record"])))
+                elif op == "modified":
+                    values = {k: v for k, v in row_values(cls, change["record"]).items() if k not in ("id", "created_ts")}
+                    match.update(values, synchronize_session=False)
+                else:
+                    match.delete(synchronize_session=False)
+                counts[op] += 1
+        session.flush()
+        applied[table] = counts
+    return applied
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    parser = argparse.ArgumentParser(description="Diff the normalized data of two runs")
+    parser.add_argument("base_run_id")
+    parser.add_argument("run_id")
+    args = parser.parse_args()
+    summary = diff_runs(args.base_run_id, args.run_id)
+    print(codec.dumps(summary["tables"], pretty=True))
@@ -0,0 +1,149 @@
+"""
+Chunked loading: a normalized table is written LOAD_BATCH_SIZE rows at a time, each
+chunk in its own transaction, with up to LOAD_WORKERS chunks of the table in flight on
+a thread pool. Each worker holds one pooled connection, so a large table needs no
+single long transaction. Only a bounded number of chunks is ever read ahead of the
+database.
+
+A chunk that fails is retried LOAD_RETRIES times with exponential backoff, which rides
+out deadlocks, dropped connections and failovers. If it keeps failing, it is split in
+halves and each half is written on its own, down to single rows. The rows that still
+fail are written with their error to {table}.load_quarantine.ndjson in the normalized
+run directory, and the rest of the table is kept. Once the table is done, the load
+raises QuarantinedRows: its stage fails and the run is not published without those rows.
+Resuming the run loads the table again. The load is abandoned early once more than
+LOAD_MAX_QUARANTINED rows of a table have been quarantined. At that point the database,
+not the data, is the likely problem, and the run can be resumed once it is fixed.
+Chunks are upserts, so rewriting chunks an earlier attempt already committed is
+harmless.
+
+ChunkLoader(write, ...) takes the function that writes one chunk in one transaction,
+app.load_rows, so chunks go through session.merge or COPY as LOAD_MODE says.
+"""
+import os
+import time
+import logging
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import codec
+
+logger = logging.getLogger(__name__)
+
+# Chunks of one table written at the same time, each over its own pooled connection. With
+# every table loading at once this many connections per table must fit in the engine pool
+LOAD_WORKERS = int(os.getenv("LOAD_WORKERS", 2))
+LOAD_RETRIES = int(os.getenv("LOAD_RETRIES", 3))
+# Seconds before the first retry of a chunk; doubled for every further attempt
+LOAD_RETRY_BACKOFF = float(os.getenv("LOAD_RETRY_BACKOFF", 0.5))
+LOAD_MAX_QUARANTINED = int(os.getenv("LOAD_MAX_QUARANTINED", 100))
+
+
+class TooManyQuarantined(Exception):
+    pass
+
+
+class QuarantinedRows(Exception):
+    pass
+
+
+def quarantine_path(norm_dir, table):
+    return Path(norm_dir) / f"{table}.load_quarantine.ndjson"
+
+
+class ChunkLoader:
+    """Load one table's chunks through write(table, rows), committing each chunk on its own."""
+
+    def __init__(self, write, table, norm_dir, workers=LOAD_WORKERS, retries=LOAD_RETRIES,
+                 backoff=LOAD_RETRY_BACKOFF, max_quarantined=LOAD_MAX_QUARANTINED):
+        self.write = write
+        self.table = table
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.max_quarantined = max_quarantined
+        self.path = quarantine_path(norm_dir, table)
+        self.loaded = 0
+        self.quarantined = 0
+        self.chunks = 0
+        self.retried = 0
+        self._lock = threading.Lock()
+        self._quarantine_file = None
+
+    def _attempt(self, rows, retries):
+        """Write rows, retrying with backoff; returns the last error, or None once written."""
+        for attempt in range(retries + 1):
+            try:
+                self.write(self.table, rows)
+                return None
+            except Exception as e:
+                error = e
+                if attempt < retries:
+                    with self._lock:
+                        self.retried += 1
+                    time.sleep(self.backoff * 2 ** attempt)
+        return error
+
+    def _load_chunk(self, rows, retries):
+        error = self._attempt(rows, retries)
+        if error is None:
+            with self._lock:
+                self.loaded += len(rows)
+            return
+        if len(rows) == 1:
+            self._quarantine(rows[0], error)
+            return
+        # Isolate the failing rows; a deterministic error needs no more retries
+        middle = len(rows) // 2
+        self._load_chunk(rows[:middle], 0)
+        self._load_chunk(rows[middle:], 0)
+
+    def _quarantine(self, record, error):
+        with self._lock:
+            if self._quarantine_file is None:
+                self._quarantine_file = open(self.path, "w")
+            self._quarantine_file.write(codec.dumps({"table": self.table, "error": str(error), "record": record}))
+            self._quarantine_file.write("\n")
+            self.quarantined += 1
+            over = self.quarantined > self.max_quarantined
+        logger.warning(f"Quarantined a {self.table} row to {self.path}: {error}")
+        if over:
+            raise TooManyQuarantined(f"more than {self.max_quarantined} {self.table} rows failed to load")
+
+    def load(self, chunks):
+        """
+        Write every chunk; returns {"rows", "chunks", "retried", "quarantined", "seconds"}.
+        Raises QuarantinedRows after writing the rest if any rows were quarantined.
+        """
+        self.path.unlink(missing_ok=True)
+        start = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"load-{self.table}") as pool:
+                pending = set()
+                for rows in chunks:
+                    if not rows:
+                        continue
+                    # Read ahead at most one chunk per worker
+                    if len(pending) >= self.workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+                    pending.add(pool.submit(self._load_chunk, rows, self.retries))
+                    self.chunks += 1
+                for future in pending:
+                    future.result()
+        finally:
+            if self._quarantine_file is not None:
+                self._quarantine_file.close()
+        seconds = time.perf_counter() - start
+        logger.info(
+            f"Loaded {self.loaded} {self.table} rows in {self.chunks} chunks in {seconds:.2f}s "
+            f"({self.loaded / max(seconds, 1e-9):,.0f} rows/s, {self.retried} retries, {self.quarantined} quarantined)"
+        )
+        if self.quarantined:
+            raise QuarantinedRows(f"{self.quarantined} {self.table} rows failed to load; see {self.path}")
+        return {
+            "rows": self.loaded, "chunks": self.chunks, "retried": self.retried,
+            "quarantined": self.quarantined, "seconds": seconds,
+        }
@@ -0,0 +1,108 @@
+"""
+Minimal DAG executor for the ELT stages of one run.
+
+Stages run on a thread pool as soon as every stage they depend on has finished, so
+independent entity pipelines (org, members, teams, repos, permissions) extract,
+normalize and load side by side. Each finished stage leaves a marker file
+{stage}.done in the run's marker directory. Running the same run_id again skips
+every stage that has a marker, so after a failure only the failed stage and the
+stages downstream of it run again.
+"""
+import time
+import logging
+from pathlib import Path
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import codec
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    def __init__(self, name, fn, deps=()):
+        self.name = name
+        self.fn = fn
+        self.deps = list(deps)
+
+
+class StageFailed(Exception):
+    def __init__(self, failed, skipped):
+        self.failed = failed
+        self.skipped = skipped
+        message = f"stage(s) failed: {', '.join(sorted(failed))}"
+        if skipped:
+            message += f"; skipped downstream: {', '.join(sorted(skipped))}"
+        super().__init__(message)
+
+
+def marker_path(marker_dir, name):
+    return Path(marker_dir) / f"{name.replace(':', '.')}.done"
+
+
+def is_done(marker_dir, name):
+    return marker_path(marker_dir, name).exists()
+
+
+def mark_done(marker_dir, name, seconds):
+    path = marker_path(marker_dir, name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        codec.dump({"stage": name, "finished_ts": datetime.now(timezone.utc).isoformat(), "seconds": round(seconds, 3)}, f)
+
+
+def run_dag(stages, marker_dir, workers=4):
+    """
+    Run stages in dependency order, up to `workers` at a time.
+    A failed stage stops its downstream stages; unrelated stages still run to completion.
+    Raises StageFailed naming the failed stages once nothing else can run.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        missing = [dep for dep in stage.deps if dep not in by_name]
+        if missing:
+            raise ValueError(f"Stage {stage.name} depends on unknown stage(s) {missing}")
+
+    done = {stage.name for stage in stages if is_done(marker_dir, stage.name)}
+    if done:
+        logger.info(f"Skipping {len(done)} finished stage(s): {', '.join(sorted(done))}")
+    pending = [stage for stage in stages if stage.name not in done]
+    failed = set()
+    skipped = set()
+    running = {}
+
+    def run(stage):
+        start = time.perf_counter()
+        logger.info(f"Stage {stage.name} started")
+        stage.fn()
+        seconds = time.perf_counter() - start
+        mark_done(marker_dir, stage.name, seconds)
+        logger.info(f"Stage {stage.name} finished in {seconds:.1f}s")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            blocked = True
+            while blocked:
+                blocked = [stage for stage in pending if any(dep in failed | skipped for dep in stage.deps)]
+                for stage in blocked:
+                    logger.warning(f"Stage {stage.name} skipped: an upstream stage failed")
+                    skipped.add(stage.name)
+                    pending.remove(stage)
+            for stage in [stage for stage in pending if all(dep in done for dep in stage.deps)]:
+                running[pool.submit(run, stage)] = stage
+                pending.remove(stage)
+            if not running:
+                if pending:
+                    raise ValueError(f"Dependency cycle among stages {[stage.name for stage in pending]}")
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = running.pop(future)
+                try:
+                    future.result()
+                    done.add(stage.name)
+                except Exception as e:
+                    logger.error(f"Stage {stage.name} failed: {e}")
+                    failed.add(stage.name)
+    if failed:
+        raise StageFailed(failed, skipped)
@@ -0,0 +1,66 @@
+"""
+Database settings and the one engine shared by the ELT service, the webhook receiver and
+the gRPC API (which ships a copy of this file, like models.py and codec.py).
+
+Nothing is read or built at import. The first call to get_engine() loads .env and
+creates the engine. Creating it imports the PostgreSQL dialect and the psycopg driver,
+and that happens only once the database is actually used. SessionLocal() opens a session
+on the engine.
+
+The pool holds DB_POOL_SIZE connections, plus up to DB_MAX_OVERFLOW more under load.
+Chunked loads (LOAD_COMMIT=chunk) use up to LOAD_WORKERS connections per table at once,
+and the gRPC server uses one per worker thread. Connections are checked with a ping
+before use, so a restarted database costs a reconnect instead of a failed request.
+
+    python -X importtime app.py --help 2> importtime.log    # import profile
+"""
+import os
+import threading
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from dotenv import load_dotenv, find_dotenv
+
+_engine = None
+_sessions = None
+_lock = threading.Lock()
+
+
+def database_url():
+    host = os.environ.get("DB_HOSTNAME", "localhost")
+    name = os.environ.get("DB_NAME", "postgres")
+    user = os.environ.get("DB_USER", "postgres")
+    password = os.environ.get("DB_PASSWORD", "postgres")
+    port = os.environ.get("DB_PORT", 5432)
+    return f"postgresql://{user}:{password}@{host}:{port}/{name}"
+
+
+def pool_settings():
+    return {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 10)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 10)),
+        # Seconds to wait for a free connection before failing
+        "pool_timeout": float(os.environ.get("DB_POOL_TIMEOUT", 30)),
+        # Connections older than this many seconds are replaced; -1 keeps them
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+    }
+
+
+def get_engine():
+    """The shared engine, created on first use."""
+    global _engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                load_dotenv(find_dotenv())
+                _engine = create_engine(database_url(), **pool_settings())
+    return _engine
+
+
+def SessionLocal():
+    """A new session on the shared engine."""
+    global _sessions
+    if _sessions is None:
+        _sessions = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+    return _sessions()
@@ -0,0 +1,183 @@
+"""
+Effective access: one row per repo and user or team holding a role on it in a run, with
+the highest role the principal holds and, for a user, the team it comes through.
+
+Grants come from three tables of the run:
+
+- permissions: a collaborator's role on a repo (via_team NULL)
+- team_repos: a team's role on a repo (principal_type "team", via_team NULL)
+- team_repos joined with team_members: each member of the team gets the team's role
+  (via_team the team)
+
+A user holding several grants on a repo gets one row for the highest role (ROLE_RANK).
+A direct grant wins a tie with a team grant. Ties between teams go to the first team
+slug in order.
+
+The table is run-scoped like the tables it is derived from. materialize_run(run_id)
+starts from the rows of the published run. It diffs the two runs' access tables and
+recomputes only the repos whose grants changed, and the repos of the teams whose
+membership changed. The webhook receiver refreshes the repos and teams each delivery
+touches in the current run in the same way. The gRPC API reads access for a repo with
+one lookup on the primary key, (run_id, repo_name, ...).
+
+    python effective_access.py RUN_ID            # materialize a loaded run
+    python effective_access.py RUN_ID --full     # recompute every repo of it
+"""
+import logging
+import argparse
+from datetime import datetime, timezone
+
+from sqlalchemy import bindparam, text
+
+from models import EffectiveAccess
+from snapshots import current_run_id
+from db import get_engine
+
+logger = logging.getLogger(__name__)
+
+TABLE = EffectiveAccess.__tablename__
+# Repository roles from least to most access; "pull" and "push" are the older names
+# of read and write. Custom roles rank below read
+ROLE_RANK = {"read": 1, "pull": 1, "triage": 2, "write": 3, "push": 3, "maintain": 4, "admin": 5}
+
+# Access table: (column naming the repo or team a change touches, columns compared across runs)
+CHANGES = {
+    "permissions": ("repo_name", ("repo_name", "login", "role_name")),
+    "team_repos": ("repo_name", ("team_slug", "repo_name", "role_name")),
+    "team_members": ("team_slug", ("team_slug", "login")),
+}
+
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def rank_sql(column):
+    cases = " ".join(f"WHEN '{role}' THEN {rank}" for role, rank in ROLE_RANK.items())
+    return f"CASE {column} {cases} ELSE 0 END"
+
+
+def grants_sql(scoped):
+    """Every grant of :run_id, limited to the repos in :repos when scoped."""
+    scope = " AND repo_name IN :repos" if scoped else ""
+    team_scope = " AND tr.repo_name IN :repos" if scoped else ""
+    return (
+        "SELECT run_id, repo_name, 'user' AS principal_type, login AS principal, role_name AS role, "
+        "CAST(NULL AS VARCHAR) AS via_team "
+        f"FROM permissions WHERE run_id = :run_id AND repo_name IS NOT NULL AND login IS NOT NULL{scope} "
+        "UNION ALL "
+        "SELECT run_id, repo_name, 'team', team_slug, role_name, NULL "
+        f"FROM team_repos WHERE run_id = :run_id AND repo_name IS NOT NULL AND team_slug IS NOT NULL{scope} "
+        "UNION ALL "
+        "SELECT tr.run_id, tr.repo_name, 'user', tm.login, tr.role_name, tr.team_slug "
+        "FROM team_repos tr JOIN team_members tm ON tm.run_id = tr.run_id AND tm.team_slug = tr.team_slug "
+        f"WHERE tr.run_id = :run_id AND tr.repo_name IS NOT NULL AND tm.login IS NOT NULL{team_scope}"
+    )
+
+
+def best_grants_sql(grants):
+    """The highest-ranked of the grants each principal holds on each repo, ties broken as described above."""
+    return (
+        "SELECT * FROM (SELECT g.*, ROW_NUMBER() OVER (PARTITION BY repo_name, principal_type, principal "
+        f"ORDER BY {rank_sql('role')} DESC, via_team IS NOT NULL, via_team) AS n "
+        f"FROM ({grants}) g) ranked WHERE n = 1"
+    )
+
+
+def changed_scopes(connection, base_run_id, run_id):
+    """Repos whose grants differ between two runs, and teams whose members differ."""
+    found = {}
+    for table, (scope, columns) in CHANGES.items():
+        column_list = ", ".join(columns)
+        query = text(
+            f"SELECT {scope} FROM (SELECT {column_list} FROM {table} WHERE run_id = :a "
+            f"EXCEPT SELECT {column_list} FROM {table} WHERE run_id = :b) d "
+            f"UNION SELECT {scope} FROM (SELECT {column_list} FROM {table} WHERE run_id = :b "
+            f"EXCEPT SELECT {column_list} FROM {table} WHERE run_id = :a) d"
+        )
+        found[table] = {name for (name,) in connection.execute(query, {"a": run_id, "b": base_run_id}) if name}
+    return found["permissions"] | found["team_repos"], found["team_members"]
+
+
+def affected_repos(connection, run_id, repos, teams):
+    """repos, plus every repo the teams have access to in run_id now or had in its effective access."""
+    affected = set(repos)
+    if teams:
+        query = text(
+            "SELECT repo_name FROM team_repos WHERE run_id = :run_id AND team_slug IN :teams "
+            f"UNION SELECT repo_name FROM {TABLE} "
+            "WHERE run_id = :run_id AND principal_type = 'team' AND principal IN :teams"
+        ).bindparams(bindparam("teams", expanding=True))
+        affected.update(name for (name,) in connection.execute(query, {"run_id": run_id, "teams": sorted(teams)}) if name)
+    return affected
+
+
+def refresh(connection, run_id, repos=None, teams=None):
+    """
+    Recompute the effective access of run_id, for every repo, or only for the repos given and
+    those of the teams given when either is. Returns (repos recomputed or None for all, rows written).
+    """
+    scoped = repos is not None or teams is not None
+    params = {"run_id": run_id, "ts": utcnow()}
+    delete = text(f"DELETE FROM {TABLE} WHERE run_id = :run_id" + (" AND repo_name IN :repos" if scoped else ""))
+    insert = text(
+        f"INSERT INTO {TABLE} (run_id, repo_name, principal_type, principal, effective_role, via_team, updated_ts) "
+        "SELECT run_id, repo_name, principal_type, principal, role, via_team, :ts "
+        f"FROM ({best_grants_sql(grants_sql(scoped))}) best"
+    )
+    affected = None
+    if scoped:
+        affected = affected_repos(connection, run_id, repos or set(), teams or set())
+        if not affected:
+            return affected, 0
+        params["repos"] = sorted(affected)
+        delete = delete.bindparams(bindparam("repos", expanding=True))
+        insert = insert.bindparams(bindparam("repos", expanding=True))
+    connection.execute(delete, params)
+    written = connection.execute(insert, params).rowcount
+    return affected, written
+
+
+def has_rows(connection, run_id):
+    return connection.execute(text(f"SELECT 1 FROM {TABLE} WHERE run_id = :run_id LIMIT 1"), {"run_id": run_id}).first() is not None
+
+
+def copy_rows(connection, base_run_id, run_id):
+    return connection.execute(text(
+        f"INSERT INTO {TABLE} (run_id, repo_name, principal_type, principal, effective_role, via_team, updated_ts) "
+        f"SELECT :run_id, repo_name, principal_type, principal, effective_role, via_team, updated_ts "
+        f"FROM {TABLE} WHERE run_id = :base"
+    ), {"run_id": run_id, "base": base_run_id}).rowcount
+
+
+def materialize_run(run_id, engine=None, full=False):
+    """
+    Effective access of a loaded run: the published run's rows, recomputed for the repos whose
+    access changed since. Computed from scratch with full, or when there is nothing to start from.
+    """
+    engine = engine or get_engine()
+    with engine.begin() as connection:
+        base = current_run_id(connection)
+        # Rows already there may come from another base, e.g. copied by a delta load
+        connection.execute(text(f"DELETE FROM {TABLE} WHERE run_id = :run_id"), {"run_id": run_id})
+        if full or base is None or base == run_id or not has_rows(connection, base):
+            _, written = refresh(connection, run_id)
+            logger.info(f"{TABLE}: computed {written} rows of run {run_id}")
+            return None, written
+        copied = copy_rows(connection, base, run_id)
+        repos, teams = changed_scopes(connection, base, run_id)
+        affected, written = refresh(connection, run_id, repos, teams)
+    logger.info(
+        f"{TABLE}: copied {copied} rows of run {base} into run {run_id}, "
+        f"recomputed {len(affected)} repos ({written} rows)"
+    )
+    return affected, written
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    parser = argparse.ArgumentParser(description="Materialize the effective access of a loaded run")
+    parser.add_argument("run_id")
+    parser.add_argument("--full", action="store_true", help="recompute every repo instead of the changed ones")
+    args = parser.parse_args()
+    materialize_run(args.run_id, full=args.full)
@@ -0,0 +1,387 @@
+"""
+Local fake GitHub API for offline extraction benchmarks.
+
+Serves a synthetic organization of configurable size over the REST endpoints the
+extractor uses and the GraphQL queries in graphql_extract.py. Supports per_page /
+Link pagination, ETag / If-None-Match (304), X-RateLimit-* headers with a per-token
+quota, and injected latency. Records are generated on demand from their index, so
+large orgs cost no memory.
+
+    python fake_github.py --repos 10000 --members 5000 --collaborators 50 --latency-ms 50
+
+GET /_stats returns request counters; POST /_reset clears them.
+"""
+import re
+import json
+import time
+import hashlib
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, urlencode
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+ROLES = ["admin", "maintain", "write", "triage", "read"]
+REST_PERMISSION_KEYS = ["admin", "maintain", "push", "triage", "pull"]
+
+
+class FakeOrg:
+    def __init__(self, login="fake-org", repos=1000, members=500, collaborators=20,
+                 teams=50, team_members=20, team_repos=20, api_url="https://api.github.com"):
+        self.login = login
+        # Root of the url fields, as a GitHub Enterprise server links to its own API
+        self.api_url = api_url
+        self.repos = repos
+        self.members = members
+        self.collaborators = collaborators
+        self.teams = teams
+        self.team_members = team_members
+        self.team_repos = team_repos
+
+    # --- REST shapes ---
+
+    def user(self, i):
+        login = f"user-{i}"
+        api_url = f"{self.api_url}/users/{login}"
+        return {
+            "login": login, "id": 100000 + i, "node_id": f"U_{i}",
+            "avatar_url": f"https://avatars.githubusercontent.com/u/{100000 + i}", "gravatar_id": "",
+            "url": api_url, "html_url": f"https://github.com/{login}",
+            "followers_url": f"{api_url}/followers", "following_url": f"{api_url}/following{{/other_user}}",
+            "gists_url": f"{api_url}/gists{{/gist_id}}", "starred_url": f"{api_url}/starred{{/owner}}{{/repo}}",
+            "subscriptions_url": f"{api_url}/subscriptions", "organizations_url": f"{api_url}/orgs",
+            "repos_url": f"{api_url}/repos", "events_url": f"{api_url}/events{{/privacy}}",
+            "received_events_url": f"{api_url}/received_events",
+            "type": "User", "user_view_type": "public", "site_admin": False,
+        }
+
+    def role(self, repo, user):
+        return ROLES[(repo + user) % len(ROLES)]
+
+    def rest_permissions(self, role):
+        level = ROLES.index(role)
+        return {key: i >= level for i, key in enumerate(REST_PERMISSION_KEYS)}
+
+    def collaborator(self, repo, i):
+        user = (repo * 7 + i) % self.members
+        role = self.role(repo, user)
+        return {**self.user(user), "permissions": self.rest_permissions(role), "role_name": role}
+
+    def repo(self, i):
+        name = f"repo-{i}"
+        full_name = f"{self.login}/{name}"
+        api_url = f"{self.api_url}/repos/{full_name}"
+        owner = {**self.user(0), "login": self.login, "id": 1, "node_id": "O_1", "type": "Organization",
+                 "url": f"{self.api_url}/orgs/{self.login}"}
+        return {
+            "id": 500000 + i, "node_id": f"R_{i}", "name": name, "full_name": full_name,
+            "private": i % 3 != 0, "owner": owner, "html_url": f"https://github.com/{full_name}",
+            "description": f"Synthetic repository {i}", "fork": False, "url": api_url,
+            "forks_url": f"{api_url}/forks",
+            "created_at": "2020-01-01T00:00:00Z", "updated_at": "2024-01-01T00:00:00Z",
+            "pushed_at": "2024-01-01T00:00:00Z",
+            "archived": False, "disabled": False, "visibility": "public" if i % 3 == 0 else "private",
+            "allow_forking": True, "web_commit_signoff_required": False, "default_branch": "main",
+            "permissions": self.rest_permissions("admin"), "security_and_analysis": None,
+        }
+
+    def team(self, i):
+        slug = f"team-{i}"
+        api_url = f"{self.api_url}/organizations/1/team/{900000 + i}"
+        return {
+            "id": 900000 + i, "node_id": f"T_{i}", "name": f"Team {i}", "slug": slug,
+            "description": None, "privacy": "closed", "notification_setting": "notifications_enabled",
+            "url": api_url, "html_url": f"https://github.com/orgs/{self.login}/teams/{slug}",
+            "members_url": f"{api_url}/members{{/member}}", "repositories_url": f"{api_url}/repos",
+            "permission": "pull", "parent": None,
+        }
+
+    def team_repo(self, team, i):
+        repo = (team * 13 + i) % self.repos
+        role = ROLES[(team + i) % len(ROLES)]
+        return {**self.repo(repo), "permissions": self.rest_permissions(role), "role_name": role}
+
+    def org(self):
+        api_url = f"{self.api_url}/orgs/{self.login}"
+        return {
+            "login": self.login, "id": 1, "node_id": "O_1", "url": api_url,
+            "repos_url": f"{api_url}/repos", "events_url": f"{api_url}/events", "hooks_url": f"{api_url}/hooks",
+            "issues_url": f"{api_url}/issues", "members_url": f"{api_url}/members{{/member}}",
+            "public_members_url": f"{api_url}/public_members{{/member}}",
+            "avatar_url": "https://avatars.githubusercontent.com/u/1", "description": "Synthetic org",
+            "is_verified": False, "has_organization_projects": True, "has_repository_projects": True,
+            "public_repos": (self.repos + 2) // 3, "public_gists": 0, "followers": 0, "following": 0,
+        }
+
+    # --- GraphQL shapes ---
+
+    def gql_user(self, i):
+        user = self.user(i)
+        return {"databaseId": user["id"], "id": user["node_id"], "login": user["login"],
+                "avatarUrl": user["avatar_url"], "url": user["html_url"], "isSiteAdmin": False}
+
+    def gql_collaborators(self, repo, start, count):
+        edges = []
+        for i in range(start, min(start + count, self.collaborators)):
+            user = (repo * 7 + i) % self.members
+            edges.append({"permission": self.role(repo, user).upper(), "node": self.gql_user(user)})
+        return page_info(edges, start, count, self.collaborators, "edges")
+
+    def gql_repo(self, i, collaborator_page_size):
+        repo = self.repo(i)
+        return {
+            "databaseId": repo["id"], "id": repo["node_id"], "name": repo["name"],
+            "nameWithOwner": repo["full_name"], "isPrivate": repo["private"], "description": repo["description"],
+            "isFork": False, "url": repo["html_url"], "createdAt": repo["created_at"],
+            "updatedAt": repo["updated_at"], "pushedAt": repo["pushed_at"], "isArchived": False,
+            "isDisabled": False, "visibility": repo["visibility"].upper(), "forkingAllowed": True,
+            "webCommitSignoffRequired": False, "viewerPermission": "ADMIN",
+            "defaultBranchRef": {"name": "main"},
+            "owner": {"__typename": "Organization", "login": self.login, "id": "O_1",
+                      "avatarUrl": repo["owner"]["avatar_url"], "url": f"https://github.com/{self.login}",
+                      "databaseId": 1},
+            "collaborators": self.gql_collaborators(i, 0, collaborator_page_size),
+        }
+
+    def gql_team(self, i):
+        team = self.team(i)
+        return {"databaseId": team["id"], "id": team["node_id"], "name": team["name"], "slug": team["slug"],
+                "description": None, "privacy": "VISIBLE", "notificationSetting": "NOTIFICATIONS_ENABLED",
+                "url": team["html_url"], "parentTeam": None}
+
+
+def page_info(items, start, count, total, key="nodes"):
+    end = start + count
+    return {key: items, "pageInfo": {"hasNextPage": end < total, "endCursor": str(end)}}
+
+
+class FakeGitHub:
+    """Request counters, ETags, quota and latency shared by all handler threads."""
+
+    def __init__(self, org, latency=0.0, quota=5000, quota_window=3600, default_per_page=30):
+        self.org = org
+        self.latency = latency
+        self.quota = quota
+        self.quota_window = quota_window
+        self.default_per_page = default_per_page
+        self._lock = threading.Lock()
+        self._usage = {}
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.not_modified = 0
+            self.rate_limited = 0
+            self.bytes_sent = 0
+            self._usage.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self.requests, "not_modified": self.not_modified,
+                    "rate_limited": self.rate_limited, "bytes_sent": self.bytes_sent}
+
+    def charge(self, token, counted):
+        """Account a request against token's quota; returns (remaining, reset_at)."""
+        now = time.time()
+        with self._lock:
+            self.requests += 1
+            used, reset_at = self._usage.get(token, (0, now + self.quota_window))
+            if now >= reset_at:
+                used, reset_at = 0, now + self.quota_window
+            if counted:
+                used += 1
+            self._usage[token] = (used, reset_at)
+            return self.quota - used, int(reset_at)
+
+    def count(self, not_modified=False, rate_limited=False, sent=0):
+        with self._lock:
+            self.not_modified += int(not_modified)
+            self.rate_limited += int(rate_limited)
+            self.bytes_sent += sent
+
+    # --- REST routing ---
+
+    def rest_listing(self, path):
+        """Returns (total, item factory) for a list endpoint, or None for a single object."""
+        org = self.org
+        login = re.escape(org.login)
+        patterns = [
+            (rf"/orgs/{login}/repos", lambda m: (org.repos, org.repo)),
+            (rf"/orgs/{login}/members", lambda m: (org.members, org.user)),
+            (rf"/orgs/{login}/teams", lambda m: (org.teams, org.team)),
+            (rf"/orgs/{login}/teams/team-(\d+)/members",
+             lambda m: (min(org.team_members, org.members),
+                        lambda i, t=int(m.group(1)): org.user((t * 11 + i) % org.members))),
+            (rf"/orgs/{login}/teams/team-(\d+)/repos",
+             lambda m: (min(org.team_repos, org.repos), lambda i, t=int(m.group(1)): org.team_repo(t, i))),
+            (rf"/repos/{login}/repo-(\d+)/collaborators",
+             lambda m: (org.collaborators, lambda i, r=int(m.group(1)): org.collaborator(r, i))),
+        ]
+        for pattern, build in patterns:
+            match = re.fullmatch(pattern, path)
+            if match:
+                return build(match)
+        return None
+
+    def rest(self, base_url, path, query):
+        """Returns (status, body, extra headers) for a REST GET."""
+        if path == f"/orgs/{self.org.login}":
+            return 200, self.org.org(), {}
+        listing = self.rest_listing(path)
+        if listing is None:
+            return 404, {"message": "Not Found"}, {}
+        total, factory = listing
+        per_page = min(int(query.get("per_page", [self.default_per_page])[0]), 100)
+        page = int(query.get("page", ["1"])[0])
+        start = (page - 1) * per_page
+        items = [factory(i) for i in range(start, min(start + per_page, total))]
+        extra = {}
+        if start + per_page < total:
+            next_query = urlencode({**{k: v[0] for k, v in query.items()}, "per_page": per_page, "page": page + 1})
+            extra["Link"] = f'<{base_url}{path}?{next_query}>; rel="next"'
+        return 200, items, extra
+
+    # --- GraphQL routing (matches the queries in graphql_extract.py) ---
+
+    def graphql(self, query, variables):
+        org = self.org
+        size = variables.get("pageSize") or 0
+        start = int(variables.get("cursor") or 0)
+        cost = 1
+        if "membersWithRole" in query:
+            nodes = [org.gql_user(i) for i in range(start, min(start + size, org.members))]
+            data = {"organization": {"membersWithRole": page_info(nodes, start, size, org.members)}}
+        elif "teams(" in query:
+            nodes = [org.gql_team(i) for i in range(start, min(start + size, org.teams))]
+            data = {"organization": {"databaseId": 1, "teams": page_info(nodes, start, size, org.teams)}}
+        elif "repository(owner" in query:
+            repo = int(variables["name"].rsplit("-", 1)[1])
+            data = {"repository": {"collaborators": org.gql_collaborators(repo, start, size)}}
+        elif "repositories(first" in query:
+            collaborator_size = variables["collaboratorPageSize"]
+            if size * collaborator_size > 500_000:
+                return {"errors": [{"type": "MAX_NODE_LIMIT_EXCEEDED", "message": "Query exceeds node limit"}]}
+            nodes = [org.gql_repo(i, collaborator_size) for i in range(start, min(start + size, org.repos))]
+            data = {"organization": {"repositories": page_info(nodes, start, size, org.repos)}}
+            cost = max(1, size * collaborator_size // 100)
+        else:
+            data = {"organization": {
+                "databaseId": 1, "id": "O_1", "login": org.login, "description": "Synthetic org",
+                "avatarUrl": "https://avatars.githubusercontent.com/u/1", "isVerified": False,
+                "repositories": {"totalCount": (org.repos + 2) // 3},
+            }}
+        data["rateLimit"] = {"cost": cost, "remaining": 5000}
+        return {"data": data}
+
+
+def make_handler(fake):
+    class FakeGitHubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, body, extra_headers=None):
+            data = b"" if body is None else json.dumps(body).encode()
+            self.send_response(status)
+            for key, value in (extra_headers or {}).items():
+                self.send_header(key, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            fake.count(sent=len(data))
+
+        def _rate_limit(self, counted=True):
+            token = self.headers.get("Authorization", "anonymous")
+            remaining, reset_at = fake.charge(token, counted)
+            limit_headers = {
+                "X-RateLimit-Limit": str(fake.quota),
+                "X-RateLimit-Remaining": str(max(remaining, 0)),
+                "X-RateLimit-Reset": str(reset_at),
+            }
+            return remaining, limit_headers
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path == "/_stats":
+                return self._send(200, fake.stats())
+            if fake.latency:
+                time.sleep(fake.latency)
+            status, body, extra = fake.rest(f"http://{self.headers['Host']}", url.path, parse_qs(url.query))
+            data = json.dumps(body).encode()
+            etag = '"' + hashlib.md5(data).hexdigest() + '"'
+            not_modified = status == 200 and self.headers.get("If-None-Match") == etag
+            # GitHub does not charge conditional requests that come back 304
+            remaining, limit_headers = self._rate_limit(counted=not not_modified)
+            if remaining < 0:
+                fake.count(rate_limited=True)
+                return self._send(403, {"message": "API rate limit exceeded"}, limit_headers)
+            headers = {**limit_headers, **extra, "ETag": etag}
+            if not_modified:
+                fake.count(not_modified=True)
+                return self._send(304, None, headers)
+            self._send(status, body, headers)
+
+        def do_POST(self):
+            url = urlsplit(self.path)
+            if url.path == "/_reset":
+                fake.reset()
+                return self._send(200, fake.stats())
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if url.path != "/graphql":
+                return self._send(404, {"message": "Not Found"})
+            if fake.latency:
+                time.sleep(fake.latency)
+            remaining, limit_headers = self._rate_limit()
+            if remaining < 0:
+                fake.count(rate_limited=True)
+                return self._send(403, {"message": "API rate limit exceeded"}, limit_headers)
+            self._send(200, fake.graphql(body.get("query", ""), body.get("variables") or {}), limit_headers)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeGitHubHandler
+
+
+def make_server(fake, host="127.0.0.1", port=0):
+    server = ThreadingHTTPServer((host, port), make_handler(fake))
+    server.daemon_threads = True
+    return server
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Local fake GitHub API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--org", default="fake-org")
+    parser.add_argument("--api-url", help="root of the url fields in responses; defaults to this server")
+    parser.add_argument("--repos", type=int, default=1000)
+    parser.add_argument("--members", type=int, default=500)
+    parser.add_argument("--collaborators", type=int, default=20, help="collaborators per repo")
+    parser.add_argument("--teams", type=int, default=50)
+    parser.add_argument("--team-members", type=int, default=20)
+    parser.add_argument("--team-repos", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay added to every API request")
+    parser.add_argument("--quota", type=int, default=5000, help="requests per token per window")
+    parser.add_argument("--quota-window", type=int, default=3600, help="rate-limit window in seconds")
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    org = FakeOrg(args.org, args.repos, args.members, args.collaborators,
+                  args.teams, args.team_members, args.team_repos)
+    fake = FakeGitHub(org, latency=args.latency_ms / 1000, quota=args.quota, quota_window=args.quota_window)
+    server = make_server(fake, args.host, args.port)
+    org.api_url = args.api_url or f"http://{args.host}:{server.server_port}"
+    logger.info(f"Fake GitHub for org '{org.login}' on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Fake GitHub stopped by KeyboardInterrupt...")
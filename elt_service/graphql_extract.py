@@ -0,0 +1,333 @@
+"""
+GitHub GraphQL extraction backend.
+
+Pulls repositories together with their collaborators, plus teams, members and org
+details in paged, nested queries instead of one REST call per repo. Results are
+reshaped into the REST payloads written to data/raw/{run_id}/, so
+the normalize stages consume them unchanged.
+
+GitHub caps a single query at 500,000 nodes and charges roughly
+(repos per page * collaborators per repo) / 100 points for the repository query,
+so the repo page size is clamped against the collaborator page size and halved
+whenever GitHub rejects a query as too large or times out.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+# REST API root the reshaped payloads link to; app.py passes GH_API_URL
+API_URL = "https://api.github.com"
+MAX_NODES_PER_QUERY = 500_000
+# Only the first page of collaborators rides along with each repo
+MAX_COLLABORATORS_PER_REPO = 100
+
+ROLE_ORDER = ["read", "triage", "write", "maintain", "admin"]
+# REST reports push/pull rather than write/read in the permissions object
+REST_PERMISSION_KEYS = {"read": "pull", "triage": "triage", "write": "push", "maintain": "maintain", "admin": "admin"}
+
+USER_FIELDS = "databaseId id login avatarUrl url isSiteAdmin"
+
+ORG_QUERY = """
+query($login: String!) {
+  rateLimit { cost remaining }
+  organization(login: $login) {
+    databaseId id login description avatarUrl isVerified
+    repositories(privacy: PUBLIC) { totalCount }
+  }
+}
+"""
+
+REPOS_QUERY = """
+query($login: String!, $pageSize: Int!, $collaboratorPageSize: Int!, $cursor: String) {
+  rateLimit { cost remaining }
+  organization(login: $login) {
+    repositories(first: $pageSize, after: $cursor) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        databaseId id name nameWithOwner isPrivate description isFork url
+        createdAt updatedAt pushedAt isArchived isDisabled visibility forkingAllowed
+        webCommitSignoffRequired viewerPermission
+        defaultBranchRef { name }
+        owner {
+          __typename login id avatarUrl url
+          ... on Organization { databaseId }
+          ... on User { databaseId }
+        }
+        collaborators(first: $collaboratorPageSize) {
+          pageInfo { hasNextPage endCursor }
+          edges { permission node { %s } }
+        }
+      }
+    }
+  }
+}
+""" % USER_FIELDS
+
+COLLABORATORS_QUERY = """
+query($owner: String!, $name: String!, $pageSize: Int!, $cursor: String) {
+  rateLimit { cost remaining }
+  repository(owner: $owner, name: $name) {
+    collaborators(first: $pageSize, after: $cursor) {
+      pageInfo { hasNextPage endCursor }
+      edges { permission node { %s } }
+    }
+  }
+}
+""" % USER_FIELDS
+
+TEAMS_QUERY = """
+query($login: String!, $pageSize: Int!, $cursor: String) {
+  rateLimit { cost remaining }
+  organization(login: $login) {
+    databaseId
+    teams(first: $pageSize, after: $cursor) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        databaseId id name slug description privacy notificationSetting url
+        parentTeam { databaseId id name slug }
+      }
+    }
+  }
+}
+"""
+
+MEMBERS_QUERY = """
+query($login: String!, $pageSize: Int!, $cursor: String) {
+  rateLimit { cost remaining }
+  organization(login: $login) {
+    membersWithRole(first: $pageSize, after: $cursor) {
+      pageInfo { hasNextPage endCursor }
+      nodes { %s }
+    }
+  }
+}
+""" % USER_FIELDS
+
+
+class QueryTooLarge(Exception):
+    pass
+
+
+def rest_permissions(role):
+    """Expand a role into the REST permissions object, e.g. write -> push and pull."""
+    level = ROLE_ORDER.index(role) if role in ROLE_ORDER else -1
+    return {REST_PERMISSION_KEYS[r]: level >= i for i, r in enumerate(ROLE_ORDER)}
+
+
+def user_to_rest(node, base_url=API_URL):
+    login = node.get("login")
+    api_url = f"{base_url}/users/{login}"
+    return {
+        "login": login,
+        "id": node.get("databaseId"),
+        "node_id": node.get("id"),
+        "avatar_url": node.get("avatarUrl"),
+        "gravatar_id": "",
+        "url": api_url,
+        "html_url": node.get("url"),
+        "followers_url": f"{api_url}/followers",
+        "following_url": f"{api_url}/following{{/other_user}}",
+        "gists_url": f"{api_url}/gists{{/gist_id}}",
+        "starred_url": f"{api_url}/starred{{/owner}}{{/repo}}",
+        "subscriptions_url": f"{api_url}/subscriptions",
+        "organizations_url": f"{api_url}/orgs",
+        "repos_url": f"{api_url}/repos",
+        "events_url": f"{api_url}/events{{/privacy}}",
+        "received_events_url": f"{api_url}/received_events",
+        "type": "User",
+        "user_view_type": "public",
+        "site_admin": node.get("isSiteAdmin"),
+    }
+
+
+def collaborator_to_rest(edge, base_url=API_URL):
+    role = (edge.get("permission") or "").lower()
+    return {**user_to_rest(edge["node"], base_url), "permissions": rest_permissions(role), "role_name": role}
+
+
+def repo_to_rest(node, base_url=API_URL):
+    owner = node.get("owner") or {}
+    owner_rest = user_to_rest(owner, base_url)
+    owner_rest["type"] = owner.get("__typename")
+    if owner.get("__typename") == "Organization":
+        owner_rest["url"] = f"{base_url}/orgs/{owner.get('login')}"
+    full_name = node.get("nameWithOwner")
+    api_url = f"{base_url}/repos/{full_name}"
+    return {
+        "id": node.get("databaseId"),
+        "node_id": node.get("id"),
+        "name": node.get("name"),
+        "full_name": full_name,
+        "private": node.get("isPrivate"),
+        "owner": owner_rest,
+        "html_url": node.get("url"),
+        "description": node.get("description"),
+        "fork": node.get("isFork"),
+        "url": api_url,
+        "forks_url": f"{api_url}/forks",
+        "created_at": node.get("createdAt"),
+        "updated_at": node.get("updatedAt"),
+        "pushed_at": node.get("pushedAt"),
+        "archived": node.get("isArchived"),
+        "disabled": node.get("isDisabled"),
+        "visibility": (node.get("visibility") or "").lower() or None,
+        "allow_forking": node.get("forkingAllowed"),
+        "web_commit_signoff_required": node.get("webCommitSignoffRequired"),
+        "default_branch": (node.get("defaultBranchRef") or {}).get("name"),
+        "permissions": rest_permissions((node.get("viewerPermission") or "").lower()),
+        "security_and_analysis": None,
+    }
+
+
+def team_to_rest(node, org_id, base_url=API_URL):
+    team_id = node.get("databaseId")
+    api_url = f"{base_url}/organizations/{org_id}/team/{team_id}"
+    parent = node.get("parentTeam")
+    return {
+        "id": team_id,
+        "node_id": node.get("id"),
+        "name": node.get("name"),
+        "slug": node.get("slug"),
+        "description": node.get("description"),
+        # GraphQL VISIBLE is REST "closed"
+        "privacy": "secret" if node.get("privacy") == "SECRET" else "closed",
+        "notification_setting": (node.get("notificationSetting") or "").lower() or None,
+        "url": api_url,
+        "html_url": node.get("url"),
+        "members_url": f"{api_url}/members{{/member}}",
+        "repositories_url": f"{api_url}/repos",
+        "parent": {
+            "id": parent.get("databaseId"),
+            "node_id": parent.get("id"),
+            "name": parent.get("name"),
+            "slug": parent.get("slug"),
+        } if parent else None,
+    }
+
+
+def org_to_rest(node, base_url=API_URL):
+    login = node.get("login")
+    api_url = f"{base_url}/orgs/{login}"
+    return {
+        "login": login,
+        "id": node.get("databaseId"),
+        "node_id": node.get("id"),
+        "url": api_url,
+        "repos_url": f"{api_url}/repos",
+        "events_url": f"{api_url}/events",
+        "hooks_url": f"{api_url}/hooks",
+        "issues_url": f"{api_url}/issues",
+        "members_url": f"{api_url}/members{{/member}}",
+        "public_members_url": f"{api_url}/public_members{{/member}}",
+        "avatar_url": node.get("avatarUrl"),
+        "description": node.get("description"),
+        "is_verified": node.get("isVerified"),
+        "has_organization_projects": None,
+        "has_repository_projects": None,
+        "public_repos": (node.get("repositories") or {}).get("totalCount"),
+        "public_gists": None,
+        "followers": None,
+        "following": None,
+    }
+
+
+class GraphQLExtractor:
+    def __init__(self, post, org, page_size=50, collaborator_page_size=MAX_COLLABORATORS_PER_REPO, api_url=API_URL):
+        """
+        post: callable(query, variables) returning the decoded GraphQL response body.
+        page_size: repositories (and teams/members) requested per page.
+        collaborator_page_size: collaborators fetched inline with each repository.
+        api_url: REST API root that the url fields of the reshaped payloads point at.
+        """
+        self.post = post
+        self.org = org
+        self.api_url = api_url.rstrip("/")
+        self.collaborator_page_size = min(collaborator_page_size, MAX_COLLABORATORS_PER_REPO)
+        self.page_size = max(1, min(page_size, 100, MAX_NODES_PER_QUERY // self.collaborator_page_size))
+        self.queries = 0
+        self.cost = 0
+
+    def query(self, query, variables):
+        payload = self.post(query, variables)
+        self.queries += 1
+        data = payload.get("data") or {}
+        self.cost += (data.get("rateLimit") or {}).get("cost", 0)
+        errors = payload.get("errors") or []
+        if any(e.get("type") in ("MAX_NODE_LIMIT_EXCEEDED", "RESOURCE_LIMITS_EXCEEDED") for e in errors):
+            raise QueryTooLarge(errors[0].get("message"))
+        for e in errors:
+            # Collaborators are not visible on repos the token cannot push to; those come back null
+            logger.warning(f"GraphQL error: {e.get('message')}")
+        if not data:
+            raise RuntimeError(f"GraphQL query returned no data: {errors}")
+        return data
+
+    def paginate(self, query, connection_path, variables, shrinkable=False):
+        """Yield each page of nodes from the connection at connection_path, following endCursor."""
+        cursor = None
+        while True:
+            try:
+                data = self.query(query, {**variables, "pageSize": self.page_size, "cursor": cursor})
+            except QueryTooLarge as e:
+                if not shrinkable or self.page_size == 1:
+                    raise
+                self.page_size = max(1, self.page_size // 2)
+                logger.warning(f"GraphQL query too large ({e}); retrying with page size {self.page_size}")
+                continue
+            connection = data
+            for key in connection_path:
+                connection = (connection or {}).get(key)
+            if not connection:
+                return
+            yield data, connection.get("nodes") or connection.get("edges") or []
+            page_info = connection["pageInfo"]
+            if not page_info["hasNextPage"]:
+                return
+            cursor = page_info["endCursor"]
+
+    def collaborators(self, repo_node):
+        """All collaborator edges for a repo, paging past the inline first page when needed."""
+        inline = repo_node.get("collaborators")
+        if inline is None:
+            return []
+        edges = list(inline.get("edges") or [])
+        cursor = inline["pageInfo"]["endCursor"]
+        has_next = inline["pageInfo"]["hasNextPage"]
+        owner, name = repo_node["nameWithOwner"].split("/", 1)
+        while has_next:
+            data = self.query(COLLABORATORS_QUERY, {
+                "owner": owner, "name": name, "pageSize": MAX_COLLABORATORS_PER_REPO, "cursor": cursor,
+            })
+            connection = ((data.get("repository") or {}).get("collaborators")) or {}
+            edges.extend(connection.get("edges") or [])
+            has_next = connection.get("pageInfo", {}).get("hasNextPage", False)
+            cursor = connection.get("pageInfo", {}).get("endCursor")
+        return edges
+
+    def iter_repos(self):
+        """Yield (repos, permissions) per page in the REST raw shapes."""
+        variables = {"login": self.org, "collaboratorPageSize": self.collaborator_page_size}
+        for _, nodes in self.paginate(REPOS_QUERY, ["organization", "repositories"], variables, shrinkable=True):
+            repos = [repo_to_rest(node, self.api_url) for node in nodes]
+            permissions = {
+                node["name"]: [collaborator_to_rest(edge, self.api_url) for edge in self.collaborators(node)]
+                for node in nodes
+            }
+            yield repos, permissions
+
+    def teams(self):
+        teams = []
+        for data, nodes in self.paginate(TEAMS_QUERY, ["organization", "teams"], {"login": self.org}):
+            org_id = data["organization"].get("databaseId")
+            teams.extend(team_to_rest(node, org_id, self.api_url) for node in nodes)
+        return teams
+
+    def members(self):
+        members = []
+        for _, nodes in self.paginate(MEMBERS_QUERY, ["organization", "membersWithRole"], {"login": self.org}):
+            members.extend(user_to_rest(node, self.api_url) for node in nodes)
+        return members
+
+    def org_details(self):
+        data = self.query(ORG_QUERY, {"login": self.org})
+        return org_to_rest(data.get("organization") or {}, self.api_url)
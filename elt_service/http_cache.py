@@ -0,0 +1,146 @@
+"""
+On-disk conditional-request cache for GitHub API calls.
+
+Each cached URL (including its page parameters) keeps the response body plus the
+ETag / Last-Modified validators and Link header, separately for each token, since
+tokens with different access see different content. Requests are sent with
+If-None-Match / If-Modified-Since and a 304 is replayed from the cached body, so
+unchanged data costs no primary rate limit. Entries are evicted least recently
+used first once the cache grows past max_bytes.
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+import httpx
+
+import codec
+
+logger = logging.getLogger(__name__)
+
+
+class ETagCache:
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = Path(cache_dir)
+        self.index_path = self.cache_dir / "index.json"
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._index = self._read_index()
+        self._size = sum(entry["size"] for entry in self._index.values())
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, "rb") as f:
+                return codec.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Discarding unreadable HTTP cache index: {e}")
+            return {}
+
+    @staticmethod
+    def _key(url, request_headers):
+        # The Authorization header identifies the token; only its digest reaches the key
+        identity = hashlib.sha256((request_headers.get("Authorization") or "").encode()).hexdigest()
+        return hashlib.sha256(f"{identity} {url}".encode()).hexdigest()
+
+    def _body_path(self, key):
+        return self.cache_dir / f"{key}.body"
+
+    def validators(self, url, request_headers):
+        """Conditional request headers for url sent with request_headers, empty if it is not cached."""
+        with self._lock:
+            entry = self._index.get(self._key(url, request_headers))
+        if not entry:
+            return {}
+        conditional = {}
+        if entry.get("etag"):
+            conditional["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            conditional["If-Modified-Since"] = entry["last_modified"]
+        return conditional
+
+    def replay(self, url, response):
+        """Turn a 304 into a 200 response carrying the cached body and Link header."""
+        key = self._key(url, response.request.headers)
+        with self._lock:
+            entry = self._index.get(key)
+            if entry:
+                entry["last_used"] = time.time()
+        try:
+            body = self._body_path(key).read_bytes() if entry else None
+        except FileNotFoundError:
+            body = None
+        if body is None:
+            # Validators were sent for an entry evicted meanwhile; caller must refetch
+            return None
+        with self._lock:
+            self.hits += 1
+        cached_headers = {"Content-Type": "application/json"}
+        if entry.get("link"):
+            cached_headers["Link"] = entry["link"]
+        return httpx.Response(200, headers=cached_headers, content=body, request=response.request)
+
+    def store(self, url, response):
+        """Remember a 200 response if GitHub gave it a validator."""
+        with self._lock:
+            self.misses += 1
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+        key = self._key(url, response.request.headers)
+        body = response.content
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Replace atomically: the persisted index may still pair this key with an
+        # older ETag, so a torn body must never be visible to a later replay
+        path = self._body_path(key)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(body)
+        tmp_path.replace(path)
+        with self._lock:
+            if key in self._index:
+                self._size -= self._index[key]["size"]
+            self._size += len(body)
+            self._index[key] = {
+                "url": url,
+                "etag": etag,
+                "last_modified": last_modified,
+                "link": response.headers.get("Link"),
+                "size": len(body),
+                "last_used": time.time(),
+            }
+            self._evict()
+
+    def _evict(self):
+        if self._size <= self.max_bytes:
+            return
+        for key, entry in sorted(self._index.items(), key=lambda item: item[1]["last_used"]):
+            if self._size <= self.max_bytes:
+                break
+            self._body_path(key).unlink(missing_ok=True)
+            del self._index[key]
+            self._size -= entry["size"]
+            self.evictions += 1
+
+    def save(self):
+        """Persist the index so the next run can send conditional requests."""
+        with self._lock:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.index_path.with_suffix(".tmp")
+            with open(tmp_path, "wb") as f:
+                codec.dump(self._index, f)
+            tmp_path.replace(self.index_path)
+
+    def stats(self):
+        with self._lock:
+            return (
+                f"hits={self.hits} misses={self.misses} evictions={self.evictions} "
+                f"entries={len(self._index)} bytes={self._size}"
+            )
@@ -0,0 +1,120 @@
+"""
+Watermarks for incremental extraction.
+
+After a successful extraction the watermark records the run_id, a digest of the org
+member and team listings, and each repo's updated_at / pushed_at plus when its
+collaborators were last fetched. The next incremental run refetches collaborators
+only for repos that are new, changed, or older than the maximum age, and carries
+the rest forward from the watermark run's raw permissions.json. A change in the
+member or team listings can alter collaborator lists of any repo, so it forces a
+full collaborator refresh.
+
+GitHub bumps neither updated_at nor pushed_at when collaborators are added, removed
+or change role. On its own, the watermark therefore misses permission changes to
+unchanged repos until their collaborators are older than the maximum age
+(GH_INCREMENTAL_MAX_AGE_HOURS), and the snapshots in between are stale for them. When
+the webhook receiver runs, its delivery log (webhook.repos_changed_since) closes that
+gap. Repos named by a collaborator, team or repository delivery since their
+collaborators were fetched are refetched too, as are the repos of teams whose
+membership changed.
+"""
+import hashlib
+import logging
+from pathlib import Path
+from datetime import datetime, timedelta
+
+import codec
+
+logger = logging.getLogger(__name__)
+
+
+def listing_digest(items, fields):
+    """Order-independent digest of the given fields across a listing."""
+    rows = sorted(codec.dumps([item.get(f) for f in fields]) for item in items)
+    return hashlib.sha256("\n".join(rows).encode()).hexdigest()
+
+
+def members_digest(members):
+    return listing_digest(members, ["id", "login", "site_admin"])
+
+
+def teams_digest(teams):
+    return listing_digest(teams, ["id", "slug", "privacy", "permission", "parent"])
+
+
+def load_watermark(path):
+    try:
+        with open(path, "rb") as f:
+            return codec.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable watermark {path}: {e}")
+        return None
+
+
+def save_watermark(path, run_id, repos, members, teams, refetched, previous, now):
+    """Write the watermark for run_id; repos not in refetched keep their previous fetched_at."""
+    previous_repos = (previous or {}).get("repos", {})
+    repo_marks = {}
+    for repo in repos:
+        name = repo.get("name")
+        if not name:
+            continue
+        fetched_at = now.isoformat()
+        if name not in refetched and name in previous_repos:
+            fetched_at = previous_repos[name]["fetched_at"]
+        repo_marks[name] = {
+            "updated_at": repo.get("updated_at"),
+            "pushed_at": repo.get("pushed_at"),
+            "fetched_at": fetched_at,
+        }
+    watermark = {
+        "run_id": run_id,
+        "created_ts": now.isoformat(),
+        "members_digest": members_digest(members),
+        "teams_digest": teams_digest(teams),
+        "repos": repo_marks,
+    }
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as f:
+        codec.dump(watermark, f, pretty=True)
+    tmp_path.replace(path)
+
+
+def repos_to_refetch(watermark, repos, members, teams, max_age, now, changed=None):
+    """
+    Names of repos whose collaborators must be fetched this run.
+    Returns every repo when there is no usable watermark or the org listings changed.
+    changed maps repo names to the latest time a webhook delivery touched their access.
+    """
+    changed = changed or {}
+    names = {repo.get("name") for repo in repos if repo.get("name")}
+    if not watermark:
+        return names
+    if watermark.get("members_digest") != members_digest(members):
+        logger.info("Org membership changed since last run; refetching all collaborators")
+        return names
+    if watermark.get("teams_digest") != teams_digest(teams):
+        logger.info("Team listing changed since last run; refetching all collaborators")
+        return names
+
+    marks = watermark.get("repos", {})
+    stale_before = now - timedelta(hours=max_age)
+    refetch = set()
+    for repo in repos:
+        name = repo.get("name")
+        mark = marks.get(name)
+        if not name:
+            continue
+        if (
+            mark is None
+            or mark.get("updated_at") != repo.get("updated_at")
+            or mark.get("pushed_at") != repo.get("pushed_at")
+            or datetime.fromisoformat(mark["fetched_at"]) < stale_before
+            or (name in changed and changed[name] >= datetime.fromisoformat(mark["fetched_at"]))
+        ):
+            refetch.add(name)
+    return refetch
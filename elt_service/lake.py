@@ -0,0 +1,291 @@
+"""
+Retention and compaction of the data lake under data/raw and data/normalized.
+
+    python lake.py compact [--dry-run]
+    python lake.py restore RUN_ID
+
+compact orders every run (live run directories and runs archived earlier) by creation
+time and applies the retention policy:
+
+- the LAKE_KEEP_RUNS most recent runs stay as they are;
+- the newest complete run of each day of the last LAKE_DAILY_DAYS days, and of each
+  month before that (for LAKE_MONTHLY_MONTHS months, 0 keeps every month), is rolled
+  into one compressed archive data/archive/{run_id}.tar.gz (or .tar.zst) holding its
+  raw and normalized files, plus the cas objects it references;
+- every other run is deleted.
+
+The run the incremental watermark points at is always kept, and so is every run whose
+manifest is not complete: it may still be extracting, or wait to be resumed. data/archive/index.json
+records every archived or deleted run with its creation time, raw format, record
+counts and archive file, and restore unpacks an archive back into data/raw/{run_id}
+and data/normalized/{run_id}, where it can be normalized or loaded again. Finally, cas
+objects that no run directory references any more are deleted from data/raw/objects/.
+"""
+import os
+import shutil
+import logging
+import tarfile
+import argparse
+from pathlib import Path
+from contextlib import contextmanager
+from datetime import datetime, timezone, timedelta
+
+from dotenv import load_dotenv, find_dotenv
+
+import codec
+from raw_store import read_manifest, RawReader
+from incremental import load_watermark
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+load_dotenv(find_dotenv())
+
+# Most recent runs kept untouched, whatever their age
+LAKE_KEEP_RUNS = int(os.getenv("LAKE_KEEP_RUNS", 24))
+# One archived run per day for this many days, then one per month
+LAKE_DAILY_DAYS = int(os.getenv("LAKE_DAILY_DAYS", 30))
+LAKE_MONTHLY_MONTHS = int(os.getenv("LAKE_MONTHLY_MONTHS", 0))
+# gzip or zstd (requires the zstandard package)
+LAKE_ARCHIVE_COMPRESSION = os.getenv("LAKE_ARCHIVE_COMPRESSION", "gzip")
+# cas objects younger than this are never collected: a running extraction may not have listed them yet
+LAKE_GC_GRACE_HOURS = float(os.getenv("LAKE_GC_GRACE_HOURS", 24))
+WATERMARK_PATH = os.getenv("WATERMARK_PATH", "data/state/watermark.json")
+
+DATA_ROOT = Path("data")
+RAW_ROOT = DATA_ROOT / "raw"
+NORMALIZED_ROOT = DATA_ROOT / "normalized"
+ARCHIVE_ROOT = DATA_ROOT / "archive"
+MARKER_ROOT = DATA_ROOT / "state" / "runs"
+OBJECTS_ROOT = RAW_ROOT / "objects"
+
+ARCHIVE_SUFFIXES = {"gzip": ".tar.gz", "zstd": ".tar.zst"}
+
+
+@contextmanager
+def open_archive(path, mode, compression):
+    """tarfile over a gzip or zstd compressed file; mode is "r" or "w"."""
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("LAKE_ARCHIVE_COMPRESSION=zstd requires the zstandard package")
+        with zstandard.open(path, mode + "b") as f, tarfile.open(fileobj=f, mode=mode + "|") as tar:
+            yield tar
+    elif compression == "gzip":
+        with tarfile.open(path, mode + ":gz") as tar:
+            yield tar
+    else:
+        raise ValueError(f"Unknown archive compression {compression}")
+
+
+def read_index():
+    try:
+        with open(ARCHIVE_ROOT / "index.json", "rb") as f:
+            return codec.load(f)
+    except FileNotFoundError:
+        return {"runs": {}}
+
+
+def write_index(index):
+    ARCHIVE_ROOT.mkdir(parents=True, exist_ok=True)
+    tmp_path = ARCHIVE_ROOT / "index.json.tmp"
+    with open(tmp_path, "wb") as f:
+        codec.dump(index, f, pretty=True, sort_keys=True)
+    tmp_path.replace(ARCHIVE_ROOT / "index.json")
+
+
+def run_info(run_id):
+    """Creation time, completeness, raw format and record counts of a live run."""
+    raw_dir = RAW_ROOT / run_id
+    manifest = read_manifest(raw_dir) if raw_dir.exists() else None
+    if manifest and manifest.get("created_ts"):
+        created = datetime.fromisoformat(manifest["created_ts"])
+    else:
+        # Runs written before manifests carried created_ts
+        mtimes = [path.stat().st_mtime for path in (raw_dir, NORMALIZED_ROOT / run_id) if path.exists()]
+        created = datetime.fromtimestamp(min(mtimes), timezone.utc)
+    return {
+        "created_ts": created.isoformat(),
+        "complete": manifest.get("complete", True) if manifest else True,
+        "raw_format": (manifest or {}).get("format", "json") if raw_dir.exists() else None,
+        "records": {name: entry["records"] for name, entry in (manifest or {}).get("files", {}).items()},
+        "normalized": (NORMALIZED_ROOT / run_id).exists(),
+    }
+
+
+def live_runs():
+    """{run_id: run_info} for every run with a raw or normalized directory."""
+    run_ids = set()
+    for root in (RAW_ROOT, NORMALIZED_ROOT):
+        if root.exists():
+            run_ids |= {path.name for path in root.iterdir() if path.is_dir() and path != OBJECTS_ROOT}
+    return {run_id: run_info(run_id) for run_id in run_ids}
+
+
+def plan(runs, now, protected=()):
+    """
+    Split runs ({run_id: info with created_ts and complete}) by the retention policy.
+    Returns (keep, archive, delete) sets of run ids; protected and incomplete runs are kept.
+    """
+    ordered = sorted(runs, key=lambda run_id: runs[run_id]["created_ts"], reverse=True)
+    incomplete = {run_id for run_id in runs if not runs[run_id]["complete"]}
+    keep = set(ordered[:LAKE_KEEP_RUNS]) | (set(protected) & set(runs)) | incomplete
+    snapshots = {}
+    for run_id in ordered:
+        if not runs[run_id]["complete"]:
+            continue
+        created = datetime.fromisoformat(runs[run_id]["created_ts"])
+        if now - created <= timedelta(days=LAKE_DAILY_DAYS):
+            bucket = created.date().isoformat()
+        else:
+            months = (now.year - created.year) * 12 + now.month - created.month
+            if LAKE_MONTHLY_MONTHS and months > LAKE_MONTHLY_MONTHS:
+                continue
+            bucket = f"{created.year}-{created.month:02d}"
+        # Newest first, so the first run seen in a day or month is its snapshot
+        snapshots.setdefault(bucket, run_id)
+    archive = set(snapshots.values()) - keep
+    return keep, archive, set(runs) - keep - archive
+
+
+def referenced_objects(raw_dir):
+    """Hashes of the cas objects listed by a run directory's .hashes files."""
+    digests = set()
+    for path in Path(raw_dir).glob("*.hashes"):
+        with open(path, encoding="utf-8") as f:
+            digests.update(line.rstrip("\n").rpartition("\t")[2] for line in f if line.strip())
+    return digests
+
+
+def archive_run(run_id, info, now):
+    """Write data/archive/{run_id}.tar.* and return the run's index entry."""
+    ARCHIVE_ROOT.mkdir(parents=True, exist_ok=True)
+    path = ARCHIVE_ROOT / f"{run_id}{ARCHIVE_SUFFIXES[LAKE_ARCHIVE_COMPRESSION]}"
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    raw_dir = RAW_ROOT / run_id
+    with open_archive(tmp_path, "w", LAKE_ARCHIVE_COMPRESSION) as tar:
+        if raw_dir.exists():
+            tar.add(raw_dir, arcname=f"raw/{run_id}")
+            if info["raw_format"] == "cas":
+                # Archives are self-contained, so the objects can be collected afterwards
+                objects = RawReader(raw_dir).objects
+                for digest in sorted(referenced_objects(raw_dir)):
+                    object_path = objects.path(digest)
+                    tar.add(object_path, arcname=f"raw/objects/{object_path.relative_to(objects.root)}")
+        if (NORMALIZED_ROOT / run_id).exists():
+            tar.add(NORMALIZED_ROOT / run_id, arcname=f"normalized/{run_id}")
+    tmp_path.replace(path)
+    return {
+        **info,
+        "state": "archived",
+        "archive": path.name,
+        "compression": LAKE_ARCHIVE_COMPRESSION,
+        "bytes": path.stat().st_size,
+        "archived_ts": now.isoformat(),
+    }
+
+
+def remove_run(run_id):
+    for path in (RAW_ROOT / run_id, NORMALIZED_ROOT / run_id, MARKER_ROOT / run_id):
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def collect_objects(now, dry_run=False):
+    """Delete cas objects no run directory references. Returns (objects, bytes) freed."""
+    if not OBJECTS_ROOT.exists():
+        return 0, 0
+    referenced = set()
+    for raw_dir in RAW_ROOT.iterdir():
+        if raw_dir.is_dir() and raw_dir != OBJECTS_ROOT:
+            referenced |= referenced_objects(raw_dir)
+    cutoff = (now - timedelta(hours=LAKE_GC_GRACE_HOURS)).timestamp()
+    freed = freed_bytes = 0
+    for path in OBJECTS_ROOT.glob("*/*"):
+        # <sha256><suffix>, or a temporary file left by an interrupted write
+        if path.name[:64] in referenced:
+            continue
+        stat = path.stat()
+        if stat.st_mtime > cutoff:
+            continue
+        freed += 1
+        freed_bytes += stat.st_size
+        if not dry_run:
+            path.unlink()
+    return freed, freed_bytes
+
+
+def compact(dry_run=False, now=None):
+    """Apply the retention policy to every run. Returns a summary of what was done."""
+    now = now or datetime.now(timezone.utc)
+    index = read_index()
+    live = live_runs()
+    archived = {run_id: entry for run_id, entry in index["runs"].items() if entry["state"] == "archived"}
+    runs = {**archived, **live}
+    watermark = load_watermark(WATERMARK_PATH)
+    keep, archive, delete = plan(runs, now, protected=[watermark["run_id"]] if watermark else [])
+    summary = {"kept": len(keep), "archived": 0, "deleted": 0, "archive_bytes": 0}
+
+    for run_id in sorted(archive & live.keys()):
+        logger.info(f"Archiving run {run_id} ({runs[run_id]['created_ts']})")
+        if dry_run:
+            summary["archived"] += 1
+            continue
+        index["runs"][run_id] = archive_run(run_id, live[run_id], now)
+        write_index(index)
+        remove_run(run_id)
+        summary["archived"] += 1
+        summary["archive_bytes"] += index["runs"][run_id]["bytes"]
+
+    for run_id in sorted(delete):
+        logger.info(f"Deleting run {run_id} ({runs[run_id]['created_ts']})")
+        summary["deleted"] += 1
+        if dry_run:
+            continue
+        remove_run(run_id)
+        if run_id in archived:
+            (ARCHIVE_ROOT / archived[run_id]["archive"]).unlink(missing_ok=True)
+        entry = {key: value for key, value in runs[run_id].items() if key not in ("archive", "bytes")}
+        index["runs"][run_id] = {**entry, "state": "deleted", "deleted_ts": now.isoformat()}
+    if not dry_run:
+        write_index(index)
+
+    summary["objects_freed"], summary["object_bytes_freed"] = collect_objects(now, dry_run)
+    logger.info(f"Lake compaction{' (dry run)' if dry_run else ''}: {summary}")
+    return summary
+
+
+def restore(run_id):
+    """Unpack an archived run into data/raw/{run_id} and data/normalized/{run_id}."""
+    entry = read_index()["runs"].get(run_id)
+    if entry is None or entry["state"] != "archived":
+        state = entry["state"] if entry else "unknown"
+        raise ValueError(f"Run {run_id} is not archived (state: {state})")
+    restored = 0
+    with open_archive(ARCHIVE_ROOT / entry["archive"], "r", entry["compression"]) as tar:
+        for member in tar:
+            # Objects shared with live runs are already in place
+            if member.name.startswith("raw/objects/") and (DATA_ROOT / member.name).exists():
+                continue
+            tar.extract(member, DATA_ROOT, filter="data")
+            restored += member.isfile()
+    logger.info(f"Restored run {run_id} from {entry['archive']} ({restored} files)")
+    return restored
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    parser = argparse.ArgumentParser(description="Data lake retention and compaction")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compact_parser = subparsers.add_parser("compact", help="apply the retention policy")
+    compact_parser.add_argument("--dry-run", action="store_true", help="log the plan without changing anything")
+    restore_parser = subparsers.add_parser("restore", help="unpack an archived run")
+    restore_parser.add_argument("run_id")
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        print(codec.dumps(compact(dry_run=args.dry_run), pretty=True))
+    else:
+        restore(args.run_id)
@@ -0,0 +1,263 @@
+"""
+Versioned schema migrations for the tables in models.py.
+
+Applied versions are recorded in schema_migrations. migrate(engine):
+
+- on an empty database, creates the current schema from models.py and records every
+  migration as applied;
+- on an existing deployment, runs the migrations it has not applied yet, in order,
+  each in its own transaction.
+
+An advisory lock serializes concurrent callers, such as app.py and
+webhook.py starting together. A schema change goes into models.py and, as a new
+entry at the end of MIGRATIONS, into the SQL that brings existing databases to it.
+Migrations run against databases that were created from any later models.py, so
+they must be idempotent (IF NOT EXISTS, IF EXISTS). They use PostgreSQL features
+(partitioning, advisory locks, sequences) freely: the schema requires PostgreSQL.
+
+    python migrations.py           # apply pending migrations
+    python migrations.py status    # list applied and pending versions
+"""
+import logging
+import argparse
+from datetime import datetime, timezone
+
+from sqlalchemy import inspect, select, text
+
+from models import Base, Snapshot, CurrentSnapshot, EffectiveAccess, WebhookDelivery
+from db import get_engine
+from snapshots import create_partition, create_default_partition, create_default_partitions
+from snapshots import register, current_run_id, set_current, seed_pointer, SNAPSHOT_TABLES
+from history import HISTORY, latest_change, record as record_history
+from effective_access import refresh as refresh_effective_access
+
+logger = logging.getLogger(__name__)
+
+VERSION_TABLE = "schema_migrations"
+# Arbitrary key of the PostgreSQL advisory lock held while migrating
+LOCK_ID = 7_402_113
+
+# Rows of one run sharing these columns are the same record
+NATURAL_KEYS = {
+    "permissions": ("run_id", "repo_name", "login"),
+    "team_members": ("run_id", "team_slug", "login"),
+    "team_repos": ("run_id", "team_slug", "repo_name"),
+}
+# Columns the API and the loaders filter on
+LOOKUP_INDEXES = {
+    "ix_repos_name": ("repos", "name"),
+    "ix_members_login": ("members", "login"),
+    "ix_teams_slug": ("teams", "slug"),
+    "ix_permissions_repo_name": ("permissions", "repo_name"),
+    "ix_permissions_login": ("permissions", "login"),
+    "ix_team_members_login": ("team_members", "login"),
+    "ix_team_repos_repo_name": ("team_repos", "repo_name"),
+}
+
+
+def natural_key_index(table):
+    return f"ux_{table}_natural_key"
+
+
+def baseline(connection):
+    """Tables of the original schema; existing deployments already have them."""
+    Base.metadata.create_all(bind=connection, checkfirst=True)
+
+
+def natural_keys_and_indexes(connection):
+    """
+    Unique natural key per run for the tables with surrogate ids, and b-tree indexes on
+    the lookup columns. Duplicate rows appended by earlier merge loads are removed
+    first, keeping the most recently inserted one.
+    """
+    for table, key in NATURAL_KEYS.items():
+        columns = ", ".join(key)
+        deleted = connection.execute(text(
+            f"DELETE FROM {table} WHERE id NOT IN (SELECT MAX(id) FROM {table} GROUP BY {columns})"
+        )).rowcount
+        if deleted:
+            logger.info(f"Removed {deleted} duplicate {table} rows")
+        connection.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {natural_key_index(table)} ON {table} ({columns})"))
+    for index, (table, column) in LOOKUP_INDEXES.items():
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS {index} ON {table} ({column})"))
+
+
+# Tables partitioned by partition_by_run; later run-scoped tables are created partitioned
+PARTITIONED_BY_RUN = ["organizations", "members", "teams", "repos", "permissions", "team_members", "team_repos"]
+
+
+def partition_by_run(connection):
+    """
+    Rebuild the run-scoped tables keyed by (id, run_id) and partitioned by run_id, with a
+    partition per run already loaded. Rows move over as they are, webhook
+    rows into the default partition. The run loaded last becomes the current snapshot.
+    """
+    Base.metadata.create_all(bind=connection, tables=[Snapshot.__table__, CurrentSnapshot.__table__], checkfirst=True)
+    runs = {}
+    for name in PARTITIONED_BY_RUN:
+        table = Base.metadata.tables[name]
+        if "run_id" in inspect(connection).get_pk_constraint(name)["constrained_columns"]:
+            continue
+        old = f"{name}_unpartitioned"
+        connection.execute(text(f"ALTER TABLE {name} RENAME TO {old}"))
+        # Index and constraint names are schema-wide; the rebuilt table takes them over
+        for index in inspect(connection).get_indexes(old):
+            connection.execute(text(f"DROP INDEX {index['name']}"))
+        connection.execute(text(f"ALTER TABLE {old} DROP CONSTRAINT IF EXISTS {name}_pkey"))
+        table.create(bind=connection)
+        create_default_partition(connection, name)
+        for (run_id,) in connection.execute(text(f"SELECT DISTINCT run_id FROM {old} WHERE run_id IS NOT NULL")):
+            if not run_id.startswith("webhook:"):
+                create_partition(connection, name, run_id)
+        columns = ", ".join(column.name for column in table.columns)
+        moved = connection.execute(text(
+            f"INSERT INTO {name} ({columns}) SELECT {columns} FROM {old} WHERE run_id IS NOT NULL"
+        )).rowcount
+        if table.c.id.autoincrement is True:
+            connection.execute(text(f"SELECT setval(pg_get_serial_sequence('{name}', 'id'), MAX(id)) FROM {name}"))
+        connection.execute(text(f"DROP TABLE {old}"))
+        logger.info(f"Moved {moved} {name} rows into run partitions")
+        for run_id, loaded_ts in connection.execute(text(f"SELECT run_id, MAX(updated_ts) FROM {name} GROUP BY run_id")):
+            if not run_id.startswith("webhook:") and loaded_ts:
+                runs[run_id] = max(runs.get(run_id, loaded_ts), loaded_ts)
+    for name in PARTITIONED_BY_RUN:
+        create_default_partition(connection, name)
+    for run_id, loaded_ts in runs.items():
+        register(connection, run_id, created_ts=loaded_ts)
+    if runs and current_run_id(connection) is None:
+        set_current(connection, max(runs, key=runs.get))
+
+
+def access_history(connection):
+    """
+    History tables of permissions and team access, seeded by replaying every run still in
+    the database from oldest to newest. Runs migrated by partition_by_run were never
+    published through the pointer, but each was the data of its day.
+    """
+    Base.metadata.create_all(bind=connection, tables=[model.__table__ for model, _, _ in HISTORY.values()], checkfirst=True)
+    if latest_change(connection) is not None:
+        return
+    runs = connection.execute(
+        select(Snapshot.run_id, Snapshot.created_ts).order_by(Snapshot.created_ts)
+    ).all()
+    for run_id, created_ts in runs:
+        record_history(connection, run_id, created_ts)
+    logger.info(f"Seeded access history from {len(runs)} runs")
+
+
+def effective_access(connection):
+    """Effective access table, with a partition per loaded run and its rows computed for each."""
+    EffectiveAccess.__table__.create(bind=connection, checkfirst=True)
+    runs = list(connection.execute(select(Snapshot.run_id)).scalars())
+    create_default_partition(connection, EffectiveAccess.__tablename__)
+    for run_id in runs:
+        create_partition(connection, EffectiveAccess.__tablename__, run_id)
+    for run_id in runs:
+        refresh_effective_access(connection, run_id)
+    logger.info(f"Computed effective access of {len(runs)} runs")
+
+
+def webhook_deliveries(connection):
+    """Log of webhook deliveries, replayed onto a run when it is published."""
+    WebhookDelivery.__table__.create(bind=connection, checkfirst=True)
+
+
+def seed_current_snapshot(connection):
+    """
+    The current_snapshot row, so the webhook receiver's lock on it serializes with publish
+    even before the first run. Rows webhook deliveries wrote under run ids of their own
+    before then are removed: nothing reads them, and catch_up replays the deliveries.
+    """
+    seed_pointer(connection)
+    for table in SNAPSHOT_TABLES:
+        deleted = connection.execute(text(f"DELETE FROM {table}_default WHERE run_id LIKE 'webhook:%'")).rowcount
+        if deleted:
+            logger.info(f"Removed {deleted} {table} rows of webhook deliveries applied before the first publish")
+
+
+# (version, name, migration); append only
+MIGRATIONS = [
+    (1, "baseline", baseline),
+    (2, "natural_keys_and_indexes", natural_keys_and_indexes),
+    (3, "partition_by_run", partition_by_run),
+    (4, "access_history", access_history),
+    (5, "effective_access", effective_access),
+    (6, "webhook_deliveries", webhook_deliveries),
+    (7, "seed_current_snapshot", seed_current_snapshot),
+]
+
+
+def ensure_version_table(connection):
+    connection.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} "
+        "(version INTEGER PRIMARY KEY, name VARCHAR NOT NULL, applied_ts TIMESTAMP NOT NULL)"
+    ))
+
+
+def applied_versions(connection):
+    return {row[0] for row in connection.execute(text(f"SELECT version FROM {VERSION_TABLE}"))}
+
+
+def record(connection, version, name):
+    connection.execute(
+        text(f"INSERT INTO {VERSION_TABLE} (version, name, applied_ts) VALUES (:version, :name, :ts)"),
+        {"version": version, "name": name, "ts": datetime.now(timezone.utc).replace(tzinfo=None)},
+    )
+
+
+def lock(connection):
+    connection.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": LOCK_ID})
+
+
+def migrate(engine=None):
+    """Bring the database schema up to date. Returns the versions applied."""
+    engine = engine or get_engine()
+    with engine.begin() as connection:
+        lock(connection)
+        ensure_version_table(connection)
+        applied = applied_versions(connection)
+        if not applied:
+            existing = set(inspect(connection).get_table_names()) & set(Base.metadata.tables)
+            if not existing:
+                Base.metadata.create_all(bind=connection)
+                create_default_partitions(connection)
+                seed_pointer(connection)
+                for version, name, _ in MIGRATIONS:
+                    record(connection, version, name)
+                logger.info(f"Created schema at version {MIGRATIONS[-1][0]}")
+                return [version for version, _, _ in MIGRATIONS]
+
+    done = []
+    for version, name, migration in MIGRATIONS:
+        with engine.begin() as connection:
+            lock(connection)
+            if version in applied_versions(connection):
+                continue
+            logger.info(f"Applying migration {version} {name}")
+            migration(connection)
+            record(connection, version, name)
+            done.append(version)
+    if done:
+        logger.info(f"Schema migrated to version {MIGRATIONS[-1][0]}")
+    return done
+
+
+def status(engine=None):
+    engine = engine or get_engine()
+    with engine.begin() as connection:
+        ensure_version_table(connection)
+        applied = applied_versions(connection)
+    return [(version, name, version in applied) for version, name, _ in MIGRATIONS]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    parser = argparse.ArgumentParser(description="Apply schema migrations")
+    parser.add_argument("command", nargs="?", choices=["upgrade", "status"], default="upgrade")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        for version, name, applied in status():
+            print(f"{version:>4} {name:<32} {'applied' if applied else 'pending'}")
+    else:
+        migrate()
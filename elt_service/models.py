@@ -1,35 +1,26 @@
 import sqlalchemy
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, JSON, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 from datetime import datetime
 
-import os
-from dotenv import load_dotenv, find_dotenv
-
 # Pydantic models for normalization
 from pydantic import BaseModel, Field
 from typing import Optional
 
-# Load environment variables from .env file
-load_dotenv(find_dotenv())
-
-DB_HOSTNAME = os.environ.get("DB_HOSTNAME", "localhost")
-DB_NAME = os.environ.get("DB_NAME", "postgres")
-DB_USER = os.environ.get("DB_USER", "postgres")
-DB_PASSWORD = os.environ.get("DB_PASSWORD", "postgres")
-DB_PORT = os.environ.get("DB_PORT", 5432)
-
 Base = declarative_base()
 
+# Run-scoped tables are list-partitioned by run_id, one partition per run (see snapshots.py),
+# so the schema requires PostgreSQL; the primary key includes run_id, as partitioning requires
+PARTITION_BY = {"postgresql_partition_by": "LIST (run_id)"}
+
 # --- SQLAlchemy Models ---
 
 class Organization(Base):
     __tablename__ = "organizations"
+    __table_args__ = PARTITION_BY
     id = Column(Integer, primary_key=True)
-    run_id = Column(String, index=True)
+    run_id = Column(String, primary_key=True)
     created_ts = Column(DateTime, default=datetime.utcnow)
     updated_ts = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     login = Column(String)
@@ -53,11 +44,12 @@ class Organization(Base):
 
 class Member(Base):
     __tablename__ = "members"
+    __table_args__ = PARTITION_BY
     id = Column(Integer, primary_key=True)
-    run_id = Column(String, index=True)
+    run_id = Column(String, primary_key=True)
     created_ts = Column(DateTime, default=datetime.utcnow)
     updated_ts = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    login = Column(String)
+    login = Column(String, index=True)
     node_id = Column(String)
     avatar_url = Column(String)
     gravatar_id = Column(String)
@@ -79,13 +71,14 @@ class Member(Base):
 
 class Team(Base):
     __tablename__ = "teams"
+    __table_args__ = PARTITION_BY
     id = Column(Integer, primary_key=True)
-    run_id = Column(String, index=True)
+    run_id = Column(String, primary_key=True)
     created_ts = Column(DateTime, default=datetime.utcnow)
     updated_ts = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     name = Column(String)
     node_id = Column(String)
-    slug = Column(String)
+    slug = Column(String, index=True)
     description = Column(String)
     privacy = Column(String)
     notification_setting = Column(String)
@@ -98,12 +91,13 @@ class Team(Base):
 
 class Repo(Base):
     __tablename__ = "repos"
+    __table_args__ = PARTITION_BY
     id = Column(Integer, primary_key=True)
-    run_id = Column(String, index=True)
+    run_id = Column(String, primary_key=True)
     created_ts = Column(DateTime, default=datetime.utcnow)
     updated_ts = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     node_id = Column(String)
-    name = Column(String)
+    name = Column(String, index=True)
     full_name = Column(String)
     private = Column(Boolean)
     owner_login = Column(String)
@@ -144,12 +138,17 @@ class Repo(Base):
 
 class Permission(Base):
     __tablename__ = "permissions"
-    id = Column(Integer, primary_key=True)
-    run_id = Column(String, index=True)
+    __table_args__ = (
+        # One row per collaborator of a repo and run
+        Index("ux_permissions_natural_key", "run_id", "repo_name", "login", unique=True),
+        PARTITION_BY,
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_id = Column(String, primary_key=True)
     created_ts = Column(DateTime, default=datetime.utcnow)
     updated_ts = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    repo_name = Column(String)
-    login = Column(String)
+    repo_name = Column(String, index=True)
+    login = Column(String, index=True)
     node_id = Column(String)
     avatar_url = Column(String)
     gravatar_id = Column(String)
@@ -170,6 +169,133 @@ class Permission(Base):
     permissions = Column(JSON)
     role_name = Column(String)
 
+class TeamMember(Base):
+    __tablename__ = "team_members"
+    __table_args__ = (
+        # One row per member of a team and run
+        Index("ux_team_members_natural_key", "run_id", "team_slug", "login", unique=True),
+        PARTITION_BY,
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_id = Column(String, primary_key=True)
+    created_ts = Column(DateTime, default=datetime.utcnow)
+    updated_ts = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    team_slug = Column(String)
+    login = Column(String, index=True)
+    node_id = Column(String)
+    type = Column(String)
+    site_admin = Column(Boolean)
+
+class TeamRepo(Base):
+    __tablename__ = "team_repos"
+    __table_args__ = (
+        # One row per repo granted to a team and run
+        Index("ux_team_repos_natural_key", "run_id", "team_slug", "repo_name", unique=True),
+        PARTITION_BY,
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_id = Column(String, primary_key=True)
+    created_ts = Column(DateTime, default=datetime.utcnow)
+    updated_ts = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    team_slug = Column(String)
+    repo_name = Column(String, index=True)
+    full_name = Column(String)
+    private = Column(Boolean)
+    permissions = Column(JSON)
+    role_name = Column(String)
+
+class EffectiveAccess(Base):
+    # Highest role each user and team holds on each repo of a run, derived from permissions,
+    # team_repos and team_members once they load (see effective_access.py)
+    __tablename__ = "effective_access"
+    __table_args__ = (
+        Index("ix_effective_access_principal", "principal_type", "principal"),
+        PARTITION_BY,
+    )
+    run_id = Column(String, primary_key=True)
+    repo_name = Column(String, primary_key=True)
+    principal_type = Column(String, primary_key=True)  # "user" or "team"
+    principal = Column(String, primary_key=True)  # login or team slug
+    effective_role = Column(String)
+    # Team the role comes through; NULL for a direct collaborator and for the team itself
+    via_team = Column(String)
+    updated_ts = Column(DateTime, default=datetime.utcnow)
+
+class Snapshot(Base):
+    # A run with partitions in the run-scoped tables; published once all of them loaded
+    __tablename__ = "snapshots"
+    run_id = Column(String, primary_key=True)
+    created_ts = Column(DateTime, default=datetime.utcnow)
+    published_ts = Column(DateTime)
+
+class CurrentSnapshot(Base):
+    # Single row (id 1) naming the run that readers see
+    __tablename__ = "current_snapshot"
+    id = Column(Integer, primary_key=True)
+    run_id = Column(String)
+    updated_ts = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class WebhookDelivery(Base):
+    # A webhook delivery as received, replayed onto a run that loaded while it arrived (see webhook.py)
+    __tablename__ = "webhook_deliveries"
+    id = Column(Integer, primary_key=True)
+    delivery = Column(String)
+    event = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    received_ts = Column(DateTime, nullable=False, index=True)
+
+# --- Access history (see history.py) ---
+
+def history_indexes(table, scope, subject):
+    """
+    One open row per (scope, subject), a scope's history in time order for as-of lookups of
+    one repo or team, and the validity ranges for as-of lookups across all of them.
+    """
+    return (
+        Index(f"ux_{table}_open", scope, subject, unique=True,
+              postgresql_where=text("valid_to IS NULL")),
+        Index(f"ix_{table}_{scope}", scope, "valid_from"),
+        Index(f"ix_{table}_validity", text("tsrange(valid_from, valid_to)"), postgresql_using="gist"),
+    )
+
+class PermissionHistory(Base):
+    # A collaborator's role on a repo from valid_from until valid_to (NULL while it holds)
+    __tablename__ = "permission_history"
+    __table_args__ = history_indexes("permission_history", "repo_name", "login")
+    id = Column(Integer, primary_key=True)
+    repo_name = Column(String, nullable=False)
+    login = Column(String, nullable=False, index=True)
+    role_name = Column(String)
+    valid_from = Column(DateTime, nullable=False)
+    valid_to = Column(DateTime)
+    opened_run_id = Column(String)
+    closed_run_id = Column(String)
+
+class TeamMemberHistory(Base):
+    # A user's membership of a team from valid_from until valid_to (NULL while it holds)
+    __tablename__ = "team_member_history"
+    __table_args__ = history_indexes("team_member_history", "team_slug", "login")
+    id = Column(Integer, primary_key=True)
+    team_slug = Column(String, nullable=False)
+    login = Column(String, nullable=False, index=True)
+    valid_from = Column(DateTime, nullable=False)
+    valid_to = Column(DateTime)
+    opened_run_id = Column(String)
+    closed_run_id = Column(String)
+
+class TeamRepoHistory(Base):
+    # A team's role on a repo from valid_from until valid_to (NULL while it holds)
+    __tablename__ = "team_repo_history"
+    __table_args__ = history_indexes("team_repo_history", "team_slug", "repo_name")
+    id = Column(Integer, primary_key=True)
+    team_slug = Column(String, nullable=False)
+    repo_name = Column(String, nullable=False, index=True)
+    role_name = Column(String)
+    valid_from = Column(DateTime, nullable=False)
+    valid_to = Column(DateTime)
+    opened_run_id = Column(String)
+    closed_run_id = Column(String)
+
 # --- Pydantic Models for normalization ---
 
 class OrganizationModel(BaseModel):
@@ -236,7 +362,8 @@ class TeamModel(BaseModel):
     html_url: Optional[str]
     members_url: Optional[str]
     repositories_url: Optional[str]
-    permission: Optional[str]
+    # Deprecated in the REST listing; GraphQL reports none, so teams extracted with it leave it unset
+    permission: Optional[str] = None
     parent: Optional[int]
 
 class RepoModel(BaseModel):
@@ -310,6 +437,23 @@ class PermissionModel(BaseModel):
     permissions: Optional[dict]
     role_name: Optional[str]
 
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOSTNAME}:{DB_PORT}/{DB_NAME}"
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
\ No newline at end of file
+class TeamMemberModel(BaseModel):
+    run_id: str
+    created_ts: datetime = Field(default_factory=datetime.utcnow)
+    updated_ts: datetime = Field(default_factory=datetime.utcnow)
+    team_slug: str
+    login: Optional[str]
+    node_id: Optional[str]
+    type: Optional[str]
+    site_admin: Optional[bool]
+
+class TeamRepoModel(BaseModel):
+    run_id: str
+    created_ts: datetime = Field(default_factory=datetime.utcnow)
+    updated_ts: datetime = Field(default_factory=datetime.utcnow)
+    team_slug: str
+    repo_name: Optional[str]
+    full_name: Optional[str]
+    private: Optional[bool]
+    permissions: Optional[dict]
+    role_name: Optional[str]
\ No newline at end of file
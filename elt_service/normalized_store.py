@@ -0,0 +1,188 @@
+"""
+Normalized data lake writer and reader for data/normalized/{run_id}/.
+
+Two on-disk formats are supported:
+
+- json: the original layout, one pretty-printed JSON list per table (members.json, ...).
+- parquet: one typed Parquet file per table (members.parquet, ...). The Arrow schema is
+  derived from the table's Pydantic model, so ids stay integers, flags stay booleans and
+  created_ts/updated_ts are stored as UTC timestamps. Dict fields such as `permissions`
+  are stored as JSON text and decoded again on read.
+
+NormalizedWriter.append adds records to a table as they are produced, for the streaming
+pipeline; close() then finishes every appended file.
+
+NormalizedReader picks whichever file exists for a table and yields it in batches of
+records, so the loader never materializes a whole Parquet file at once. Timestamps come
+back as datetimes from either format.
+"""
+import logging
+import typing
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import codec
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+# Schema metadata key listing columns that hold JSON-encoded dicts
+JSON_COLUMNS_KEY = b"elt.json_columns"
+# Timestamp fields of every table, stored as ISO 8601 text in the json format
+TIMESTAMP_FIELDS = ("created_ts", "updated_ts")
+
+
+def require_pyarrow():
+    if pa is None:
+        raise RuntimeError("NORMALIZED_FORMAT=parquet requires the pyarrow package")
+
+
+def unwrap_optional(annotation):
+    args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+    if typing.get_origin(annotation) is typing.Union and len(args) == 1:
+        return args[0]
+    return annotation
+
+
+# Field types with a native Arrow column; anything else (dicts, lists) is stored as JSON text
+ARROW_TYPES = {
+    bool: lambda: pa.bool_(),
+    int: lambda: pa.int64(),
+    float: lambda: pa.float64(),
+    str: lambda: pa.string(),
+    datetime: lambda: pa.timestamp("us", tz="UTC"),
+}
+
+
+def arrow_schema(model):
+    """Arrow schema with one column per field of the Pydantic model, in declaration order."""
+    require_pyarrow()
+    fields = []
+    encoded = []
+    for name, info in model.model_fields.items():
+        annotation = unwrap_optional(info.annotation)
+        if annotation in ARROW_TYPES:
+            fields.append(pa.field(name, ARROW_TYPES[annotation]()))
+        else:
+            fields.append(pa.field(name, pa.string()))
+            encoded.append(name)
+    return pa.schema(fields, metadata={JSON_COLUMNS_KEY: codec.encode(encoded)})
+
+
+def json_columns(schema):
+    return codec.decode((schema.metadata or {}).get(JSON_COLUMNS_KEY, b"[]"))
+
+
+class NormalizedWriter:
+    def __init__(self, norm_dir, fmt="json", compression="zstd"):
+        if fmt not in ("json", "parquet"):
+            raise ValueError(f"Unknown normalized format {fmt}")
+        if fmt == "parquet":
+            require_pyarrow()
+        self.norm_dir = Path(norm_dir)
+        self.norm_dir.mkdir(parents=True, exist_ok=True)
+        self.format = fmt
+        self.compression = compression
+        self._lock = threading.Lock()
+        self._appending = {}
+
+    def _path(self, name):
+        # Output of the other format would shadow or outlive this one
+        other = "parquet" if self.format == "json" else "json"
+        (self.norm_dir / f"{name}.{other}").unlink(missing_ok=True)
+        return self.norm_dir / f"{name}.{self.format}"
+
+    def _arrow_table(self, model, records):
+        schema = arrow_schema(model)
+        encoded = json_columns(schema)
+        if encoded:
+            records = [
+                {**record, **{c: None if record.get(c) is None else codec.dumps(record[c]) for c in encoded}}
+                for record in records
+            ]
+        return pa.Table.from_pylist(records, schema=schema)
+
+    def write(self, name, model, records):
+        """Write the model_dump() records of one table, replacing output of the other format."""
+        if self.format == "json":
+            with open(self._path(name), "wb") as f:
+                codec.dump(records, f, pretty=True)
+            return
+        pq.write_table(self._arrow_table(model, records), self._path(name), compression=self.compression)
+
+    def append(self, name, model, records):
+        """Add records to a table that is written incrementally; thread-safe."""
+        with self._lock:
+            handle = self._appending.get(name)
+            if self.format == "json":
+                if handle is None:
+                    handle = self._appending[name] = open(self._path(name), "w")
+                    handle.write("[")
+                    separator = "\n"
+                else:
+                    separator = ",\n"
+                for record in records:
+                    handle.write(separator)
+                    handle.write(codec.dumps(record))
+                    separator = ",\n"
+            else:
+                table = self._arrow_table(model, records)
+                if handle is None:
+                    handle = self._appending[name] = pq.ParquetWriter(
+                        self._path(name), table.schema, compression=self.compression
+                    )
+                handle.write_table(table)
+
+    def close(self):
+        """Finish every table written with append."""
+        with self._lock:
+            for handle in self._appending.values():
+                if self.format == "json":
+                    handle.write("\n]\n")
+                handle.close()
+            self._appending.clear()
+
+
+class NormalizedReader:
+    def __init__(self, norm_dir):
+        self.norm_dir = Path(norm_dir)
+
+    def _parquet_path(self, name):
+        return self.norm_dir / f"{name}.parquet"
+
+    def exists(self, name):
+        return self._parquet_path(name).exists() or (self.norm_dir / f"{name}.json").exists()
+
+    def format(self, name):
+        return "parquet" if self._parquet_path(name).exists() else "json"
+
+    def arrow_batches(self, name, batch_size=10_000, columns=None):
+        """Yield the Parquet file of a table as Arrow record batches, JSON columns still encoded."""
+        require_pyarrow()
+        yield from pq.ParquetFile(self._parquet_path(name)).iter_batches(batch_size=batch_size, columns=columns)
+
+    def batches(self, name, batch_size=10_000):
+        """Yield lists of up to batch_size records of one table."""
+        path = self._parquet_path(name)
+        if path.exists():
+            require_pyarrow()
+            parquet = pq.ParquetFile(path)
+            encoded = json_columns(parquet.schema_arrow)
+            for batch in parquet.iter_batches(batch_size=batch_size):
+                records = batch.to_pylist()
+                for record in records:
+                    for column in encoded:
+                        if record[column] is not None:
+                            record[column] = codec.decode(record[column])
+                yield records
+            return
+        with open(self.norm_dir / f"{name}.json", "rb") as f:
+            records = codec.load(f)
+        for start in range(0, len(records), batch_size):
+            yield codec.parse_datetimes(records[start:start + batch_size], TIMESTAMP_FIELDS)
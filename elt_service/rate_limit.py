@@ -0,0 +1,105 @@
+"""
+Rate-limit-aware request scheduling across one or more GitHub tokens.
+
+Every request first reserves a slot with RateLimitScheduler.reserve(), which picks
+the token that can send soonest and says how long to wait before sending. Each
+token is paced by its own token bucket (GCRA) and parked until X-RateLimit-Reset
+once its primary quota runs out. After the response arrives,
+RateLimitScheduler.update() records the quota headers and, for a primary or
+secondary limit (403/429), returns how long the caller should back off before retrying.
+"""
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# GitHub asks clients to wait at least a minute after a secondary limit without Retry-After
+SECONDARY_BACKOFF_SECONDS = 60
+MAX_BACKOFF_SECONDS = 900
+
+
+class TokenState:
+    def __init__(self, name, token):
+        self.name = name
+        self.token = token
+        self.remaining = None
+        self.reset_at = 0.0
+        self.blocked_until = 0.0
+        # Theoretical arrival time of the next request for the token bucket
+        self.tat = 0.0
+        self.strikes = 0
+        self.requests = 0
+
+
+class RateLimitScheduler:
+    def __init__(self, tokens, rate_per_token=10.0, burst=20):
+        """
+        tokens: GitHub tokens to spread requests over (None for unauthenticated).
+        rate_per_token: sustained requests per second allowed on each token.
+        burst: requests a token may send back to back after being idle.
+        """
+        self.tokens = [TokenState(f"token{i}", token) for i, token in enumerate(tokens or [None])]
+        self.interval = 1.0 / rate_per_token
+        self.tolerance = burst * self.interval
+        self._lock = threading.Lock()
+
+    def _earliest_start(self, state, now):
+        start = max(now, state.tat - self.tolerance, state.blocked_until)
+        if state.remaining is not None and state.remaining <= 0 and state.reset_at > now:
+            start = max(start, state.reset_at)
+        return start
+
+    def reserve(self):
+        """Reserve the next request slot. Returns (token_state, seconds_to_wait)."""
+        with self._lock:
+            now = time.time()
+            state = min(
+                self.tokens,
+                key=lambda s: (self._earliest_start(s, now), -(s.remaining if s.remaining is not None else float("inf"))),
+            )
+            start = self._earliest_start(state, now)
+            state.tat = max(state.tat, start) + self.interval
+            if state.remaining is not None:
+                state.remaining -= 1
+            state.requests += 1
+            return state, start - now
+
+    def update(self, state, response):
+        """
+        Record rate-limit headers from a response sent with state's token.
+        Returns the number of seconds to back off before retrying, or None if the
+        response was not rate limited.
+        """
+        headers = response.headers
+        now = time.time()
+        with self._lock:
+            if "X-RateLimit-Remaining" in headers:
+                state.remaining = int(headers["X-RateLimit-Remaining"])
+            if "X-RateLimit-Reset" in headers:
+                state.reset_at = float(headers["X-RateLimit-Reset"])
+
+            if response.status_code not in (403, 429):
+                state.strikes = 0
+                return None
+
+            if "Retry-After" in headers:
+                delay = float(headers["Retry-After"])
+            elif state.remaining == 0 and state.reset_at > now:
+                delay = state.reset_at - now + 1
+            elif response.status_code == 429 or "rate limit" in response.text.lower():
+                delay = min(SECONDARY_BACKOFF_SECONDS * 2 ** state.strikes, MAX_BACKOFF_SECONDS)
+            else:
+                # A plain permission 403, nothing to back off from
+                return None
+
+            state.strikes += 1
+            state.blocked_until = max(state.blocked_until, now + delay)
+            logger.warning(f"GitHub rate limit on {state.name}; pausing it for {delay:.0f}s")
+            return delay
+
+    def stats(self):
+        with self._lock:
+            return ", ".join(
+                f"{s.name}: requests={s.requests} remaining={s.remaining}" for s in self.tokens
+            )
@@ -0,0 +1,307 @@
+"""
+Raw data lake writer and reader for data/raw/{run_id}/.
+
+Three on-disk formats are supported:
+
+- json: the original layout, one pretty-printed JSON document per entity
+  (repos.json, permissions.json, ...). Records are buffered and dumped on close.
+- ndjson: records are appended one per line as pages arrive, optionally gzip or
+  zstd compressed (repos.ndjson.gz, ...). Keyed entities such as permissions are
+  written one group per line: {"key": "<repo name>", "items": [...]}.
+- cas: content-addressed. Every record, and every repo's or team's group of a keyed
+  entity, is stored once under data/raw/objects/ by the SHA-256 of its canonical JSON.
+  The run directory only holds {entity}.hashes files listing those hashes in order
+  ("<key>\t<hash>" for keyed entities). Unchanged records cost nothing on later runs.
+
+Every format ends with a manifest.json that lists each file with its record count;
+cas entries also carry a digest over the entity's hashes, equal between runs exactly
+when the entity is unchanged. Writers for different entities of one run each merge
+their files into the manifest. RawReader reads any format, and directories written
+before manifests existed, record by record.
+"""
+import os
+import gzip
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime, timezone
+
+import codec
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Entities keyed by repo name or team slug; the rest are plain record lists
+KEYED_ENTITIES = {"permissions", "team_members", "team_repos"}
+# Single JSON object rather than a list
+SINGLE_ENTITIES = {"org_details"}
+
+COMPRESSION_SUFFIXES = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+# Several writers may share one run directory (one per DAG stage); manifest updates are serialized
+_manifest_lock = threading.Lock()
+
+
+def open_text(path, mode, compression):
+    if compression == "gzip":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("RAW_COMPRESSION=zstd requires the zstandard package")
+        return zstandard.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def canonical_json(obj):
+    return codec.encode(obj, sort_keys=True)
+
+
+class ObjectStore:
+    """Content-addressed JSON objects, stored once each under root/<2 hex>/<sha256>."""
+
+    def __init__(self, root, compression="none"):
+        self.root = Path(root)
+        self.compression = compression
+        self.written = 0
+        self.reused = 0
+
+    def path(self, digest):
+        return self.root / digest[:2] / f"{digest}{COMPRESSION_SUFFIXES[self.compression]}"
+
+    def put(self, obj):
+        data = canonical_json(obj)
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if path.exists():
+            self.reused += 1
+            return digest
+        if self.compression == "gzip":
+            data = gzip.compress(data, mtime=0)
+        elif self.compression == "zstd":
+            if zstandard is None:
+                raise RuntimeError("RAW_COMPRESSION=zstd requires the zstandard package")
+            data = zstandard.ZstdCompressor().compress(data)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Concurrent writers of the same object each rename a complete private file into place
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        tmp_path.replace(path)
+        self.written += 1
+        return digest
+
+    def get(self, digest):
+        data = self.path(digest).read_bytes()
+        if self.compression == "gzip":
+            data = gzip.decompress(data)
+        elif self.compression == "zstd":
+            data = zstandard.ZstdDecompressor().decompress(data)
+        return codec.decode(data)
+
+
+class RawWriter:
+    def __init__(self, raw_dir, fmt="json", compression="none"):
+        if fmt not in ("json", "ndjson", "cas"):
+            raise ValueError(f"Unknown raw format {fmt}")
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unknown raw compression {compression}")
+        self.raw_dir = Path(raw_dir)
+        self.raw_dir.mkdir(parents=True, exist_ok=True)
+        self.format = fmt
+        # The json layout stays uncompressed so existing tooling can read it
+        self.compression = compression if fmt != "json" else "none"
+        self.counts = {}
+        self._files = {}
+        self._buffers = {}
+        self._digests = {}
+        # Shared by every run under the same data/raw/
+        self.objects = ObjectStore(self.raw_dir.parent / "objects", self.compression) if fmt == "cas" else None
+
+    def _filename(self, name):
+        if self.format == "json":
+            return f"{name}.json"
+        if self.format == "cas":
+            return f"{name}.hashes"
+        return f"{name}.ndjson{COMPRESSION_SUFFIXES[self.compression]}"
+
+    def _append_line(self, name, obj, key=None):
+        handle = self._files[name]
+        if self.format == "cas":
+            line = self.objects.put(obj)
+            if key is not None:
+                line = f"{key}\t{line}"
+            self._digests[name].append(line)
+            handle.write(line)
+        else:
+            handle.write(codec.dumps(obj if key is None else {"key": key, "items": obj}))
+        handle.write("\n")
+
+    def _ensure(self, name):
+        self.counts.setdefault(name, 0)
+        if self.format == "json" and name not in self._buffers:
+            self._buffers[name] = {} if name in KEYED_ENTITIES | SINGLE_ENTITIES else []
+        elif self.format == "cas" and name not in self._files:
+            self._files[name] = open(self.raw_dir / self._filename(name), "w", encoding="utf-8")
+            self._digests[name] = []
+        elif self.format == "ndjson" and name not in self._files:
+            self._files[name] = open_text(self.raw_dir / self._filename(name), "w", self.compression)
+
+    def write(self, name, records):
+        """Append a page of records to a list entity."""
+        self._ensure(name)
+        if self.format == "json":
+            self._buffers[name].extend(records)
+        else:
+            for record in records:
+                self._append_line(name, record)
+        self.counts[name] += len(records)
+
+    def write_group(self, name, key, items):
+        """Write all records of one repo or team for a keyed entity."""
+        self._ensure(name)
+        if self.format == "json":
+            self._buffers[name][key] = items
+        else:
+            self._append_line(name, items, key)
+        self.counts[name] += len(items)
+
+    def write_one(self, name, obj):
+        """Write a single-object entity such as org_details."""
+        self._ensure(name)
+        if self.format == "json":
+            self._buffers[name] = obj
+        else:
+            self._append_line(name, obj)
+        self.counts[name] += 1
+
+    def close(self, complete=True):
+        """Flush every entity and write manifest.json."""
+        for name, buffer in self._buffers.items():
+            with open(self.raw_dir / self._filename(name), "wb") as f:
+                codec.dump(buffer, f, pretty=True)
+        for handle in self._files.values():
+            handle.close()
+        self._files.clear()
+        files = {name: {"path": self._filename(name), "records": count} for name, count in self.counts.items()}
+        for name, lines in self._digests.items():
+            # Order-independent, since concurrent extractors write groups as they complete
+            files[name]["digest"] = hashlib.sha256("\n".join(sorted(lines)).encode()).hexdigest()
+        if self.objects is not None:
+            logger.info(
+                f"Raw object store: {self.objects.written} new objects, {self.objects.reused} unchanged"
+            )
+        with _manifest_lock:
+            manifest = read_manifest(self.raw_dir)
+            if manifest is None or (manifest["format"], manifest["compression"]) != (self.format, self.compression):
+                manifest = {
+                    "format": self.format,
+                    "compression": self.compression,
+                    "created_ts": datetime.now(timezone.utc).isoformat(),
+                    "files": {},
+                }
+                if self.objects is not None:
+                    manifest["objects"] = os.path.relpath(self.objects.root, self.raw_dir)
+            manifest["complete"] = complete
+            manifest["files"] = dict(sorted({**manifest["files"], **files}.items()))
+            write_manifest(self.raw_dir, manifest)
+
+
+def read_manifest(raw_dir):
+    try:
+        with open(Path(raw_dir) / "manifest.json", "rb") as f:
+            return codec.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_manifest(raw_dir, manifest):
+    # Replaced atomically: stages of the same run read it while other stages are still writing
+    tmp_path = Path(raw_dir) / "manifest.json.tmp"
+    with open(tmp_path, "wb") as f:
+        codec.dump(manifest, f, pretty=True)
+    tmp_path.replace(Path(raw_dir) / "manifest.json")
+
+
+def mark_complete(raw_dir):
+    """Flag a run whose entities were written by separate writers as complete."""
+    with _manifest_lock:
+        manifest = read_manifest(raw_dir)
+        manifest["complete"] = True
+        write_manifest(raw_dir, manifest)
+
+
+class RawReader:
+    def __init__(self, raw_dir):
+        self.raw_dir = Path(raw_dir)
+        self.manifest = read_manifest(self.raw_dir) or {"format": "json", "compression": "none", "files": {}}
+        self.format = self.manifest["format"]
+        self.compression = self.manifest["compression"]
+        self.objects = None
+        if self.format == "cas":
+            self.objects = ObjectStore(self.raw_dir / self.manifest["objects"], self.compression)
+
+    def _path(self, name):
+        entry = self.manifest["files"].get(name)
+        if entry:
+            return self.raw_dir / entry["path"]
+        if self.format == "json":
+            return self.raw_dir / f"{name}.json"
+        if self.format == "cas":
+            return self.raw_dir / f"{name}.hashes"
+        return self.raw_dir / f"{name}.ndjson{COMPRESSION_SUFFIXES[self.compression]}"
+
+    def exists(self, name):
+        return self._path(name).exists()
+
+    def hashes(self, name):
+        """Yield (key, hash) per record or group of a cas run; key is None for list entities."""
+        with open(self._path(name), encoding="utf-8") as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if line:
+                    key, _, digest = line.rpartition("\t")
+                    yield (key if "\t" in line else None), digest
+
+    def digest(self, name):
+        """Digest over all hashes of an entity in a cas run, or None for other formats."""
+        return self.manifest["files"].get(name, {}).get("digest")
+
+    def _lines(self, name):
+        if self.format == "cas":
+            for key, digest in self.hashes(name):
+                obj = self.objects.get(digest)
+                yield obj if key is None else {"key": key, "items": obj}
+            return
+        with open_text(self._path(name), "r", self.compression) as f:
+            for line in f:
+                if line.strip():
+                    yield codec.decode(line)
+
+    def _document(self, name):
+        with open(self._path(name), "rb") as f:
+            return codec.load(f)
+
+    def records(self, name):
+        """Yield the records of a list entity one by one."""
+        if self.format == "json":
+            yield from self._document(name)
+        else:
+            yield from self._lines(name)
+
+    def groups(self, name):
+        """Yield (key, items) for a keyed entity such as permissions."""
+        if self.format == "json":
+            yield from self._document(name).items()
+        else:
+            for line in self._lines(name):
+                yield line["key"], line["items"]
+
+    def one(self, name):
+        """Return a single-object entity such as org_details."""
+        if self.format == "json":
+            return self._document(name)
+        return next(self._lines(name), {})
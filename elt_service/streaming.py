@@ -0,0 +1,191 @@
+"""
+Streaming ELT: extract, normalize and load overlap instead of running one after another.
+
+    extractor --(raw queue)--> normalize workers --(normalized queue)--> batching DB writer
+
+The extractor writes through a TeeWriter, so every page or collaborator group still
+lands in the raw lake and is also handed to the pipeline. Both queues are bounded: a
+slow database backs up normalization, which in turn backs up the extractor. The async
+extractor writes through an AsyncWriter, so a full queue holds up the coroutines that
+write rather than the event loop, and requests in flight and rate-limit waits go on. A failure
+in any stage aborts the others and is raised from StreamPipeline.run().
+"""
+import time
+import queue
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a queue's input; each consumer receives one
+DONE = object()
+POLL_SECONDS = 0.5
+
+
+class PipelineAborted(Exception):
+    pass
+
+
+class TeeWriter:
+    """RawWriter stand-in that writes through to the raw lake and passes every write to sink."""
+
+    def __init__(self, writer, sink):
+        self.writer = writer
+        self.sink = sink
+
+    def write(self, name, records):
+        self.writer.write(name, records)
+        self.sink(name, records)
+
+    def write_group(self, name, key, items):
+        self.writer.write_group(name, key, items)
+        self.sink(name, items, key)
+
+    def write_one(self, name, obj):
+        self.writer.write_one(name, obj)
+        self.sink(name, [obj])
+
+
+class AsyncWriter:
+    """
+    Awaitable front for a RawWriter or TeeWriter. Writes run one at a time, in the order
+    they were awaited, on a worker thread of their own, so a write that blocks on a full
+    queue suspends the coroutine awaiting it instead of the event loop.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="raw-write")
+
+    async def run(self, fn, *args):
+        """Call fn(*args) on the writer thread."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def write(self, name, records):
+        await self.run(self.writer.write, name, records)
+
+    async def write_group(self, name, key, items):
+        await self.run(self.writer.write_group, name, key, items)
+
+    async def write_one(self, name, obj):
+        await self.run(self.writer.write_one, name, obj)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+class StreamPipeline:
+    def __init__(self, produce, normalize, load, workers=2, queue_size=64, batch_size=1000, flush_seconds=1.0):
+        """
+        produce(sink): runs the extraction, calling sink(entity, records, key=None) per page or group.
+        normalize(entity, records, key): returns (table, rows) for one page; runs on `workers` threads.
+        load(table, rows): writes one batch of rows, called from a single writer thread.
+        Rows are batched per table up to batch_size, and flushed after flush_seconds without input.
+        """
+        self.produce = produce
+        self.normalize = normalize
+        self.load = load
+        self.workers = workers
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.raw_queue = queue.Queue(maxsize=queue_size)
+        self.normalized_queue = queue.Queue(maxsize=queue_size)
+        self.abort = threading.Event()
+        self.errors = []
+        self.counts = {"pages": 0, "rows": 0, "batches": 0}
+
+    def _put(self, q, item):
+        while not self.abort.is_set():
+            try:
+                q.put(item, timeout=POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+        raise PipelineAborted()
+
+    def _get(self, q, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.abort.is_set():
+            wait = POLL_SECONDS if deadline is None else min(POLL_SECONDS, deadline - time.monotonic())
+            if wait <= 0:
+                raise queue.Empty()
+            try:
+                return q.get(timeout=wait)
+            except queue.Empty:
+                continue
+        raise PipelineAborted()
+
+    def _guard(self, name, fn):
+        try:
+            fn()
+        except PipelineAborted:
+            pass
+        except Exception as e:
+            logger.error(f"Streaming {name} failed: {e}")
+            self.errors.append(e)
+            self.abort.set()
+
+    def sink(self, entity, records, key=None):
+        self._put(self.raw_queue, (entity, records, key))
+        self.counts["pages"] += 1
+
+    def _extract(self):
+        try:
+            self.produce(self.sink)
+        finally:
+            if not self.abort.is_set():
+                for _ in range(self.workers):
+                    self._put(self.raw_queue, DONE)
+
+    def _normalize(self):
+        while True:
+            item = self._get(self.raw_queue)
+            if item is DONE:
+                self._put(self.normalized_queue, DONE)
+                return
+            table, rows = self.normalize(*item)
+            if rows:
+                self._put(self.normalized_queue, (table, rows))
+
+    def _flush(self, pending, table):
+        rows = pending.pop(table)
+        self.load(table, rows)
+        self.counts["rows"] += len(rows)
+        self.counts["batches"] += 1
+
+    def _write(self):
+        pending = {}
+        remaining = self.workers
+        while remaining:
+            try:
+                item = self._get(self.normalized_queue, timeout=self.flush_seconds)
+            except queue.Empty:
+                for table in list(pending):
+                    self._flush(pending, table)
+                continue
+            if item is DONE:
+                remaining -= 1
+                continue
+            table, rows = item
+            pending.setdefault(table, []).extend(rows)
+            if len(pending[table]) >= self.batch_size:
+                self._flush(pending, table)
+        for table in list(pending):
+            self._flush(pending, table)
+
+    def run(self):
+        threads = [threading.Thread(target=self._guard, args=("extract", self._extract), name="stream-extract")]
+        threads += [
+            threading.Thread(target=self._guard, args=("normalize", self._normalize), name=f"stream-normalize-{i}")
+            for i in range(self.workers)
+        ]
+        threads.append(threading.Thread(target=self._guard, args=("load", self._write), name="stream-load"))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if self.errors:
+            raise self.errors[0]
+        return self.counts
@@ -0,0 +1,37 @@
+from datetime import datetime
+
+from batch_normalize import BatchNormalizer
+from graphql_extract import team_to_rest
+from models import TeamModel
+
+NOW = datetime(2024, 1, 1)
+
+
+def rest_team(team_id, slug, parent=None):
+    """A team as the REST listing returns it."""
+    url = f"https://api.github.com/organizations/100/team/{team_id}"
+    return {
+        "id": team_id, "node_id": f"T_{team_id}", "name": slug.title(), "slug": slug, "description": None,
+        "privacy": "closed", "notification_setting": "notifications_enabled", "permission": "pull",
+        "url": url, "html_url": f"https://github.com/orgs/acme/teams/{slug}",
+        "members_url": f"{url}/members{{/member}}", "repositories_url": f"{url}/repos", "parent": parent,
+    }
+
+
+PARENT = rest_team(1, "platform")
+CHILD = rest_team(2, "platform-infra", parent={key: PARENT[key] for key in ("id", "node_id", "name", "slug")})
+
+
+def test_nested_team_is_kept_with_its_parent_id(tmp_path):
+    batch = BatchNormalizer("r1", NOW, tmp_path)
+    graphql_child = team_to_rest({
+        "databaseId": 3, "id": "T_3", "name": "Platform Data", "slug": "platform-data",
+        "parentTeam": {"databaseId": 1, "id": "T_1", "name": "Platform", "slug": "platform"},
+    }, org_id=100)
+    rows = batch.normalize("teams", TeamModel, [PARENT, CHILD, graphql_child])
+    assert [(row["slug"], row["parent"]) for row in rows] == [
+        ("platform", None), ("platform-infra", 1), ("platform-data", 1),
+    ]
+    assert not batch.quarantine_path("teams").exists()
+    # The raw record is left as extracted
+    assert CHILD["parent"]["slug"] == "platform"
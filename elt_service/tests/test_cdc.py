@@ -0,0 +1,91 @@
+from pathlib import Path
+
+from sqlalchemy import select
+
+import db
+from cdc import diff_runs, apply_delta, delta_dir
+from models import Repo, Permission
+from normalized_store import NormalizedWriter
+from snapshots import copy_run, ensure_run
+from conftest import TABLE_CLASSES
+
+BASE = {
+    "members": [{"id": 1, "login": "alice"}, {"id": 2, "login": "bob"}],
+    "repos": [{"id": 5, "name": "repo-5", "full_name": "org/repo-5"}, {"id": 6, "name": "repo-6", "full_name": "org/repo-6"}],
+    "permissions": [
+        {"repo_name": "repo-5", "login": "alice", "role_name": "write"},
+        {"repo_name": "repo-6", "login": "bob", "role_name": "read"},
+    ],
+}
+
+
+def write_normalized(run_id, tables):
+    writer = NormalizedWriter(Path(f"data/normalized/{run_id}"))
+    for table, records in tables.items():
+        writer.write(table, None, [{**record, "run_id": run_id} for record in records])
+
+
+def load_delta(engine, base_run_id, run_id):
+    """What app.load_delta_to_db does, on the test engine."""
+    ensure_run(run_id, engine)
+    session = db.SessionLocal()
+    try:
+        copy_run(session.connection(), base_run_id, run_id)
+        applied = apply_delta(session, delta_dir(base_run_id, run_id), TABLE_CLASSES, run_id)
+        session.commit()
+    finally:
+        session.close()
+    return applied
+
+
+def rows(engine, run_id, *columns):
+    with engine.connect() as connection:
+        return set(connection.execute(select(*columns).where(columns[0].table.c.run_id == run_id)).all())
+
+
+def test_rename_across_runs_is_one_modified_repo(workdir, schema, load_run):
+    load_run("base", BASE)
+    write_normalized("base", BASE)
+    renamed = {
+        **BASE,
+        "repos": [{"id": 5, "name": "repo-99", "full_name": "org/repo-99"}, BASE["repos"][1]],
+        "permissions": [{**BASE["permissions"][0], "repo_name": "repo-99"}, BASE["permissions"][1]],
+    }
+    write_normalized("next", renamed)
+
+    summary = diff_runs("base", "next")
+    assert summary["tables"]["repos"] == {"added": 0, "removed": 0, "modified": 1, "unchanged": 1}
+    assert summary["tables"]["permissions"]["added"] == summary["tables"]["permissions"]["removed"] == 1
+
+    load_delta(schema, "base", "next")
+    assert rows(schema, "next", Repo.id, Repo.name, Repo.full_name) == {(5, "repo-99", "org/repo-99"), (6, "repo-6", "org/repo-6")}
+    assert rows(schema, "next", Permission.repo_name, Permission.login) == {("repo-99", "alice"), ("repo-6", "bob")}
+    # The base run is untouched
+    assert rows(schema, "base", Repo.id, Repo.name) == {(5, "repo-5"), (6, "repo-6")}
+
+
+def test_role_change_is_applied_in_place(workdir, schema, load_run):
+    load_run("base", BASE)
+    write_normalized("base", BASE)
+    promoted = {**BASE, "permissions": [BASE["permissions"][0], {**BASE["permissions"][1], "role_name": "admin"}]}
+    write_normalized("next", promoted)
+
+    summary = diff_runs("base", "next")
+    assert summary["tables"]["permissions"] == {"added": 0, "removed": 0, "modified": 1, "unchanged": 1}
+
+    applied = load_delta(schema, "base", "next")
+    assert applied["permissions"] == {"added": 0, "removed": 0, "modified": 1}
+    assert rows(schema, "next", Permission.repo_name, Permission.login, Permission.role_name) == {
+        ("repo-5", "alice", "write"), ("repo-6", "bob", "admin"),
+    }
+
+
+def test_removed_name_reused_by_a_new_repo(workdir, schema, load_run):
+    load_run("base", BASE)
+    write_normalized("base", BASE)
+    replaced = {**BASE, "repos": [{"id": 7, "name": "repo-5", "full_name": "org/repo-5"}, BASE["repos"][1]]}
+    write_normalized("next", replaced)
+
+    diff_runs("base", "next")
+    load_delta(schema, "base", "next")
+    assert rows(schema, "next", Repo.id, Repo.name) == {(7, "repo-5"), (6, "repo-6")}
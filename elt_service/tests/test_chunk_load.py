@@ -0,0 +1,42 @@
+import pytest
+
+import codec
+from chunk_load import ChunkLoader, QuarantinedRows, TooManyQuarantined
+
+
+def writer(written, bad):
+    def write(table, rows):
+        if any(row["id"] in bad for row in rows):
+            raise ValueError("bad row")
+        written.extend(row["id"] for row in rows)
+    return write
+
+
+def chunks(count, size):
+    ids = list(range(count))
+    return [[{"id": i} for i in ids[start:start + size]] for start in range(0, count, size)]
+
+
+def test_quarantined_rows_fail_the_load_after_the_rest_is_written(tmp_path):
+    written = []
+    loader = ChunkLoader(writer(written, {3, 11}), "members", tmp_path, workers=2, retries=1, backoff=0)
+    with pytest.raises(QuarantinedRows):
+        loader.load(chunks(20, 4))
+    assert sorted(written) == [i for i in range(20) if i not in (3, 11)]
+    with open(tmp_path / "members.load_quarantine.ndjson") as f:
+        quarantined = [codec.decode(line) for line in f]
+    assert sorted(entry["record"]["id"] for entry in quarantined) == [3, 11]
+    assert loader.quarantined == 2
+
+
+def test_clean_load_returns_stats(tmp_path):
+    written = []
+    stats = ChunkLoader(writer(written, set()), "members", tmp_path, workers=2).load(chunks(10, 3))
+    assert stats["rows"] == 10 and stats["chunks"] == 4 and stats["quarantined"] == 0
+    assert not (tmp_path / "members.load_quarantine.ndjson").exists()
+
+
+def test_too_many_quarantined_abandons_the_load(tmp_path):
+    loader = ChunkLoader(writer([], set(range(10))), "members", tmp_path, workers=1, retries=0, max_quarantined=2)
+    with pytest.raises(TooManyQuarantined):
+        loader.load(chunks(10, 5))
@@ -0,0 +1,32 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+import codec
+
+RECORD = {
+    "login": "ålice",
+    "id": 1,
+    "site_admin": False,
+    "score": 0.5,
+    "parent": None,
+    "created_ts": datetime(2024, 1, 1, tzinfo=timezone.utc),
+    "updated_ts": datetime(2024, 1, 1, 12, 30, 15, 250000),
+    "pushed_ts": datetime(2024, 1, 1, 9, tzinfo=timezone(timedelta(hours=2))),
+    "day": date(2024, 1, 1),
+    "topics": ["a", {"seen_ts": datetime(2024, 6, 1, tzinfo=timezone.utc)}],
+}
+
+
+@pytest.mark.parametrize("pretty", [False, True])
+@pytest.mark.parametrize("sort_keys", [False, True])
+def test_every_backend_encodes_the_same_bytes(pretty, sort_keys):
+    for name, (module, _, _) in codec.BACKENDS.items():
+        if module is None:
+            pytest.skip(f"{name} is not installed")
+    encoded = {
+        name: encode_fn(RECORD, pretty, sort_keys) for name, (_, encode_fn, _) in codec.BACKENDS.items()
+    }
+    assert encoded["orjson"] == encoded["stdlib"]
+    assert encoded["msgspec"] == encoded["stdlib"]
+    assert b'"2024-01-01T00:00:00+00:00"' in encoded["stdlib"]
@@ -0,0 +1,69 @@
+from sqlalchemy import select
+
+from effective_access import materialize_run
+from models import EffectiveAccess
+from snapshots import publish
+
+RUN1 = {
+    "permissions": [
+        {"repo_name": "repo-a", "login": "alice", "role_name": "write"},
+        {"repo_name": "repo-b", "login": "bob", "role_name": "read"},
+        {"repo_name": "repo-d", "login": "dave", "role_name": "admin"},
+    ],
+    "team_repos": [
+        {"team_slug": "team-x", "repo_name": "repo-a", "role_name": "write"},
+        {"team_slug": "team-x", "repo_name": "repo-b", "role_name": "maintain"},
+        {"team_slug": "team-y", "repo_name": "repo-c", "role_name": "read"},
+    ],
+    "team_members": [
+        {"team_slug": "team-x", "login": "alice"},
+        {"team_slug": "team-x", "login": "carol"},
+        {"team_slug": "team-y", "login": "bob"},
+    ],
+}
+# alice is promoted on repo-a, carol leaves team-x, team-y gains repo-b; repo-d is untouched
+RUN2 = {
+    "permissions": [
+        {"repo_name": "repo-a", "login": "alice", "role_name": "admin"},
+        {"repo_name": "repo-b", "login": "bob", "role_name": "read"},
+        {"repo_name": "repo-d", "login": "dave", "role_name": "admin"},
+    ],
+    "team_repos": RUN1["team_repos"] + [{"team_slug": "team-y", "repo_name": "repo-b", "role_name": "triage"}],
+    "team_members": [member for member in RUN1["team_members"] if member["login"] != "carol"],
+}
+
+
+def effective(engine, run_id):
+    columns = (EffectiveAccess.repo_name, EffectiveAccess.principal_type, EffectiveAccess.principal,
+               EffectiveAccess.effective_role, EffectiveAccess.via_team)
+    with engine.connect() as connection:
+        return set(connection.execute(select(*columns).where(EffectiveAccess.run_id == run_id)).all())
+
+
+def test_highest_role_wins_and_direct_grants_win_ties(schema, load_run):
+    load_run("r1", RUN1)
+    materialize_run("r1", schema)
+    rows = effective(schema, "r1")
+    # alice holds write directly and through team-x: the direct grant wins the tie
+    assert ("repo-a", "user", "alice", "write", None) in rows
+    # carol holds repo-b only through team-x
+    assert ("repo-b", "user", "bob", "read", None) in rows
+    assert ("repo-b", "user", "carol", "maintain", "team-x") in rows
+    assert ("repo-b", "team", "team-x", "maintain", None) in rows
+
+
+def test_incremental_refresh_matches_a_full_recompute(schema, load_run):
+    load_run("r1", RUN1)
+    materialize_run("r1", schema)
+    publish("r1", schema)
+    load_run("r2", RUN2)
+
+    affected, _ = materialize_run("r2", schema)
+    incremental = effective(schema, "r2")
+    # repo-a and repo-b changed grants, and are team-x's repos; team-y's membership did not change
+    assert affected == {"repo-a", "repo-b"}
+
+    materialize_run("r2", schema, full=True)
+    assert incremental == effective(schema, "r2")
+    assert ("repo-b", "user", "bob", "triage", "team-y") in incremental
+    assert not any(row[2] == "carol" for row in incremental)
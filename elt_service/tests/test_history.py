@@ -0,0 +1,82 @@
+from datetime import datetime
+
+from sqlalchemy import select
+
+import history
+from models import PermissionHistory
+
+T1, T2, T3 = datetime(2026, 1, 1), datetime(2026, 2, 1), datetime(2026, 3, 1)
+
+RUN1 = {
+    "permissions": [
+        {"repo_name": "repo-a", "login": "alice", "role_name": "write"},
+        {"repo_name": "repo-a", "login": "bob", "role_name": "read"},
+    ],
+    "team_repos": [{"team_slug": "team-x", "repo_name": "repo-b", "role_name": "maintain"}],
+    "team_members": [{"team_slug": "team-x", "login": "bob"}],
+}
+RUN2 = {
+    "permissions": [
+        {"repo_name": "repo-a", "login": "alice", "role_name": "admin"},
+        {"repo_name": "repo-b", "login": "bob", "role_name": "read"},
+    ],
+    "team_repos": RUN1["team_repos"],
+    "team_members": [],
+}
+
+
+def record(engine, run_id, ts):
+    with engine.begin() as connection:
+        return history.record(connection, run_id, ts)
+
+
+def test_facts_open_and_close_with_runs(schema, load_run):
+    load_run("r1", RUN1)
+    load_run("r2", RUN2)
+    assert record(schema, "r1", T1) == {"permissions": (0, 2), "team_members": (0, 1), "team_repos": (0, 1)}
+    # alice's role change closes one fact and opens another; bob's team membership ends
+    assert record(schema, "r2", T2) == {"permissions": (2, 2), "team_members": (1, 0), "team_repos": (0, 0)}
+    # Recording the same state again writes nothing
+    assert record(schema, "r2", T3) == {"permissions": (0, 0), "team_members": (0, 0), "team_repos": (0, 0)}
+
+    with schema.connect() as connection:
+        alice = connection.execute(
+            select(PermissionHistory.role_name, PermissionHistory.valid_from, PermissionHistory.valid_to)
+            .where(PermissionHistory.login == "alice").order_by(PermissionHistory.valid_from)
+        ).all()
+    assert alice == [("write", T1, T2), ("admin", T2, None)]
+
+
+def test_as_of_lookups_agree_across_indexes(schema, load_run):
+    load_run("r1", RUN1)
+    load_run("r2", RUN2)
+    record(schema, "r1", T1)
+    record(schema, "r2", T2)
+
+    with schema.connect() as connection:
+        before = datetime(2026, 1, 15)
+        assert sorted(history.access_as_of(connection, "repo-a", before)) == [
+            ("user", "alice", "write", None), ("user", "bob", "read", None),
+        ]
+        # bob holds maintain through team-x until leaving it at T2; then only the direct read is left
+        assert sorted(history.access_as_of(connection, "repo-b", before)) == [
+            ("team", "team-x", "maintain", None), ("user", "bob", "maintain", "team-x"),
+        ]
+        assert sorted(history.access_as_of(connection, "repo-b", T2)) == [
+            ("team", "team-x", "maintain", None), ("user", "bob", "read", None),
+        ]
+
+        for as_of in (before, T2, T3):
+            every_repo = history.access_at(connection, as_of)
+            for repo in ("repo-a", "repo-b"):
+                assert sorted(row[1:] for row in every_repo if row[0] == repo) == sorted(
+                    history.access_as_of(connection, repo, as_of)
+                )
+        assert history.access_at(connection, before, login="bob") == [
+            ("repo-a", "user", "bob", "read", None), ("repo-b", "user", "bob", "maintain", "team-x"),
+        ]
+        assert history.access_at(connection, datetime(2025, 1, 1)) == []
+
+        assert history.repo_known(connection, "repo-a", T1)
+        assert not history.repo_known(connection, "repo-a", datetime(2025, 1, 1))
+        assert not history.repo_known(connection, "repo-z", T3)
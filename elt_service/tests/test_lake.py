@@ -0,0 +1,27 @@
+from datetime import datetime, timezone, timedelta
+
+import lake
+
+NOW = datetime(2026, 3, 15, 12, tzinfo=timezone.utc)
+
+
+def run(hours_ago, complete=True):
+    return {"created_ts": (NOW - timedelta(hours=hours_ago)).isoformat(), "complete": complete}
+
+
+def test_incomplete_runs_are_kept_without_recent_retention(monkeypatch):
+    monkeypatch.setattr(lake, "LAKE_KEEP_RUNS", 0)
+    runs = {"extracting": run(1, complete=False), "failed": run(100, complete=False), "old": run(2), "older": run(3)}
+    keep, archive, delete = lake.plan(runs, NOW)
+    assert keep == {"extracting", "failed"}
+    assert archive == {"old"}
+    assert delete == {"older"}
+
+
+def test_watermark_run_is_kept(monkeypatch):
+    monkeypatch.setattr(lake, "LAKE_KEEP_RUNS", 0)
+    runs = {"newest": run(1), "watermark": run(2)}
+    keep, archive, delete = lake.plan(runs, NOW, protected=["watermark"])
+    assert keep == {"watermark"}
+    assert archive == {"newest"}
+    assert delete == set()
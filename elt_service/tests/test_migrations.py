@@ -0,0 +1,94 @@
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+import migrations
+from models import Base
+from snapshots import partition_name, current_run_id
+
+# Tables of the schema before migrations existed: unpartitioned, keyed by id alone
+BASELINE_TABLES = ["organizations", "members", "teams", "repos", "permissions"]
+
+
+def create_baseline(engine):
+    with engine.begin() as connection:
+        for name in BASELINE_TABLES:
+            columns = ["id SERIAL PRIMARY KEY"] + [
+                f"{column.name} {column.type.compile(dialect=connection.dialect)}"
+                for column in Base.metadata.tables[name].columns if column.name != "id"
+            ]
+            connection.execute(text(f"CREATE TABLE {name} ({', '.join(columns)})"))
+            connection.execute(text(f"CREATE INDEX ix_{name}_run_id ON {name} (run_id)"))
+
+
+def insert(connection, table, rows):
+    for row in rows:
+        connection.execute(text(f"INSERT INTO {table} ({', '.join(row)}) VALUES ({', '.join(':' + c for c in row)})"), row)
+
+
+def populate(engine):
+    r1, r2 = datetime(2026, 1, 1), datetime(2026, 1, 2)
+    with engine.begin() as connection:
+        insert(connection, "repos", [
+            {"id": 5, "run_id": "r1", "name": "repo-5", "updated_ts": r1},
+            {"id": 6, "run_id": "r2", "name": "repo-5", "updated_ts": r2},
+        ])
+        insert(connection, "members", [{"id": 1, "run_id": "webhook:member", "login": "alice", "updated_ts": r2}])
+        insert(connection, "permissions", [
+            {"run_id": "r1", "repo_name": "repo-5", "login": "alice", "role_name": "write", "updated_ts": r1},
+            # Appended again by a merge load before the natural key existed
+            {"run_id": "r1", "repo_name": "repo-5", "login": "alice", "role_name": "write", "updated_ts": r1},
+            {"run_id": "r1", "repo_name": "repo-5", "login": "bob", "role_name": "read", "updated_ts": r1},
+            {"run_id": "r2", "repo_name": "repo-5", "login": "alice", "role_name": "admin", "updated_ts": r2},
+        ])
+
+
+def partitions(connection, table):
+    return set(connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :table"
+    ), {"table": table}).scalars())
+
+
+def test_populated_baseline_migrates_to_the_latest_version(engine):
+    create_baseline(engine)
+    populate(engine)
+
+    assert migrations.migrate(engine) == [version for version, _, _ in migrations.MIGRATIONS]
+    assert all(applied for _, _, applied in migrations.status(engine))
+    assert migrations.migrate(engine) == []
+
+    with engine.begin() as connection:
+        # natural_keys_and_indexes: the duplicate is gone
+        assert connection.execute(text("SELECT count(*) FROM permissions WHERE run_id = 'r1'")).scalar() == 2
+        # partition_by_run: a partition per run and a default one, the newest run current
+        assert {partition_name("permissions", "r1"), partition_name("permissions", "r2"), "permissions_default"} <= partitions(connection, "permissions")
+        assert current_run_id(connection) == "r2"
+        assert "run_id" in inspect(connection).get_pk_constraint("repos")["constrained_columns"]
+        # The serial sequence continues after the moved rows
+        connection.execute(text("INSERT INTO permissions (run_id, repo_name, login) VALUES ('r2', 'repo-5', 'carol')"))
+
+        # access_history: seeded from both runs in order
+        history = connection.execute(text(
+            "SELECT login, role_name, opened_run_id, closed_run_id FROM permission_history ORDER BY login, valid_from"
+        )).all()
+        assert history == [
+            ("alice", "write", "r1", "r2"), ("alice", "admin", "r2", None), ("bob", "read", "r1", "r2"),
+        ]
+        # effective_access: computed for every run
+        assert connection.execute(text(
+            "SELECT run_id, principal, effective_role FROM effective_access ORDER BY run_id, principal"
+        )).all() == [("r1", "alice", "write"), ("r1", "bob", "read"), ("r2", "alice", "admin")]
+        # seed_current_snapshot: rows of webhook deliveries applied before any publish are gone
+        assert connection.execute(text("SELECT count(*) FROM members_default")).scalar() == 0
+        # webhook_deliveries, and the validity indexes created with the history tables
+        assert "webhook_deliveries" in inspect(connection).get_table_names()
+        indexes = set(connection.execute(text("SELECT indexname FROM pg_indexes WHERE indexname LIKE '%_validity'")).scalars())
+        assert indexes == {"ix_permission_history_validity", "ix_team_member_history_validity", "ix_team_repo_history_validity"}
+
+
+def test_empty_database_has_a_pointer_row_to_lock(engine):
+    migrations.migrate(engine)
+    with engine.begin() as connection:
+        assert connection.execute(text("SELECT id, run_id FROM current_snapshot")).all() == [(1, None)]
+        assert current_run_id(connection, lock=True) is None
@@ -0,0 +1,198 @@
+import threading
+from datetime import datetime
+from http.server import ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from sqlalchemy import select
+
+import codec
+import history
+from db import SessionLocal
+from effective_access import materialize_run
+from models import EffectiveAccess, Member, Permission, TeamMember, TeamRepo, WebhookDelivery
+from snapshots import publish
+from webhook import WebhookWriter, catch_up, make_handler, sign, verify_signature
+
+SECRET = "s3cret"
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, event, delivery, payload):
+        self.submitted.append((event, delivery, payload))
+        return True
+
+
+@pytest.fixture
+def receiver():
+    writer = RecordingWriter()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(writer, SECRET))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}", writer
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def post(url, body, signature):
+    headers = {"X-GitHub-Event": "member", "X-GitHub-Delivery": "d-1", "Content-Type": "application/json"}
+    if signature is not None:
+        headers["X-Hub-Signature-256"] = signature
+    return httpx.post(url, content=body, headers=headers)
+
+
+def test_verify_signature():
+    body = b'{"action": "added"}'
+    assert verify_signature(SECRET, body, sign(SECRET, body))
+    assert not verify_signature(SECRET, body, sign("other", body))
+    assert not verify_signature(SECRET, body + b" ", sign(SECRET, body))
+    assert not verify_signature(SECRET, body, None)
+    # Without a configured secret nothing verifies
+    assert not verify_signature("", body, sign("", body))
+
+
+@pytest.mark.parametrize("signature", [None, "", "sha256=0", sign("other", b'{"action": "added"}')])
+def test_unsigned_or_missigned_deliveries_are_rejected(receiver, signature):
+    url, writer = receiver
+    response = post(url, b'{"action": "added"}', signature)
+    assert response.status_code == 401
+    assert writer.submitted == []
+
+
+def test_tampered_body_is_rejected(receiver):
+    url, writer = receiver
+    response = post(url, b'{"action": "removed"}', sign(SECRET, b'{"action": "added"}'))
+    assert response.status_code == 401
+    assert writer.submitted == []
+
+
+def test_signed_delivery_is_queued(receiver):
+    url, writer = receiver
+    body = codec.encode({"action": "added", "member": {"login": "alice"}})
+    response = post(url, body, sign(SECRET, body))
+    assert response.status_code == 202
+    assert writer.submitted == [("member", "d-1", {"action": "added", "member": {"login": "alice"}})]
+
+
+# organization "member_removed" delivery as GitHub sends it, trimmed to the fields used
+MEMBER_REMOVED = {
+    "action": "member_removed",
+    "membership": {
+        "url": "https://api.github.com/orgs/acme/memberships/alice",
+        "state": "active",
+        "role": "member",
+        "user": {"login": "alice", "id": 1, "node_id": "MDQ6VXNlcjE=", "type": "User", "site_admin": False},
+    },
+    "organization": {"login": "acme", "id": 100},
+    "sender": {"login": "owner", "id": 2},
+}
+
+
+def apply(*deliveries):
+    session = SessionLocal()
+    try:
+        WebhookWriter()._apply(session, list(deliveries))
+        session.commit()
+    finally:
+        session.close()
+
+
+def test_org_member_removal_revokes_their_access(schema, load_run):
+    load_run("r1", {
+        "members": [{"id": 1, "login": "alice"}, {"id": 3, "login": "bob"}],
+        "permissions": [
+            {"repo_name": "repo-a", "login": "alice", "role_name": "write"},
+            {"repo_name": "repo-a", "login": "bob", "role_name": "read"},
+        ],
+        "team_members": [{"team_slug": "team-x", "login": "alice"}, {"team_slug": "team-x", "login": "bob"}],
+        "team_repos": [{"team_slug": "team-x", "repo_name": "repo-b", "role_name": "maintain"}],
+    })
+    materialize_run("r1", schema)
+    publish("r1", schema)
+    history.record_run("r1", schema)
+
+    apply(("organization", "d-2", MEMBER_REMOVED))
+
+    with schema.connect() as connection:
+        for model in (Member, Permission, TeamMember):
+            logins = connection.execute(select(model.login).where(model.run_id == "r1")).scalars().all()
+            assert "alice" not in logins and "bob" in logins
+        principals = connection.execute(
+            select(EffectiveAccess.principal).where(EffectiveAccess.run_id == "r1")
+        ).scalars().all()
+        assert "alice" not in principals and "bob" in principals
+        assert history.access_at(connection, datetime.utcnow(), login="alice") == []
+
+
+TEAM = {"id": 10, "node_id": "MDQ6VGVhbTEw", "name": "Team Y", "slug": "team-y", "privacy": "closed", "parent": None}
+TEAM_RENAMED = {
+    "action": "edited",
+    "team": TEAM,
+    "changes": {"name": {"from": "Team X"}},
+    "organization": {"login": "acme", "id": 100},
+    "sender": {"login": "owner", "id": 2},
+}
+MEMBERSHIP_REMOVED = {
+    "action": "removed",
+    "scope": "team",
+    "member": {"login": "alice", "id": 1, "type": "User", "site_admin": False},
+    "team": TEAM,
+    "organization": {"login": "acme", "id": 100},
+    "sender": {"login": "owner", "id": 2},
+}
+
+
+def test_team_rename_moves_its_members_and_grants_to_the_new_slug(schema, load_run):
+    load_run("r1", {
+        "teams": [{"id": 10, "name": "Team X", "slug": "team-x"}],
+        "team_members": [{"team_slug": "team-x", "login": "alice"}],
+        "team_repos": [{"team_slug": "team-x", "repo_name": "repo-b", "role_name": "maintain"}],
+    })
+    materialize_run("r1", schema)
+    publish("r1", schema)
+    history.record_run("r1", schema)
+
+    apply(("team", "d-3", TEAM_RENAMED))
+
+    with schema.connect() as connection:
+        for model in (TeamMember, TeamRepo):
+            assert connection.execute(select(model.team_slug).where(model.run_id == "r1")).scalars().all() == ["team-y"]
+        assert set(connection.execute(select(
+            EffectiveAccess.principal, EffectiveAccess.via_team
+        ).where(EffectiveAccess.run_id == "r1")).all()) == {("team-y", None), ("alice", "team-y")}
+        assert history.access_at(connection, datetime.utcnow(), login="alice") == [
+            ("repo-b", "user", "alice", "maintain", "team-y"),
+        ]
+
+    # A later membership delivery names the new slug and revokes the access for good
+    apply(("membership", "d-4", MEMBERSHIP_REMOVED))
+
+    with schema.connect() as connection:
+        assert connection.execute(select(TeamMember.login).where(TeamMember.run_id == "r1")).all() == []
+        principals = connection.execute(
+            select(EffectiveAccess.principal).where(EffectiveAccess.run_id == "r1")
+        ).scalars().all()
+        assert principals == ["team-y"]
+        assert history.access_at(connection, datetime.utcnow(), login="alice") == []
+
+
+def test_deliveries_before_the_first_publish_are_replayed_by_it(schema, load_run):
+    load_run("r1", {"team_members": [{"team_slug": "team-y", "login": "alice"}]})
+    materialize_run("r1", schema)
+
+    apply(("membership", "d-5", MEMBERSHIP_REMOVED))
+
+    with schema.connect() as connection:
+        # Only logged: no run is current to apply it to
+        assert connection.execute(select(WebhookDelivery.delivery)).scalars().all() == ["d-5"]
+        assert connection.execute(select(TeamMember.run_id)).scalars().all() == ["r1"]
+
+    publish("r1", schema, catch_up=catch_up)
+
+    with schema.connect() as connection:
+        assert connection.execute(select(TeamMember.run_id)).scalars().all() == []
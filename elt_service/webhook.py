@@ -0,0 +1,536 @@
+"""
+GitHub organization webhook receiver.
+
+Verifies X-Hub-Signature-256, queues deliveries on a bounded in-process queue and
+applies them to the tables in models.py from a single writer thread that commits
+in batches. Handled events: member, membership, organization, repository, team,
+team_add. Deliveries are applied to the rows of the current snapshot (snapshots.py),
+the run the gRPC API reads, until the next run is published. Before any run is
+published they are only logged, and the first run published replays them. Access
+changes to the current run are also recorded in the access history (history.py), and the
+effective access of the repos and teams they touch is recomputed (effective_access.py),
+as they are applied.
+
+Every delivery received is also kept in webhook_deliveries. A run loading meanwhile may
+have extracted an entity before a delivery changed it, and publishing it would revert
+the change. app.py therefore publishes a run with catch_up(), which replays the
+deliveries received since the run started onto it before readers move to it.
+
+Serve:   python webhook.py
+Replay:  python webhook.py replay recorded/*.json --url http://localhost:8000/webhook
+
+A recorded delivery is a JSON file {"event": "<X-GitHub-Event>", "payload": {...}},
+optionally with "delivery" holding the X-GitHub-Delivery id.
+"""
+import os
+import sys
+import hmac
+import time
+import queue
+import hashlib
+import logging
+import argparse
+import threading
+from uuid import uuid4
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dotenv import load_dotenv, find_dotenv
+import httpx
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import codec
+from migrations import migrate
+from snapshots import current_run_id
+from history import record as record_history
+from effective_access import refresh as refresh_effective_access
+from db import SessionLocal, get_engine
+from models import Organization, Member, Team, Repo, Permission, TeamMember, TeamRepo, WebhookDelivery
+from models import MemberModel, TeamModel, RepoModel, PermissionModel
+from models import TeamMemberModel, TeamRepoModel
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+load_dotenv(find_dotenv())
+
+GH_WEBHOOK_SECRET = os.getenv("GH_WEBHOOK_SECRET", "")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", 8000))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", 1000))
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", 100))
+# Longest a delivery waits in a partially filled batch before it is committed
+WEBHOOK_BATCH_SECONDS = float(os.getenv("WEBHOOK_BATCH_SECONDS", 1.0))
+
+HANDLED_EVENTS = {"member", "membership", "organization", "repository", "team", "team_add", "ping"}
+
+
+def sign(secret, body):
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(secret, body, signature):
+    if not secret or not signature:
+        return False
+    return hmac.compare_digest(sign(secret, body), signature)
+
+
+def to_record(model, data, run_id, now):
+    """Validate a webhook object against a Pydantic model, treating missing fields as null."""
+    fields = {name: data.get(name) for name in model.model_fields}
+    fields.update(run_id=run_id, created_ts=now, updated_ts=now)
+    return model(**fields).model_dump()
+
+
+def flatten_owner(repo):
+    owner = repo.get("owner") or {}
+    return {**repo, **{f"owner_{key}": value for key, value in owner.items()}}
+
+
+# --- Event appliers: each takes (session, payload, run_id, now) ---
+
+def upsert_member(session, user, run_id, now):
+    session.merge(Member(**to_record(MemberModel, user, run_id, now)))
+
+
+def upsert_team(session, team, run_id, now):
+    team = {**team, "parent": (team.get("parent") or {}).get("id")}
+    session.merge(Team(**to_record(TeamModel, team, run_id, now)))
+
+
+def upsert_repo(session, repo, run_id, now):
+    session.merge(Repo(**to_record(RepoModel, flatten_owner(repo), run_id, now)))
+
+
+def apply_member(session, payload, run_id, now):
+    """Collaborator added to, removed from or changed on a repository."""
+    repo_name = payload["repository"]["name"]
+    user = payload["member"]
+    existing = session.query(Permission).filter(
+        Permission.run_id == run_id, Permission.repo_name == repo_name, Permission.login == user["login"]
+    ).first()
+    if payload["action"] == "removed":
+        if existing:
+            session.delete(existing)
+        return
+    role = ((payload.get("changes") or {}).get("permission") or {}).get("to")
+    if role is None and existing:
+        role = existing.role_name
+    record = to_record(PermissionModel, {**user, "repo_name": repo_name, "role_name": role}, run_id, now)
+    if existing:
+        for key, value in record.items():
+            setattr(existing, key, value)
+    else:
+        session.add(Permission(**record))
+
+
+def upsert_team_repo(session, team_slug, repo, run_id, now):
+    session.query(TeamRepo).filter(
+        TeamRepo.run_id == run_id, TeamRepo.team_slug == team_slug, TeamRepo.repo_name == repo["name"]
+    ).delete()
+    record = to_record(TeamRepoModel, {**repo, "team_slug": team_slug, "repo_name": repo["name"]}, run_id, now)
+    session.add(TeamRepo(**record))
+
+
+def apply_membership(session, payload, run_id, now):
+    """Team membership change."""
+    team = payload["team"]
+    user = payload["member"]
+    upsert_team(session, team, run_id, now)
+    session.query(TeamMember).filter(
+        TeamMember.run_id == run_id, TeamMember.team_slug == team["slug"], TeamMember.login == user["login"]
+    ).delete()
+    if payload["action"] == "added":
+        record = to_record(TeamMemberModel, {**user, "team_slug": team["slug"]}, run_id, now)
+        session.add(TeamMember(**record))
+
+
+def is_org_member(session, login, run_id):
+    return session.query(Member.id).filter(Member.run_id == run_id, Member.login == login).first() is not None
+
+
+def apply_organization(session, payload, run_id, now):
+    action = payload["action"]
+    if action == "member_added":
+        upsert_member(session, payload["membership"]["user"], run_id, now)
+    elif action == "member_removed":
+        # Leaving the org removes the user from its teams and its repos
+        login = payload["membership"]["user"]["login"]
+        session.query(TeamMember).filter(TeamMember.run_id == run_id, TeamMember.login == login).delete()
+        if is_org_member(session, login, run_id):
+            session.query(Permission).filter(Permission.run_id == run_id, Permission.login == login).delete()
+        session.query(Member).filter(Member.run_id == run_id, Member.login == login).delete()
+    elif action == "renamed":
+        org = payload["organization"]
+        session.query(Organization).filter(Organization.run_id == run_id, Organization.id == org["id"]).update(
+            {"login": org["login"], "updated_ts": now}
+        )
+
+
+def apply_repository(session, payload, run_id, now):
+    action = payload["action"]
+    repo = payload["repository"]
+    if action in ("deleted", "transferred"):
+        session.query(Permission).filter(Permission.run_id == run_id, Permission.repo_name == repo["name"]).delete()
+        session.query(TeamRepo).filter(TeamRepo.run_id == run_id, TeamRepo.repo_name == repo["name"]).delete()
+        session.query(Repo).filter(Repo.run_id == run_id, Repo.id == repo["id"]).delete()
+        return
+    if action == "renamed":
+        old_name = payload["changes"]["repository"]["name"]["from"]
+        session.query(Permission).filter(Permission.run_id == run_id, Permission.repo_name == old_name).update(
+            {"repo_name": repo["name"], "updated_ts": now}
+        )
+        session.query(TeamRepo).filter(TeamRepo.run_id == run_id, TeamRepo.repo_name == old_name).update(
+            {"repo_name": repo["name"], "full_name": repo.get("full_name"), "updated_ts": now}
+        )
+    upsert_repo(session, repo, run_id, now)
+
+
+def renamed_team_slug(session, payload, run_id):
+    """
+    The slug a team had before a team "edited" delivery renamed it, or None. GitHub
+    reports the old name, not the old slug, so the slug is read from run_id's team row.
+    """
+    team = payload["team"]
+    changes = payload.get("changes") or {}
+    if payload["action"] != "edited" or not ("name" in changes or "slug" in changes):
+        return None
+    old_slug = (changes.get("slug") or {}).get("from")
+    if old_slug is None:
+        session.flush()
+        old_slug = session.query(Team.slug).filter(Team.run_id == run_id, Team.id == team["id"]).scalar()
+    return old_slug if old_slug and old_slug != team["slug"] else None
+
+
+def apply_team(session, payload, run_id, now):
+    team = payload["team"]
+    action = payload["action"]
+    if action == "deleted":
+        session.query(TeamMember).filter(TeamMember.run_id == run_id, TeamMember.team_slug == team["slug"]).delete()
+        session.query(TeamRepo).filter(TeamRepo.run_id == run_id, TeamRepo.team_slug == team["slug"]).delete()
+        session.query(Team).filter(Team.run_id == run_id, Team.id == team["id"]).delete()
+        return
+    old_slug = renamed_team_slug(session, payload, run_id)
+    if old_slug:
+        session.query(TeamMember).filter(TeamMember.run_id == run_id, TeamMember.team_slug == old_slug).update(
+            {"team_slug": team["slug"], "updated_ts": now}
+        )
+        session.query(TeamRepo).filter(TeamRepo.run_id == run_id, TeamRepo.team_slug == old_slug).update(
+            {"team_slug": team["slug"], "updated_ts": now}
+        )
+    upsert_team(session, team, run_id, now)
+    repo = payload.get("repository")
+    if action == "removed_from_repository":
+        session.query(TeamRepo).filter(
+            TeamRepo.run_id == run_id, TeamRepo.team_slug == team["slug"], TeamRepo.repo_name == repo["name"]
+        ).delete()
+    elif repo:
+        upsert_repo(session, repo, run_id, now)
+        upsert_team_repo(session, team["slug"], repo, run_id, now)
+
+
+def apply_team_add(session, payload, run_id, now):
+    upsert_team(session, payload["team"], run_id, now)
+    upsert_repo(session, payload["repository"], run_id, now)
+    upsert_team_repo(session, payload["team"]["slug"], payload["repository"], run_id, now)
+
+
+def history_scopes(session, event, payload, run_id):
+    """
+    Repos and teams whose access a delivery can change, per access table (see history.py).
+    Called before the delivery is applied, so a repository event finds the teams holding
+    the repo under its old name.
+    """
+    if event == "member":
+        return {"permissions": {payload["repository"]["name"]}}
+    if event == "membership":
+        return {"team_members": {payload["team"]["slug"]}}
+    if event == "repository":
+        names = {payload["repository"]["name"]}
+        if payload["action"] == "renamed":
+            names.add(payload["changes"]["repository"]["name"]["from"])
+        # Team grants added earlier in the batch are still pending
+        session.flush()
+        teams = session.query(TeamRepo.team_slug).filter(TeamRepo.run_id == run_id, TeamRepo.repo_name.in_(names))
+        return {"permissions": names, "team_repos": {slug for (slug,) in teams if slug}}
+    if event == "team":
+        slugs = {payload["team"]["slug"], renamed_team_slug(session, payload, run_id)} - {None}
+        return {"team_members": slugs, "team_repos": slugs}
+    if event == "team_add":
+        return {"team_repos": {payload["team"]["slug"]}}
+    if event == "organization" and payload["action"] == "member_removed":
+        login = payload["membership"]["user"]["login"]
+        session.flush()
+        teams = session.query(TeamMember.team_slug).filter(TeamMember.run_id == run_id, TeamMember.login == login)
+        scopes = {"team_members": {slug for (slug,) in teams if slug}}
+        if is_org_member(session, login, run_id):
+            repos = session.query(Permission.repo_name).filter(Permission.run_id == run_id, Permission.login == login)
+            scopes["permissions"] = {name for (name,) in repos if name}
+        return scopes
+    return {}
+
+
+APPLIERS = {
+    "member": apply_member,
+    "membership": apply_membership,
+    "organization": apply_organization,
+    "repository": apply_repository,
+    "team": apply_team,
+    "team_add": apply_team_add,
+}
+
+
+def apply_deliveries(session, batch, run_id, now):
+    """Apply (event, delivery, payload) items to run_id's rows. Returns the history scopes they touch."""
+    scopes = {}
+    for event, delivery, payload in batch:
+        for table, names in history_scopes(session, event, payload, run_id).items():
+            scopes.setdefault(table, set()).update(names)
+        APPLIERS[event](session, payload, run_id, now)
+    return scopes
+
+
+def refresh_scopes(connection, run_id, scopes):
+    teams = scopes.get("team_members", set()) | scopes.get("team_repos", set())
+    refresh_effective_access(connection, run_id, scopes.get("permissions", set()), teams)
+
+
+def catch_up(connection, run_id, since):
+    """
+    Replay the deliveries received since `since` onto run_id in the order they arrived, and
+    recompute the effective access they touch; publish() calls this in its transaction.
+    Deliveries the run's extract already saw leave its rows as they are. A delivery that
+    fails is skipped. Deliveries received before `since` are no longer needed and are
+    deleted. Returns the number replayed.
+    """
+    now = datetime.now(timezone.utc)
+    scopes = {}
+    replayed = 0
+    with Session(bind=connection) as session:
+        deliveries = session.query(WebhookDelivery).filter(
+            WebhookDelivery.received_ts >= since
+        ).order_by(WebhookDelivery.id).all()
+        for delivery in deliveries:
+            try:
+                with session.begin_nested():
+                    item = (delivery.event, delivery.delivery, delivery.payload)
+                    for table, names in apply_deliveries(session, [item], run_id, now).items():
+                        scopes.setdefault(table, set()).update(names)
+                replayed += 1
+            except Exception as e:
+                logger.error(f"Not replaying {delivery.event} delivery {delivery.delivery} onto run {run_id}: {e}")
+        session.query(WebhookDelivery).filter(WebhookDelivery.received_ts < since).delete()
+        session.flush()
+    if scopes:
+        refresh_scopes(connection, run_id, scopes)
+    logger.info(f"Replayed {replayed} of {len(deliveries)} webhook deliveries received since {since} onto run {run_id}")
+    return replayed
+
+
+def repos_changed_since(since, engine=None):
+    """
+    {repo name: latest delivery time} of the repos whose access the deliveries received
+    since `since` may have changed, for incremental extraction (incremental.py). Collaborator,
+    team grant and repository deliveries name their repo. A team membership delivery
+    touches every repo the team holds in the current run. Times are aware UTC.
+    """
+    engine = engine or get_engine()
+    changed = {}
+    team_changes = {}
+
+    def touch(names, ts):
+        for name in names:
+            if name and (name not in changed or changed[name] < ts):
+                changed[name] = ts
+
+    with engine.connect() as connection:
+        deliveries = connection.execute(
+            select(WebhookDelivery.event, WebhookDelivery.payload, WebhookDelivery.received_ts).where(
+                WebhookDelivery.received_ts >= since.astimezone(timezone.utc).replace(tzinfo=None),
+                WebhookDelivery.event.in_(["member", "membership", "repository", "team", "team_add"]),
+            )
+        )
+        for event, payload, received_ts in deliveries:
+            ts = received_ts.replace(tzinfo=timezone.utc)
+            if event == "membership":
+                slug = (payload.get("team") or {}).get("slug")
+                if slug and (slug not in team_changes or team_changes[slug] < ts):
+                    team_changes[slug] = ts
+            else:
+                touch([(payload.get("repository") or {}).get("name")], ts)
+        current = current_run_id(connection)
+        if team_changes and current:
+            grants = connection.execute(select(TeamRepo.team_slug, TeamRepo.repo_name).where(
+                TeamRepo.run_id == current, TeamRepo.team_slug.in_(sorted(team_changes))
+            ))
+            for slug, repo_name in grants:
+                touch([repo_name], team_changes[slug])
+    return changed
+
+
+class WebhookWriter:
+    """Single writer thread draining the delivery queue into batched commits."""
+
+    def __init__(self, maxsize=WEBHOOK_QUEUE_SIZE, batch_size=WEBHOOK_BATCH_SIZE, batch_seconds=WEBHOOK_BATCH_SECONDS):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.batch_size = batch_size
+        self.batch_seconds = batch_seconds
+        self.applied = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=self._run, name="webhook-writer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def submit(self, event, delivery, payload):
+        """Queue a delivery; returns False when the queue is full."""
+        try:
+            self.queue.put_nowait((event, delivery, payload))
+            return True
+        except queue.Full:
+            return False
+
+    def _next_batch(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.batch_seconds
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _apply(self, session, batch):
+        now = datetime.now(timezone.utc)
+        # History and delivery timestamps are naive UTC, like the run timestamps they are compared with
+        received_ts = now.replace(tzinfo=None)
+        # Held until commit, so a publish waits for the batch, or the batch for the publish
+        current = current_run_id(session.connection(), lock=True)
+        session.add_all(
+            WebhookDelivery(delivery=delivery, event=event, payload=payload, received_ts=received_ts)
+            for event, delivery, payload in batch
+        )
+        if current is None:
+            logger.info(f"No run published yet; logged {len(batch)} webhook deliveries for the first publish to replay")
+            return
+        scopes = apply_deliveries(session, batch, current, now)
+        if scopes:
+            session.flush()
+            record_history(session.connection(), current, received_ts, scopes)
+            refresh_scopes(session.connection(), current, scopes)
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            session = SessionLocal()
+            try:
+                self._apply(session, batch)
+                session.commit()
+                self.applied += len(batch)
+            except Exception as e:
+                session.rollback()
+                logger.warning(f"Webhook batch of {len(batch)} failed ({e}); applying deliveries one by one")
+                self._apply_individually(session, batch)
+            finally:
+                session.close()
+                for _ in batch:
+                    self.queue.task_done()
+            logger.info(f"Webhook writer committed batch of {len(batch)} (applied={self.applied} failed={self.failed})")
+
+    def _apply_individually(self, session, batch):
+        for item in batch:
+            try:
+                self._apply(session, [item])
+                session.commit()
+                self.applied += 1
+            except Exception as e:
+                session.rollback()
+                self.failed += 1
+                logger.error(f"Dropping {item[0]} delivery {item[1]}: {e}")
+
+
+def make_handler(writer, secret):
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def _reply(self, status, message):
+            body = codec.encode({"message": message})
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if not verify_signature(secret, body, self.headers.get("X-Hub-Signature-256")):
+                return self._reply(401, "invalid signature")
+            event = self.headers.get("X-GitHub-Event", "")
+            delivery = self.headers.get("X-GitHub-Delivery") or str(uuid4())
+            if event not in HANDLED_EVENTS:
+                return self._reply(202, f"ignored event {event}")
+            if event == "ping":
+                return self._reply(200, "pong")
+            try:
+                payload = codec.decode(body)
+            except ValueError:
+                return self._reply(400, "invalid JSON")
+            if not writer.submit(event, delivery, payload):
+                logger.warning(f"Webhook queue full; rejecting {event} delivery {delivery}")
+                return self._reply(503, "queue full")
+            return self._reply(202, "queued")
+
+        def log_message(self, format, *args):
+            logger.info(f"{self.address_string()} {format % args}")
+
+    return WebhookHandler
+
+
+def serve(port=WEBHOOK_PORT):
+    if not GH_WEBHOOK_SECRET:
+        raise RuntimeError("GH_WEBHOOK_SECRET must be set to verify webhook signatures")
+    migrate()
+    writer = WebhookWriter()
+    writer.start()
+    server = ThreadingHTTPServer(("0.0.0.0", port), make_handler(writer, GH_WEBHOOK_SECRET))
+    logger.info(f"Webhook receiver listening on port {port}")
+    server.serve_forever()
+
+
+def replay(paths, url, secret):
+    """POST recorded deliveries to a running receiver, signing them with secret."""
+    for path in paths:
+        with open(path, "rb") as f:
+            recorded = codec.load(f)
+        body = codec.encode(recorded["payload"])
+        response = httpx.post(url, content=body, headers={
+            "Content-Type": "application/json",
+            "X-GitHub-Event": recorded["event"],
+            "X-GitHub-Delivery": recorded.get("delivery") or str(uuid4()),
+            "X-Hub-Signature-256": sign(secret, body),
+        })
+        logger.info(f"{path}: {response.status_code} {response.text}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GitHub org webhook receiver")
+    subparsers = parser.add_subparsers(dest="command")
+    replay_parser = subparsers.add_parser("replay", help="send recorded deliveries to a receiver")
+    replay_parser.add_argument("paths", nargs="+")
+    replay_parser.add_argument("--url", default=f"http://localhost:{WEBHOOK_PORT}/webhook")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "replay":
+            replay(args.paths, args.url, GH_WEBHOOK_SECRET)
+        else:
+            serve()
+    except KeyboardInterrupt:
+        logger.info("Webhook receiver stopped by KeyboardInterrupt...")
+    except Exception as e:
+        logger.error(f"Webhook receiver failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,138 @@
+"""
+JSON codec shared by the raw and normalized lakes, GitHub responses and OPA payloads.
+
+JSON_CODEC selects the backend: "orjson", "msgspec" or "stdlib". "auto", the default,
+takes the first one installed in that order. Every backend produces the same bytes for
+the same input: UTF-8 rather than \\u escapes, datetimes as ISO 8601 (what
+datetime.isoformat() returns) and, for compact output, no whitespace. Content hashes
+and cas object names therefore do not depend on the backend. Pretty output is indented
+by two spaces (the only indent orjson offers).
+
+JSON has no timestamp type, so decode() returns strings for datetimes. Readers that
+know which fields are timestamps turn them back into datetime objects with
+parse_datetimes(), once, instead of leaving the database to parse them.
+
+    encode(obj, pretty=False, sort_keys=False) -> bytes
+    dumps(obj, ...) -> str
+    decode(bytes | str)
+    dump(obj, binary_file, ...), load(binary_file)
+"""
+import os
+import json
+from datetime import date, datetime
+
+JSON_CODEC = os.getenv("JSON_CODEC", "auto")
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def _stdlib_default(obj):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _stdlib_encode(obj, pretty, sort_keys):
+    if pretty:
+        text = json.dumps(obj, indent=2, sort_keys=sort_keys, ensure_ascii=False, default=_stdlib_default)
+    else:
+        text = json.dumps(
+            obj, separators=(",", ":"), sort_keys=sort_keys, ensure_ascii=False, default=_stdlib_default
+        )
+    return text.encode()
+
+
+def _orjson_encode(obj, pretty, sort_keys):
+    option = (orjson.OPT_INDENT_2 if pretty else 0) | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+    return orjson.dumps(obj, option=option)
+
+
+_msgspec_encoders = {}
+
+
+def _isoformat_datetimes(obj):
+    # msgspec writes UTC as "Z" where datetime.isoformat() writes "+00:00"
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, dict):
+        return {key: _isoformat_datetimes(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_isoformat_datetimes(value) for value in obj]
+    return obj
+
+
+def _msgspec_encode(obj, pretty, sort_keys):
+    if sort_keys not in _msgspec_encoders:
+        _msgspec_encoders[sort_keys] = msgspec.json.Encoder(order="sorted" if sort_keys else None)
+    data = _msgspec_encoders[sort_keys].encode(_isoformat_datetimes(obj))
+    return msgspec.json.format(data, indent=2) if pretty else data
+
+
+def _msgspec_decode(data):
+    try:
+        return msgspec.json.decode(data)
+    except msgspec.DecodeError as e:
+        # Invalid input raises ValueError from every backend
+        raise ValueError(str(e)) from e
+
+
+BACKENDS = {
+    "orjson": (orjson, _orjson_encode, lambda data: orjson.loads(data)),
+    "msgspec": (msgspec, _msgspec_encode, _msgspec_decode),
+    "stdlib": (json, _stdlib_encode, json.loads),
+}
+
+
+def select_backend(name):
+    """(name, encode, decode) of the requested backend, or of the first installed one for "auto"."""
+    if name == "auto":
+        name = next(candidate for candidate, (module, _, _) in BACKENDS.items() if module is not None)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown JSON_CODEC {name}")
+    module, encode_fn, decode_fn = BACKENDS[name]
+    if module is None:
+        raise RuntimeError(f"JSON_CODEC={name} requires the {name} package")
+    return name, encode_fn, decode_fn
+
+
+BACKEND, _encode, _decode = select_backend(JSON_CODEC)
+
+
+def encode(obj, pretty=False, sort_keys=False):
+    return _encode(obj, pretty, sort_keys)
+
+
+def dumps(obj, pretty=False, sort_keys=False):
+    return encode(obj, pretty, sort_keys).decode()
+
+
+def decode(data):
+    return _decode(data)
+
+
+def dump(obj, f, pretty=False, sort_keys=False):
+    """Write obj to a file opened in binary mode."""
+    f.write(encode(obj, pretty, sort_keys))
+
+
+def load(f):
+    """Read a document from a file opened in binary mode."""
+    return decode(f.read())
+
+
+def parse_datetimes(records, fields):
+    """Turn the ISO 8601 strings of the given fields of every record into datetimes, in place."""
+    for record in records:
+        for field in fields:
+            value = record.get(field)
+            if isinstance(value, str):
+                record[field] = datetime.fromisoformat(value)
+    return records
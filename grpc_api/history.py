@@ -0,0 +1,211 @@
+"""
+Access history: when each access fact started and stopped holding (a type 2 slowly
+changing dimension).
+
+HISTORY maps each run-scoped access table to its history table, the columns naming a
+fact's subject and the columns whose change makes it a new fact:
+
+- permission_history: (repo_name, login) -> role_name
+- team_member_history: (team_slug, login)
+- team_repo_history: (team_slug, repo_name) -> role_name
+
+A history row holds one fact from valid_from until valid_to, which stays NULL while the
+fact holds. record_run(run_id) compares a loaded run with the open rows. Facts the run
+no longer holds, or holds with another role, are closed. Facts it holds newly are
+opened. Unchanged facts are not written again. History therefore grows with churn
+rather than with the number of runs, and it outlives the run partitions dropped by
+retention. The webhook receiver records the repos and teams each delivery touches in
+the same way, so changes between runs are dated when they happen.
+
+A fact held at time t when valid_from <= t and (valid_to IS NULL or t < valid_to).
+The b-tree index on (repo_name or team_slug, valid_from) answers this for one repo or
+team. access_as_of(repo_name, t) resolves a repo's access at t from all three histories,
+team grants included, the way effective_access.py does for a run. access_at(t) does the
+same for every repo at once; it tests tsrange(valid_from, valid_to) @> t, which the
+GiST index on each table's validity range answers.
+
+    python history.py RUN_ID                                 # record a loaded run
+    python history.py --as-of 2026-01-31T00:00 [--login L]   # every repo's access then
+"""
+import logging
+import argparse
+from datetime import datetime, timezone
+
+from sqlalchemy import bindparam, func, select, text
+
+from models import PermissionHistory, TeamMemberHistory, TeamRepoHistory, Snapshot
+from effective_access import best_grants_sql
+from db import get_engine
+
+logger = logging.getLogger(__name__)
+
+# Run-scoped table: (history model, subject columns, fact columns)
+HISTORY = {
+    "permissions": (PermissionHistory, ("repo_name", "login"), ("role_name",)),
+    "team_members": (TeamMemberHistory, ("team_slug", "login"), ()),
+    "team_repos": (TeamRepoHistory, ("team_slug", "repo_name"), ("role_name",)),
+}
+
+
+def same_fact(left, right, subject, values):
+    conditions = [f"{left}.{column} = {right}.{column}" for column in subject]
+    conditions += [f"{left}.{column} IS NOT DISTINCT FROM {right}.{column}" for column in values]
+    return " AND ".join(conditions)
+
+
+def record(connection, run_id, observed_ts, scopes=None):
+    """
+    Close the open facts that run_id's rows no longer hold and open the ones they hold
+    newly, at observed_ts. scopes ({table: repo names or team slugs, the first subject
+    column}) limits this to the repos and teams given, for a run whose other rows did
+    not change. Returns {table: (closed, opened)}.
+    """
+    counts = {}
+    for table, (model, subject, values) in HISTORY.items():
+        if scopes is not None and not scopes.get(table):
+            continue
+        history = model.__tablename__
+        params = {"run_id": run_id, "ts": observed_ts}
+        close_scope = open_scope = ""
+        if scopes is not None:
+            params["scope"] = sorted(scopes[table])
+            close_scope = f" AND {subject[0]} IN :scope"
+            open_scope = f" AND s.{subject[0]} IN :scope"
+        close = text(
+            f"UPDATE {history} SET valid_to = :ts, closed_run_id = :run_id "
+            f"WHERE valid_to IS NULL{close_scope} AND NOT EXISTS ("
+            f"SELECT 1 FROM {table} s WHERE s.run_id = :run_id AND {same_fact('s', history, subject, values)})"
+        )
+        columns = ", ".join(subject + values)
+        present = " AND ".join(f"s.{column} IS NOT NULL" for column in subject)
+        opening = text(
+            f"INSERT INTO {history} ({columns}, valid_from, opened_run_id) "
+            f"SELECT {', '.join(f's.{column}' for column in subject + values)}, :ts, s.run_id FROM {table} s "
+            f"WHERE s.run_id = :run_id{open_scope} AND {present} AND NOT EXISTS ("
+            f"SELECT 1 FROM {history} h WHERE h.valid_to IS NULL AND {same_fact('h', 's', subject, values)})"
+        )
+        if scopes is not None:
+            close = close.bindparams(bindparam("scope", expanding=True))
+            opening = opening.bindparams(bindparam("scope", expanding=True))
+        closed = connection.execute(close, params).rowcount
+        opened = connection.execute(opening, params).rowcount
+        counts[table] = (closed, opened)
+    return counts
+
+
+def held_at(alias):
+    return f"{alias}.valid_from <= :as_of AND ({alias}.valid_to IS NULL OR {alias}.valid_to > :as_of)"
+
+
+def held_in_range(alias):
+    """held_at on the validity range, as the GiST indexes cover it; a NULL valid_to leaves it unbounded."""
+    return f"tsrange({alias}.valid_from, {alias}.valid_to) @> CAST(:as_of AS TIMESTAMP)"
+
+
+def grants_sql(held, repo=False):
+    """
+    Grants held at :as_of in all three histories, as best_grants_sql takes them. held(alias)
+    is the time condition; with repo, only grants on :repo_name.
+    """
+    def where(alias):
+        return f"{alias}.repo_name = :repo_name AND {held(alias)}" if repo else held(alias)
+
+    return (
+        "SELECT repo_name, 'user' AS principal_type, login AS principal, role_name AS role, "
+        "CAST(NULL AS VARCHAR) AS via_team "
+        f"FROM permission_history p WHERE {where('p')} "
+        "UNION ALL "
+        "SELECT repo_name, 'team', team_slug, role_name, NULL "
+        f"FROM team_repo_history tr WHERE {where('tr')} "
+        "UNION ALL "
+        "SELECT tr.repo_name, 'user', tm.login, tr.role_name, tr.team_slug "
+        f"FROM team_repo_history tr JOIN team_member_history tm ON tm.team_slug = tr.team_slug AND {held('tm')} "
+        f"WHERE {where('tr')}"
+    )
+
+
+def access_as_of(connection, repo_name, as_of):
+    """
+    Users and teams with access to a repo at as_of, like its effective access then: each with
+    the highest role it held directly or through a team (effective_access.py). Returns rows
+    of (principal_type, principal, role, via_team).
+    """
+    query = text(
+        f"SELECT principal_type, principal, role, via_team FROM ({best_grants_sql(grants_sql(held_at, repo=True))}) best"
+    )
+    return connection.execute(query, {"repo_name": repo_name, "as_of": as_of}).all()
+
+
+def repo_known(connection, repo_name, as_of):
+    """Whether the history records any grant on repo_name from as_of or earlier."""
+    query = text(
+        "SELECT 1 FROM permission_history WHERE repo_name = :repo_name AND valid_from <= :as_of "
+        "UNION ALL SELECT 1 FROM team_repo_history WHERE repo_name = :repo_name AND valid_from <= :as_of LIMIT 1"
+    )
+    return connection.execute(query, {"repo_name": repo_name, "as_of": as_of}).first() is not None
+
+
+def access_at(connection, as_of, login=None):
+    """
+    Effective access of every repo at as_of, the rows effective_access.py would have held for a
+    run then: (repo_name, principal_type, principal, role, via_team). With login, only that
+    user's rows, i.e. every repo it could access and how.
+    """
+    params = {"as_of": as_of}
+    principal = ""
+    if login is not None:
+        principal = " WHERE principal_type = 'user' AND principal = :login"
+        params["login"] = login
+    query = text(
+        f"SELECT repo_name, principal_type, principal, role, via_team FROM ({best_grants_sql(grants_sql(held_in_range))}) best"
+        f"{principal} ORDER BY repo_name, principal_type, principal"
+    )
+    return connection.execute(query, params).all()
+
+
+def latest_change(connection):
+    """Time of the most recent change recorded in any history table, or None."""
+    latest = [
+        connection.execute(select(func.max(func.coalesce(model.valid_to, model.valid_from)))).scalar()
+        for model, _, _ in HISTORY.values()
+    ]
+    return max((ts for ts in latest if ts is not None), default=None)
+
+
+def record_run(run_id, engine=None):
+    """
+    Record the access facts of a loaded run, dated when the run started. The run is never dated
+    before a change already recorded, such as a webhook delivery that arrived while it ran.
+    """
+    engine = engine or get_engine()
+    with engine.begin() as connection:
+        observed_ts = connection.execute(select(Snapshot.created_ts).where(Snapshot.run_id == run_id)).scalar()
+        if observed_ts is None:
+            raise ValueError(f"Run {run_id} was never loaded")
+        latest = latest_change(connection)
+        if latest is not None and latest > observed_ts:
+            observed_ts = latest
+        counts = record(connection, run_id, observed_ts)
+    for table, (closed, opened) in counts.items():
+        logger.info(f"{HISTORY[table][0].__tablename__}: closed {closed}, opened {opened} as of {observed_ts}")
+    return counts
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    parser = argparse.ArgumentParser(description="Record a loaded run in the access history, or query it")
+    parser.add_argument("run_id", nargs="?")
+    parser.add_argument("--as-of", type=datetime.fromisoformat, help="print every repo's access at this UTC time")
+    parser.add_argument("--login", help="with --as-of, only this user's access")
+    args = parser.parse_args()
+
+    if args.as_of is not None:
+        # The history columns are naive UTC
+        as_of = args.as_of.astimezone(timezone.utc).replace(tzinfo=None) if args.as_of.tzinfo else args.as_of
+        with get_engine().connect() as connection:
+            for row in access_at(connection, as_of, args.login):
+                print("\t".join(value or "" for value in row))
+    elif args.run_id:
+        record_run(args.run_id)
+    else:
+        parser.error("give a RUN_ID to record, or --as-of")
@@ -5,9 +5,7 @@
 # Add logging and basic metrics collection.
 
 import grpc
-from concurrent import futures
 import logging
-import json
 from pathlib import Path
 from elt_service_pb2 import (
     ListRepositoriesResponse, Repository,
@@ -16,36 +14,35 @@ from elt_service_pb2 import (
 )
 import elt_service_pb2_grpc
 import grpc_reflection.v1alpha.reflection as grpc_reflection
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 import sys
 sys.path.append(str(Path(__file__).parent.parent / "elt_service"))
-from models import Base, Repo, Member, Team, Permission, Organization
+from models import Repo, Member, TeamMember, CurrentSnapshot
+from models import EffectiveAccess
+from history import access_as_of, repo_known
+# Database connection (the engine shared with the ELT service, created on first use)
+from db import SessionLocal
 import elt_service_pb2
 import httpx
+import codec
 
-# Database connection (reuse .env from elt_service)
+# Reuse .env from elt_service
 from dotenv import load_dotenv, find_dotenv
 
 load_dotenv(find_dotenv())
 
 import os
-DB_HOSTNAME = os.environ.get("DB_HOSTNAME", "localhost")
-DB_NAME = os.environ.get("DB_NAME", "postgres")
-DB_USER = os.environ.get("DB_USER", "postgres")
-DB_PASSWORD = os.environ.get("DB_PASSWORD", "postgres")
-DB_PORT = os.environ.get("DB_PORT", 5432)
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOSTNAME}:{DB_PORT}/{DB_NAME}"
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 OPA_URL = os.environ.get("OPA_URL", "http://opa_service:8181/v1/data/rig/policies/deny")
 
+def current_run_id(session):
+    """Run the ELT service published last. Queries filter on it, so they read one partition."""
+    return session.query(CurrentSnapshot.run_id).filter(CurrentSnapshot.id == 1).scalar()
+
 class ELTServiceServicer(elt_service_pb2_grpc.ELTServiceServicer):
     def ListRepositories(self, request, context):
         session = SessionLocal()
         try:
-            query = session.query(Repo)
+            query = session.query(Repo).filter(Repo.run_id == current_run_id(session))
             if request.name_filter:
                 query = query.filter(Repo.name.contains(request.name_filter))
             if request.private_only:
@@ -70,17 +67,38 @@ class ELTServiceServicer(elt_service_pb2_grpc.ELTServiceServicer):
     def GetRepositoryAccessDetails(self, request, context):
         session = SessionLocal()
         try:
-            repo = session.query(Repo).filter(Repo.name == request.repository_name).first()
-            if not repo:
+            if request.HasField("as_of"):
+                # Timestamp.ToDatetime() is naive UTC, like the history columns
+                as_of = request.as_of.ToDatetime()
+                # The same users and teams as the current-snapshot path, from the access history
+                rows = access_as_of(session.connection(), request.repository_name, as_of)
+                if not rows and not repo_known(session.connection(), request.repository_name, as_of):
+                    context.set_details(f"Repository '{request.repository_name}' has no access history as of {as_of}.")
+                    context.set_code(grpc.StatusCode.NOT_FOUND)
+                    return GetRepositoryAccessDetailsResponse()
+                access = [AccessDetail(
+                    user_or_team=a.principal,
+                    type=a.principal_type,
+                    role=a.role or "unknown",
+                    via_team=a.via_team or ""
+                ) for a in rows]
+                logging.info(f"GetRepositoryAccessDetails for '{request.repository_name}' as of {as_of} returned {len(access)} access records")
+                return GetRepositoryAccessDetailsResponse(access=access)
+            run_id = current_run_id(session)
+            # Users and teams with their highest role, team grants included (effective_access.py)
+            rows = session.query(EffectiveAccess).filter(
+                EffectiveAccess.run_id == run_id, EffectiveAccess.repo_name == request.repository_name
+            ).all()
+            if not rows and not session.query(Repo.id).filter(Repo.run_id == run_id, Repo.name == request.repository_name).first():
                 context.set_details(f"Repository '{request.repository_name}' not found.")
                 context.set_code(grpc.StatusCode.NOT_FOUND)
                 return GetRepositoryAccessDetailsResponse()
-            perms = session.query(Permission).filter(Permission.repo_name == request.repository_name).all()
             access = [AccessDetail(
-                user_or_team=p.login or "unknown",
-                type="user",  # Extend logic for teams if needed
-                role=p.role_name or "unknown"
-            ) for p in perms]
+                user_or_team=a.principal,
+                type=a.principal_type,
+                role=a.effective_role or "unknown",
+                via_team=a.via_team or ""
+            ) for a in rows]
             logging.info(f"GetRepositoryAccessDetails for '{request.repository_name}' returned {len(access)} access records")
             return GetRepositoryAccessDetailsResponse(access=access)
         except Exception as e:
@@ -95,42 +113,49 @@ class ELTServiceServicer(elt_service_pb2_grpc.ELTServiceServicer):
         session = SessionLocal()
         try:
             violations = []
-            # For each user, repo, and permission, build input for OPA
-            members = session.query(Member).all()
-            repos = session.query(Repo).all()
-            perms = session.query(Permission).all()
-            # Build lookup for teams per user (if you have a team membership table, use it; else, skip teams)
-            user_teams = {m.login: [] for m in members}
-            # For each permission, evaluate OPA
-            for p in perms:
-                user = next((m for m in members if m.login == p.login), None)
-                repo = next((r for r in repos if r.name == p.repo_name), None)
-                if not user or not repo:
+            # For each member and repo they can access, build input for OPA
+            run_id = current_run_id(session)
+            members = {m.login: m for m in session.query(Member).filter(Member.run_id == run_id)}
+            # Build lookup for teams per user from the team_members table
+            user_teams = {login: set() for login in members}
+            for tm in session.query(TeamMember.login, TeamMember.team_slug).filter(TeamMember.run_id == run_id).distinct():
+                user_teams.setdefault(tm.login, set()).add(tm.team_slug)
+            # Each user's highest role on each repo, direct or through a team
+            access = session.query(EffectiveAccess).filter(
+                EffectiveAccess.run_id == run_id, EffectiveAccess.principal_type == "user"
+            ).all()
+            for a in access:
+                user = members.get(a.principal)
+                if not user:
                     continue
                 opa_input = {
                     "user": {
                         "login": user.login,
                         "mfa_enabled": getattr(user, "mfa_enabled", None),
-                        "teams": user_teams.get(user.login, []),
+                        "teams": sorted(user_teams.get(user.login, [])),
                     },
                     "repo": {
-                        "name": repo.name,
+                        "name": a.repo_name,
                     },
                     "permission": {
-                        "level": p.role_name,
+                        "level": a.effective_role,
+                        "via_team": a.via_team,
                     }
                 }
                 try:
-                    resp = httpx.post(OPA_URL, json={"input": opa_input}, timeout=2)
+                    resp = httpx.post(
+                        OPA_URL, content=codec.encode({"input": opa_input}),
+                        headers={"Content-Type": "application/json"}, timeout=2,
+                    )
                     resp.raise_for_status()
-                    result = resp.json().get("result", [])
+                    result = codec.decode(resp.content).get("result", [])
                     for reason in result:
                         violations.append(PolicyViolation(
                             entity=user.login or "",
                             violation=reason
                         ))
                 except Exception as e:
-                    logging.error(f"OPA evaluation error for user {user.login}, repo {repo.name}: {e}")
+                    logging.error(f"OPA evaluation error for user {user.login}, repo {a.repo_name}: {e}")
             logging.info(f"EvaluatePolicy OPA found {len(violations)} violations")
             return EvaluatePolicyResponse(violations=violations)
         except Exception as e:
@@ -0,0 +1,232 @@
+"""
+Run snapshots: one partition per run in every run-scoped table, and the pointer to the
+run that readers see.
+
+The run-scoped tables (SNAPSHOT_TABLES) are list-partitioned by run_id, which is why the
+service requires PostgreSQL.
+A run's partitions, and its row in snapshots, are created by ensure_run(run_id) before
+its tables load. Once every table has loaded, publish(run_id) moves the one-row
+current_snapshot pointer to it. Readers therefore switch from one complete run to the
+next at a single commit. The gRPC API reads only the current run, and the webhook
+receiver writes into it. Deliveries that arrive while a run loads are replayed onto it as
+it is published (webhook.catch_up), so they are not lost when it replaces the run they
+were applied to. Filtering on one run_id lets PostgreSQL prune every other partition.
+
+Rows whose run has no partition land in each table's default partition. Only schemas
+older than the seed_current_snapshot migration wrote any: webhook deliveries received
+before the first publish are now only logged, and replayed onto the first run published.
+
+Retention drops whole partitions instead of deleting rows. drop_run(run_id) drops one
+run. prune(keep) drops every run except the newest `keep` and the current one. It runs
+after each publish when DB_KEEP_RUNS is set.
+
+    python snapshots.py status
+    python snapshots.py publish RUN_ID     # point readers at another loaded run, catching it up with webhook deliveries
+    python snapshots.py prune [--keep N]
+"""
+import os
+import hashlib
+import logging
+import argparse
+from datetime import datetime, timezone
+
+from sqlalchemy import select, text
+
+from models import Base, Snapshot, CurrentSnapshot
+from db import get_engine
+
+logger = logging.getLogger(__name__)
+
+# Runs kept in the database by prune() after each publish; 0 keeps every run
+DB_KEEP_RUNS = int(os.getenv("DB_KEEP_RUNS", 0))
+
+SNAPSHOT_TABLES = [
+    "organizations", "members", "teams", "repos", "permissions", "team_members", "team_repos", "effective_access",
+]
+# Derived from the other tables once a run loads (see effective_access.py), not copied
+DERIVED_TABLES = {"effective_access"}
+POINTER_ID = 1
+
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def partition_name(table, run_id):
+    # run_id is free text (a UUID, or anything passed to --resume), so it is hashed
+    return f"{table}_{hashlib.sha1(run_id.encode()).hexdigest()[:12]}"
+
+
+def literal(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def create_partition(connection, table, run_id):
+    connection.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, run_id)} "
+        f"PARTITION OF {table} FOR VALUES IN ({literal(run_id)})"
+    ))
+
+
+def create_default_partition(connection, table):
+    connection.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+
+
+def create_default_partitions(connection):
+    for table in SNAPSHOT_TABLES:
+        create_default_partition(connection, table)
+
+
+def register(connection, run_id, created_ts=None, published_ts=None):
+    """Add run_id to snapshots unless it is there already."""
+    if connection.execute(select(Snapshot.run_id).where(Snapshot.run_id == run_id)).first() is None:
+        connection.execute(Snapshot.__table__.insert().values(
+            run_id=run_id, created_ts=created_ts or utcnow(), published_ts=published_ts
+        ))
+
+
+def ensure_run(run_id, engine=None):
+    """Partitions of run_id in every snapshot table, and its snapshots row. Idempotent."""
+    engine = engine or get_engine()
+    with engine.begin() as connection:
+        for table in SNAPSHOT_TABLES:
+            create_partition(connection, table, run_id)
+        register(connection, run_id)
+
+
+def current_run_id(connection, lock=False):
+    """
+    The published run readers see, or None before the first publish. With lock, the pointer
+    is share-locked until the transaction ends, so the run is not replaced meanwhile; a
+    publish in progress is waited for, and the run it publishes is returned.
+    """
+    query = select(CurrentSnapshot.run_id).where(CurrentSnapshot.id == POINTER_ID)
+    if lock:
+        query = query.with_for_update(read=True)
+    return connection.execute(query).scalar()
+
+
+def seed_pointer(connection):
+    """
+    The current_snapshot row, naming no run until the first publish. It exists from the
+    start so that current_run_id(lock=True) always has a row to lock.
+    """
+    connection.execute(text(
+        f"INSERT INTO {CurrentSnapshot.__tablename__} (id, run_id, updated_ts) "
+        "VALUES (:id, NULL, :ts) ON CONFLICT (id) DO NOTHING"
+    ), {"id": POINTER_ID, "ts": utcnow()})
+
+
+def set_current(connection, run_id):
+    now = utcnow()
+    updated = connection.execute(
+        CurrentSnapshot.__table__.update().where(CurrentSnapshot.id == POINTER_ID).values(run_id=run_id, updated_ts=now)
+    ).rowcount
+    if not updated:
+        connection.execute(CurrentSnapshot.__table__.insert().values(id=POINTER_ID, run_id=run_id, updated_ts=now))
+    connection.execute(Snapshot.__table__.update().where(Snapshot.run_id == run_id).values(published_ts=now))
+
+
+def publish(run_id, engine=None, catch_up=None):
+    """
+    Point readers at run_id, whose tables have all loaded. Returns the run it replaces.
+
+    catch_up(connection, run_id, since), such as webhook.catch_up, first brings the run up
+    to date with the changes written to the current run since run_id started at `since`, in
+    the same transaction. The pointer is locked meanwhile, so a writer holding
+    current_run_id(lock=True) finishes first, and the next one writes to run_id.
+    """
+    engine = engine or get_engine()
+    with engine.begin() as connection:
+        run = connection.execute(select(Snapshot.created_ts).where(Snapshot.run_id == run_id)).first()
+        if run is None:
+            raise ValueError(f"Run {run_id} was never loaded")
+        previous = connection.execute(
+            select(CurrentSnapshot.run_id).where(CurrentSnapshot.id == POINTER_ID).with_for_update()
+        ).scalar()
+        if catch_up is not None:
+            catch_up(connection, run_id, run.created_ts)
+        set_current(connection, run_id)
+    logger.info(f"Published run {run_id} (previous: {previous})")
+    if DB_KEEP_RUNS:
+        prune(DB_KEEP_RUNS, engine)
+    return previous
+
+
+def copy_run(connection, base_run_id, run_id):
+    """
+    Copy every row of base_run_id into run_id's partitions, for a run loaded as a delta
+    on top of its base. Surrogate ids are assigned afresh.
+    """
+    for table in SNAPSHOT_TABLES:
+        if table in DERIVED_TABLES:
+            continue
+        columns = [
+            column.name for column in Base.metadata.tables[table].columns
+            if column.name != "run_id" and column.autoincrement is not True
+        ]
+        column_list = ", ".join(columns)
+        copied = connection.execute(
+            text(f"INSERT INTO {table} (run_id, {column_list}) SELECT :run_id, {column_list} FROM {table} WHERE run_id = :base"),
+            {"run_id": run_id, "base": base_run_id},
+        ).rowcount
+        logger.info(f"Copied {copied} {table} rows of run {base_run_id} into run {run_id}")
+
+
+def drop_run(run_id, engine=None):
+    """Drop every partition of run_id."""
+    engine = engine or get_engine()
+    with engine.begin() as connection:
+        if run_id == current_run_id(connection):
+            raise ValueError(f"Run {run_id} is the current snapshot")
+        for table in SNAPSHOT_TABLES:
+            connection.execute(text(f"DROP TABLE IF EXISTS {partition_name(table, run_id)}"))
+        connection.execute(Snapshot.__table__.delete().where(Snapshot.run_id == run_id))
+    logger.info(f"Dropped run {run_id}")
+
+
+def prune(keep=DB_KEEP_RUNS, engine=None):
+    """Drop every run but the newest `keep` and the current one. Returns the runs dropped."""
+    engine = engine or get_engine()
+    with engine.connect() as connection:
+        runs = list(connection.execute(select(Snapshot.run_id).order_by(Snapshot.created_ts.desc())).scalars())
+        current = current_run_id(connection)
+    dropped = [run_id for run_id in runs[keep:] if run_id != current]
+    for run_id in dropped:
+        drop_run(run_id, engine)
+    return dropped
+
+
+def status(engine=None):
+    engine = engine or get_engine()
+    with engine.connect() as connection:
+        current = current_run_id(connection)
+        rows = connection.execute(
+            select(Snapshot.run_id, Snapshot.created_ts, Snapshot.published_ts).order_by(Snapshot.created_ts)
+        ).all()
+    return [(run_id, created_ts, published_ts, run_id == current) for run_id, created_ts, published_ts in rows]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    parser = argparse.ArgumentParser(description="Manage the runs loaded into the database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="list loaded runs and the current one")
+    publish_parser = commands.add_parser("publish", help="point readers at a loaded run")
+    publish_parser.add_argument("run_id")
+    prune_parser = commands.add_parser("prune", help="drop the partitions of old runs")
+    prune_parser.add_argument("--keep", type=int, default=DB_KEEP_RUNS or 1, help="newest runs to keep")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        for run_id, created_ts, published_ts, current in status():
+            published = f"published {published_ts:%Y-%m-%d %H:%M}" if published_ts else "not published"
+            print(f"{'*' if current else ' '} {run_id:<40} loaded {created_ts:%Y-%m-%d %H:%M}  {published}")
+    elif args.command == "publish":
+        # Imported here, since webhook imports this module
+        from webhook import catch_up
+        from history import record_run
+        publish(args.run_id, catch_up=catch_up)
+        record_run(args.run_id)
+    else:
+        logger.info(f"Dropped {len(prune(args.keep))} runs")